@@ -51,6 +51,7 @@ if sys.platform.startswith('win'):
 sys.path.append(os.path.join(os.path.dirname(__file__), 'model'))
 
 from model.multi_model_predictor import MultiModelPredictor
+from model.ml_model_store import MLModelStore
 from model.kronos import KronosPredictor, Kronos, KronosTokenizer
 import torch
 
@@ -68,8 +69,10 @@ class BatchStockAnalyzer:
         self.use_kronos_model = use_kronos_model
         self.model_path = model_path
         
-        # 初始化多模型预测器
-        self.multi_predictor = MultiModelPredictor()
+        # 初始化多模型预测器 (按股票缓存已训练的机器学习模型, 数据变化不大时不重新训练)
+        self.multi_predictor = MultiModelPredictor(model_store=MLModelStore())
+        # 技术指标与多模型预测器共用同一个引擎, 同一份数据上的 MACD 等只计算一次
+        self.indicators = self.multi_predictor.indicators
         
         # 如果使用Kronos模型，初始化相关组件
         self.kronos_predictor = None
@@ -546,15 +549,26 @@ class BatchStockAnalyzer:
         # 在线获取历史数据
         df = self.load_historical_data(stock_code, data_dir, timeframe)
         if df is None:
-            return {
-                'stock_code': stock_code,
-                'timeframe': timeframe,
-                'prediction_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'historical_data_points': 0,
-                'pred_days': pred_days,
-                'error': f'无法从网络获取股票 {stock_code} 的历史数据，请检查网络连接或股票代码是否正确'
-            }
+            return self._no_data_result(stock_code, timeframe, pred_days)
         
+        return self._build_stock_result(stock_code, df, timeframe, pred_days)
+    
+    def _no_data_result(self, stock_code, timeframe, pred_days):
+        """获取不到历史数据时的结果"""
+        return {
+            'stock_code': stock_code,
+            'timeframe': timeframe,
+            'prediction_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'historical_data_points': 0,
+            'pred_days': pred_days,
+            'error': f'无法从网络获取股票 {stock_code} 的历史数据，请检查网络连接或股票代码是否正确'
+        }
+    
+    def _build_stock_result(self, stock_code, df, timeframe, pred_days, multi_results=None):
+        """
+        汇总单只股票的预测结果: 多模型预测、Kronos预测 (如启用)、综合预测和交易建议
+        multi_results: dict, 可选, 已由 predict_short_term_batch 算好的多模型预测结果
+        """
         results = {
             'stock_code': stock_code,
             'timeframe': timeframe,
@@ -565,7 +579,10 @@ class BatchStockAnalyzer:
         
         try:
             # 使用多模型预测器
-            multi_results = self.multi_predictor.predict_short_term(df, pred_days, timeframe)
+            if multi_results is None:
+                multi_results = self.multi_predictor.predict_short_term(df, pred_days, timeframe, stock_code=stock_code)
+            elif 'error' in multi_results:
+                raise RuntimeError(multi_results['error'])
             results['multi_model'] = multi_results
             
             # 如果启用了Kronos模型
@@ -648,16 +665,21 @@ class BatchStockAnalyzer:
             results['error'] = str(e)
             return results
     
-    def batch_analyze(self, stock_codes, data_dir="data", timeframe="daily", pred_days=5, output_dir="analysis_results"):
+    def batch_analyze(self, stock_codes, data_dir="data", timeframe="daily", pred_days=5, output_dir="analysis_results",
+                      max_workers=None):
         """
         批量分析股票
         
+        先获取全部股票的历史数据, 再用 MultiModelPredictor.predict_short_term_batch 一次计算所有股票的指标,
+        并行训练各股票的模型; 单只股票失败不影响其他股票。
+        
         Args:
             stock_codes: list, 股票代码列表
             data_dir: str, 数据目录
             timeframe: str, 时间框架
             pred_days: int, 预测天数
             output_dir: str, 输出目录
+            max_workers: int, 并行训练模型的线程数, 默认 CPU 核数
             
         Returns:
             dict: 批量分析结果
@@ -677,11 +699,27 @@ class BatchStockAnalyzer:
             'results': []
         }
         
-        # 逐个分析股票
+        # 获取历史数据
+        histories = {}
+        for i, stock_code in enumerate(stock_codes, 1):
+            print(f"\n获取数据进度: {i}/{len(stock_codes)} - {stock_code}")
+            df = self.load_historical_data(stock_code, data_dir, timeframe)
+            if df is not None:
+                histories[stock_code] = df
+        
+        # 多模型批量预测
+        print(f"\n多模型批量预测 {len(histories)} 只股票...")
+        multi_results = dict(zip(histories, self.multi_predictor.predict_short_term_batch(
+            histories, pred_days, timeframe, max_workers=max_workers)))
+        
+        # 逐个汇总结果
         for i, stock_code in enumerate(stock_codes, 1):
             print(f"\n进度: {i}/{len(stock_codes)}")
             
-            result = self.predict_single_stock(stock_code, data_dir, timeframe, pred_days)
+            if stock_code in histories:
+                result = self._build_stock_result(stock_code, histories[stock_code], timeframe, pred_days, multi_results[stock_code])
+            else:
+                result = self._no_data_result(stock_code, timeframe, pred_days)
             
             if result and 'error' not in result:
                 batch_results['successful_predictions'] += 1
@@ -813,128 +851,36 @@ class BatchStockAnalyzer:
         - m1: K值平滑因子，默认3
         - m2: D值平滑因子，默认3
         
-        返回：添加了K、D、J列的DataFrame
+        返回：添加了RSV、K、D、J列的DataFrame
         """
+        result = data.copy()
         try:
-            data = data.copy()
-            if len(data) < n:
-                # 数据不足时，返回中性值
-                data['RSV'] = 50.0
-                data['K'] = 50.0  
-                data['D'] = 50.0
-                data['J'] = 50.0
-                return data
-            
-            # 计算RSV (Raw Stochastic Value)
-            # RSV = (收盘价 - n日内最低价) / (n日内最高价 - n日内最低价) * 100
-            data['lowest_low'] = data['low'].rolling(window=n).min()
-            data['highest_high'] = data['high'].rolling(window=n).max()
-            
-            # 避免除零错误
-            price_range = data['highest_high'] - data['lowest_low']
-            price_range = price_range.replace(0, 1e-8)  # 将0替换为很小的数值
-            
-            data['RSV'] = ((data['close'] - data['lowest_low']) / price_range * 100).fillna(50.0)
-            
-            # 初始化K、D值
-            data['K'] = 50.0  # K值初始值50
-            data['D'] = 50.0  # D值初始值50
-            
-            # 计算K值 (K值 = 2/3 * 前一日K值 + 1/3 * 当日RSV)
-            # 等价于 K = (m1-1)/m1 * 前K + 1/m1 * RSV，其中m1=3
-            alpha_k = 1.0 / m1  # 平滑因子
-            
-            for i in range(1, len(data)):
-                if pd.notna(data['RSV'].iloc[i]):
-                    data.iloc[i, data.columns.get_loc('K')] = (
-                        (1 - alpha_k) * data['K'].iloc[i-1] + alpha_k * data['RSV'].iloc[i]
-                    )
-                else:
-                    data.iloc[i, data.columns.get_loc('K')] = data['K'].iloc[i-1]
-            
-            # 计算D值 (D值 = 2/3 * 前一日D值 + 1/3 * 当日K值)
-            alpha_d = 1.0 / m2  # 平滑因子
-            
-            for i in range(1, len(data)):
-                if pd.notna(data['K'].iloc[i]):
-                    data.iloc[i, data.columns.get_loc('D')] = (
-                        (1 - alpha_d) * data['D'].iloc[i-1] + alpha_d * data['K'].iloc[i]
-                    )
-                else:
-                    data.iloc[i, data.columns.get_loc('D')] = data['D'].iloc[i-1]
-            
-            # 计算J值 (J = 3K - 2D)
-            data['J'] = 3 * data['K'] - 2 * data['D']
-            
-            # 清理临时列
-            data = data.drop(columns=['lowest_low', 'highest_high'], errors='ignore')
-            
-            # 确保数值在合理范围内
-            for col in ['K', 'D', 'J']:
-                data[col] = data[col].clip(0, 100)  # KDJ值通常在0-100之间
-            
-            return data
-            
+            result[['RSV', 'K', 'D', 'J']] = self.indicators.kdj(data, n, m1, m2)
         except Exception as e:
             print(f"⚠️ KDJ计算失败: {str(e)}")
             # 失败时返回中性值
             for col in ['RSV', 'K', 'D', 'J']:
-                if col not in data.columns:
-                    data[col] = 50.0
-            return data
+                if col not in result.columns:
+                    result[col] = 50.0
+        return result
 
     def calculate_atr(self, data, period=14):
         """
-        计算ATR (Average True Range) 平均真实范围
+        计算ATR (Average True Range) 平均真实范围 (Wilder平滑, 与GUI相同)
         参数：
         - data: 包含high, low, close列的DataFrame
         - period: ATR计算周期，默认14
         
         返回：添加了ATR列的DataFrame
         """
+        result = data.copy()
         try:
-            data = data.copy()
-            if len(data) < 2:
-                data['ATR'] = data['close'] * 0.02  # 默认2%作为ATR
-                return data
-            
-            # 计算True Range (TR)
-            # TR = MAX(H-L, ABS(H-PC), ABS(L-PC))
-            # 其中：H=最高价, L=最低价, PC=前收盘价
-            
-            data['prev_close'] = data['close'].shift(1)
-            
-            # 三个候选值
-            data['tr1'] = data['high'] - data['low']  # 当日高低价差
-            data['tr2'] = abs(data['high'] - data['prev_close'])  # 当日最高价与前日收盘价差的绝对值
-            data['tr3'] = abs(data['low'] - data['prev_close'])   # 当日最低价与前日收盘价差的绝对值
-            
-            # True Range = 三者的最大值
-            data['TR'] = data[['tr1', 'tr2', 'tr3']].max(axis=1)
-            
-            # 第一天的ATR = 第一天的TR
-            data['ATR'] = data['TR']
-            
-            # 从第二天开始，ATR = (前一天ATR * (period-1) + 当天TR) / period
-            for i in range(1, len(data)):
-                if pd.notna(data['TR'].iloc[i]) and pd.notna(data['ATR'].iloc[i-1]):
-                    data.iloc[i, data.columns.get_loc('ATR')] = (
-                        (data['ATR'].iloc[i-1] * (period - 1) + data['TR'].iloc[i]) / period
-                    )
-                else:
-                    data.iloc[i, data.columns.get_loc('ATR')] = data['ATR'].iloc[i-1]
-            
-            # 清理临时列
-            data = data.drop(columns=['prev_close', 'tr1', 'tr2', 'tr3', 'TR'], errors='ignore')
-            
-            return data
-            
+            result['ATR'] = self.indicators.atr(data, period)
         except Exception as e:
             print(f"⚠️ ATR计算失败: {str(e)}")
             # 失败时返回默认值
-            if 'ATR' not in data.columns:
-                data['ATR'] = data['close'] * 0.02
-            return data
+            result['ATR'] = result['close'] * 0.02
+        return result
 
     def calculate_trading_recommendation(self, historical_data, predicted_prices):
         """
@@ -961,15 +907,13 @@ class BatchStockAnalyzer:
             else:
                 pred_trend = 0
             
-            # 计算技术指标
-            data_with_indicators = historical_data.copy()
-            data_with_indicators = self.calculate_kdj(data_with_indicators, n=9, m1=3, m2=3)
-            data_with_indicators = self.calculate_atr(data_with_indicators, period=14)
+            # 计算技术指标 (与多模型预测共用缓存)
+            kdj = self.indicators.kdj(historical_data, n=9, m1=3, m2=3)
             
             # 获取最新KDJ值
-            current_k = data_with_indicators['K'].iloc[-1] if len(data_with_indicators) > 0 else 50
-            current_d = data_with_indicators['D'].iloc[-1] if len(data_with_indicators) > 0 else 50
-            current_j = data_with_indicators['J'].iloc[-1] if len(data_with_indicators) > 0 else 50
+            current_k = kdj['K'].iloc[-1] if len(kdj) > 0 else 50
+            current_d = kdj['D'].iloc[-1] if len(kdj) > 0 else 50
+            current_j = kdj['J'].iloc[-1] if len(kdj) > 0 else 50
             
             # KDJ信号分析
             kdj_score = 0
@@ -986,9 +930,9 @@ class BatchStockAnalyzer:
                 kdj_score = 0  # 中性
             
             # KDJ金叉死叉分析
-            if len(data_with_indicators) >= 2:
-                prev_k = data_with_indicators['K'].iloc[-2]
-                prev_d = data_with_indicators['D'].iloc[-2]
+            if len(kdj) >= 2:
+                prev_k = kdj['K'].iloc[-2]
+                prev_d = kdj['D'].iloc[-2]
                 
                 if prev_k <= prev_d and current_k > current_d:
                     kdj_score += 1  # 金叉
@@ -1004,11 +948,7 @@ class BatchStockAnalyzer:
             # 简化的MACD计算
             macd_score = 0
             if len(historical_data) >= 26:
-                prices = historical_data['close']
-                ema12 = prices.ewm(span=12).mean()
-                ema26 = prices.ewm(span=26).mean()
-                macd_line = ema12 - ema26
-                signal_line = macd_line.ewm(span=9).mean()
+                macd_line, signal_line, _ = self.indicators.macd(historical_data, 12, 26, 9)
                 
                 current_macd = macd_line.iloc[-1]
                 current_signal = signal_line.iloc[-1]
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试公共工具
+
+- 生成随机游走K线 (自带CSV由 model/data_io.py 加载)
+- 按命令行参数构建 KronosPredictor (预训练权重或随机初始化的小模型)
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+
+def add_model_arguments(parser):
+    """添加模型相关的命令行参数"""
+    parser.add_argument('--model', default='NeoQuasar/Kronos-small', help='Kronos模型路径或Hugging Face名称')
+    parser.add_argument('--tokenizer', default='NeoQuasar/Kronos-Tokenizer-base', help='Tokenizer路径或Hugging Face名称')
+    parser.add_argument('--random-init', action='store_true', help='使用随机初始化的小模型 (离线环境下测速用, 预测无意义)')
+    parser.add_argument('--device', default='cpu', help='推理设备')
+    parser.add_argument('--max-context', type=int, default=512, help='模型最大上下文长度')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    return parser
+
+
+def load_model_and_tokenizer(args):
+    """按参数加载 (或随机初始化) Kronos 模型与 Tokenizer"""
+    import torch
+    from model.kronos import Kronos, KronosTokenizer
+    from model.data_io import RANDOM_MODEL_CONFIG, RANDOM_TOKENIZER_CONFIG
+
+    torch.manual_seed(args.seed)
+    if args.random_init:
+        model = Kronos(**RANDOM_MODEL_CONFIG)
+        tokenizer = KronosTokenizer(**RANDOM_TOKENIZER_CONFIG)
+    else:
+        model = Kronos.from_pretrained(args.model)
+        tokenizer = KronosTokenizer.from_pretrained(args.tokenizer)
+    model.eval()
+    tokenizer.eval()
+    return model, tokenizer
+
+
+def build_predictor(args):
+    """构建 KronosPredictor"""
+    from model.kronos import KronosPredictor
+
+    model, tokenizer = load_model_and_tokenizer(args)
+    return KronosPredictor(model, tokenizer, device=args.device, max_context=args.max_context)
+
+
+def synthetic_series(n_series, n_bars, seed=0, freq='B'):
+    """
+    生成随机游走K线, 用于在比自带样例更长的历史上测速
+
+    返回: dict, 与 model.data_io.load_bundled_series 格式相同
+    """
+    rng = np.random.default_rng(seed)
+    series = {}
+    for i in range(n_series):
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, n_bars)))
+        open_ = close * np.exp(rng.normal(0, 0.005, n_bars))
+        high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n_bars))
+        low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n_bars))
+        volume = rng.lognormal(13, 0.5, n_bars).round()
+        series[f'SYN{i:03d}'] = pd.DataFrame({
+            'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume,
+            'amount': volume * (open_ + high + low + close) / 4,
+            'timestamps': pd.date_range('1990-01-01', periods=n_bars, freq=freq)})
+    return series
+
+
+def future_timestamps(x_timestamp, pred_len):
+    """按历史时间戳的间隔外推未来时间戳"""
+    step = x_timestamp.iloc[-1] - x_timestamp.iloc[-2]
+    return pd.Series(pd.date_range(x_timestamp.iloc[-1] + step, periods=pred_len, freq=step))
+
+
+def default_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    return add_model_arguments(parser)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试: 技术指标引擎
+
+1. KDJ / ATR: 原 GUI 与批量分析中的逐行 iloc 递推 vs 指标引擎的向量化实现 (结果误差)
+2. 一次完整分析 (多模型预测的技术指标与机器学习特征 + 交易建议的 KDJ/MACD):
+   各调用方独立计算 vs 共享 IndicatorEngine 缓存
+
+用法:
+    python benchmarks/indicator_engine.py --bars 500 --repeat 5
+"""
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from common import synthetic_series
+from model.indicator_engine import IndicatorEngine, kdj, atr
+
+
+def legacy_kdj(data, n=9, m1=3, m2=3):
+    """原实现: 逐行 iloc 递推"""
+    data = data.copy()
+    data['lowest_low'] = data['low'].rolling(window=n).min()
+    data['highest_high'] = data['high'].rolling(window=n).max()
+    price_range = (data['highest_high'] - data['lowest_low']).replace(0, 1e-8)
+    data['RSV'] = ((data['close'] - data['lowest_low']) / price_range * 100).fillna(50.0)
+    data['K'] = 50.0
+    data['D'] = 50.0
+    for i in range(1, len(data)):
+        data.iloc[i, data.columns.get_loc('K')] = (1 - 1.0 / m1) * data['K'].iloc[i - 1] + data['RSV'].iloc[i] / m1
+    for i in range(1, len(data)):
+        data.iloc[i, data.columns.get_loc('D')] = (1 - 1.0 / m2) * data['D'].iloc[i - 1] + data['K'].iloc[i] / m2
+    data['J'] = 3 * data['K'] - 2 * data['D']
+    for col in ['K', 'D', 'J']:
+        data[col] = data[col].clip(0, 100)
+    return data
+
+
+def legacy_atr(data, period=14):
+    """原实现 (GUI): Wilder 平滑逐行递推"""
+    prev_close = data['close'].shift(1)
+    tr = pd.concat([data['high'] - data['low'], (data['high'] - prev_close).abs(),
+                    (data['low'] - prev_close).abs()], axis=1).max(axis=1)
+    values = pd.Series(0.0, index=data.index)
+    values.iloc[period] = tr.iloc[1:period + 1].mean()
+    for i in range(period + 1, len(data)):
+        values.iloc[i] = ((period - 1) * values.iloc[i - 1] + tr.iloc[i]) / period
+    return values.replace(0, np.nan).bfill().fillna(data['close'] * 0.02)
+
+
+def analysis_pass(engine, df):
+    """一次分析中各调用方请求的指标; engine 为 None 时每处都重新计算"""
+    get = engine if engine is not None else IndicatorEngine()
+    # 技术指标预测
+    get.macd(df), get.bollinger(df), get.rsi(df), get.ma(df, 5), get.ma(df, 20)
+    get = engine if engine is not None else IndicatorEngine()
+    # 机器学习特征
+    get.ma(df, 5), get.ma(df, 10), get.rsi(df), get.pct_change(df)
+    get = engine if engine is not None else IndicatorEngine()
+    # 交易建议
+    get.kdj(df), get.macd(df)
+
+
+def best_time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='技术指标引擎基准')
+    parser.add_argument('--bars', type=int, default=500)
+    parser.add_argument('--series', type=int, default=20, help='完整分析的股票数')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    df = synthetic_series(1, args.bars, 0)['SYN000']
+    for name, legacy, vectorized, column in (
+            ('KDJ', lambda: legacy_kdj(df), lambda: kdj(df['high'], df['low'], df['close']), 'K'),
+            ('ATR', lambda: legacy_atr(df), lambda: atr(df['high'], df['low'], df['close']), None)):
+        old_time, new_time = best_time(legacy, 1), best_time(vectorized, args.repeat)
+        old, new = legacy(), vectorized()
+        if column is not None:
+            old, new = old[column], new[column]
+        error = np.nanmax(np.abs(old.values - new.values))
+        print(f"{name} ({args.bars}根K线): 逐行 {old_time * 1000:.1f}ms, 向量化 {new_time * 1000:.2f}ms, "
+              f"加速 {old_time / new_time:.0f}x, 最大误差 {error:.1e}")
+
+    series = list(synthetic_series(args.series, args.bars, 1).values())
+    independent = best_time(lambda: [analysis_pass(None, s) for s in series], args.repeat)
+    shared = best_time(lambda: [analysis_pass(IndicatorEngine(), s) for s in series], args.repeat)
+    engine = IndicatorEngine()
+    analysis_pass(engine, series[0])
+    print(f"\n完整分析 ({args.series} 只股票): 独立计算 {independent * 1000:.1f}ms, 共享缓存 {shared * 1000:.1f}ms "
+          f"({independent / shared:.2f}x); 每只股票 {engine.misses} 次计算, {engine.hits} 次命中")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+长上下文注意力基准测试: 全注意力 vs 局部 (滑动窗口) 注意力 vs 局部+跨步注意力
+
+对 1k / 2k / 4k 长度的上下文, 在 CPU 上测量一次完整前缀计算 (Tokenizer 编码 + Kronos decode_s1)
+的耗时与峰值内存增量。每个配置在独立子进程中运行, 峰值内存取子进程 ru_maxrss 相对模型加载后的增量。
+
+局部注意力通过模型配置 attn_window / attn_stride 开启, 不增加参数, 预训练权重可直接加载:
+    Kronos.from_pretrained('NeoQuasar/Kronos-small', attn_window=512)
+
+用法:
+    python benchmarks/long_context_attention.py --random-init
+    python benchmarks/long_context_attention.py --random-init --contexts 1024 2048 4096 --window 256 --stride 64
+"""
+
+import resource
+import time
+import multiprocessing as mp
+from queue import Empty
+
+from common import default_parser
+from model.data_io import RANDOM_MODEL_CONFIG, RANDOM_TOKENIZER_CONFIG
+
+
+def run_config(args, context, attn_window, attn_stride, queue):
+    import numpy as np
+    import pandas as pd
+    import torch
+    from model.kronos import Kronos, KronosTokenizer, calc_time_features
+
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(args.seed)
+    pattern = {'attn_window': attn_window, 'attn_stride': attn_stride}
+    if args.random_init:
+        model = Kronos(**RANDOM_MODEL_CONFIG, **pattern)
+        tokenizer = KronosTokenizer(**RANDOM_TOKENIZER_CONFIG, **pattern)
+    else:
+        model = Kronos.from_pretrained(args.model, **pattern)
+        tokenizer = KronosTokenizer.from_pretrained(args.tokenizer, **pattern)
+    model.eval()
+    tokenizer.eval()
+
+    x = torch.randn(args.batch_size, context, 6).clamp(-5, 5)
+    timestamps = pd.date_range('2024-01-02 09:30', periods=context, freq='5min').values
+    stamp = torch.from_numpy(np.repeat(calc_time_features(timestamps)[np.newaxis], args.batch_size, axis=0))
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    times = []
+    with torch.no_grad():
+        for _ in range(args.repeats + 1):
+            start = time.perf_counter()
+            x_token = tokenizer.encode(x, half=True)
+            model.decode_s1(x_token[0], x_token[1], stamp)
+            times.append(time.perf_counter() - start)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((min(times[1:]), (peak - baseline) / 1024))  # ru_maxrss 单位为 KB (Linux)
+
+
+def measure(args, context, attn_window, attn_stride):
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=run_config, args=(args, context, attn_window, attn_stride, queue))
+    process.start()
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except Empty:
+            if not process.is_alive():
+                raise RuntimeError(f"context={context}, attn_window={attn_window} 的子进程异常退出 (exitcode={process.exitcode})")
+    process.join()
+    return result
+
+
+def main():
+    parser = default_parser('Kronos 长上下文局部注意力基准测试')
+    parser.add_argument('--contexts', type=int, nargs='+', default=[1024, 2048, 4096])
+    parser.add_argument('--window', type=int, default=256, help='局部注意力窗口')
+    parser.add_argument('--stride', type=int, default=64, help='跨步注意力间隔')
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=1, help='torch 线程数')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    configs = [('full', None, None), (f'local{args.window}', args.window, None),
+               (f'local{args.window}+s{args.stride}', args.window, args.stride)]
+    print(f"batch={args.batch_size}, threads={args.threads}, 模型={'随机初始化' if args.random_init else args.model}")
+    print(f"\n{'context':>8}{'pattern':>20}{'latency(s)':>12}{'peak(MB)':>10}{'vs full':>9}")
+    for context in args.contexts:
+        full_latency = None
+        for name, attn_window, attn_stride in configs:
+            latency, peak = measure(args, context, attn_window, attn_stride)
+            full_latency = full_latency or latency
+            print(f"{context:>8}{name:>20}{latency:>12.3f}{peak:>10.0f}{full_latency / latency:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试: MultiModelPredictor 机器学习预测的各模型后端
+
+在每只股票上逐个截止点滚动: 用截止点之前的K线训练并预测之后 horizon 根K线的收盘价, 与实际值比较。
+输出每个后端的平均 MAPE、方向命中率、平均训练/预测耗时; 设置 --budget 时再输出
+latency_budget 下各次调用选中的后端分布。
+
+data/ 下的日线样例只有20根K线, 不足以训练, 可用 --synthetic-bars 追加随机游走数据。
+
+用法:
+    python benchmarks/ml_backends.py --timeframe 5min --horizon 5
+    python benchmarks/ml_backends.py --timeframe daily --synthetic-bars 300 --stride 20 --mode direct --budget 0.1
+"""
+
+import argparse
+from collections import Counter
+
+import numpy as np
+
+from common import synthetic_series
+from model.data_io import load_bundled_series
+from model.multi_model_predictor import MultiModelPredictor
+from model.ml_backends import ML_BACKENDS
+
+WINDOW_SIZES = {'daily': 10, '15min': 8, '5min': 12}
+
+
+def cases(series, timeframe, horizon, stride):
+    """(历史K线, 实际收盘价, 截止点前最后收盘价)"""
+    min_history = WINDOW_SIZES[timeframe] + horizon + 10
+    for df in series.values():
+        closes = df['close'].values
+        for cutoff in range(min_history, len(df) - horizon + 1, stride):
+            yield df.iloc[:cutoff], closes[cutoff:cutoff + horizon], closes[cutoff - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='机器学习后端对比')
+    parser.add_argument('--timeframe', default='5min', choices=['daily', '5min'])
+    parser.add_argument('--horizon', type=int, default=5, help='预测步数 (pred_days)')
+    parser.add_argument('--mode', default='recursive', choices=['recursive', 'direct'])
+    parser.add_argument('--stride', type=int, default=1, help='相邻截止点间隔 (K线数)')
+    parser.add_argument('--synthetic-bars', type=int, default=0, help='>0 时追加随机游走数据, 每只股票的K线数')
+    parser.add_argument('--synthetic-series', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=None, help='延迟预算 (秒/次), 设置时额外评估按预算选择后端')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    series = load_bundled_series(args.timeframe)
+    if args.synthetic_bars > 0:
+        freq = '5min' if args.timeframe == '5min' else 'B'
+        series.update(synthetic_series(args.synthetic_series, args.synthetic_bars, args.seed, freq=freq))
+    all_cases = list(cases(series, args.timeframe, args.horizon, args.stride))
+    if not all_cases:
+        raise SystemExit('没有可评估的截止点, 请使用 --synthetic-bars 或更长的历史数据')
+    print(f"数据: {args.timeframe}, {len(all_cases)} 个截止点, 预测 {args.horizon} 步, {args.mode} 模式")
+
+    predictors = {name: MultiModelPredictor(ml_mode=args.mode, ml_backend=name) for name in ML_BACKENDS}
+    if args.budget is not None:
+        predictors[f'budget {args.budget:g}s'] = MultiModelPredictor(
+            ml_mode=args.mode, ml_backend='random_forest_parallel', latency_budget=args.budget)
+
+    print(f"\n{'后端':<26}{'MAPE':>8}{'方向命中':>10}{'训练':>11}{'预测':>10}")
+    for name, predictor in predictors.items():
+        mape, hits, fit_times, predict_times, chosen = [], [], [], [], Counter()
+        for history, actual, last_close in all_cases:
+            result = predictor._machine_learning_prediction(history, args.horizon, args.timeframe)
+            if result['method'] != 'machine_learning':
+                continue
+            settings = result['backend_settings']
+            pred = np.asarray(result['prices'])
+            mape.append(np.mean(np.abs(pred - actual) / np.abs(actual)))
+            hits.append(np.mean(np.sign(pred - last_close) == np.sign(actual - last_close)))
+            fit_times.append(settings['fit_seconds'])
+            predict_times.append(settings['predict_seconds'])
+            chosen[settings['backend']] += 1
+        print(f"{name:<26}{np.mean(mape):>8.2%}{np.mean(hits):>10.1%}"
+              f"{np.mean(fit_times) * 1000:>9.1f}ms{np.mean(predict_times) * 1000:>8.2f}ms")
+        if predictor.latency_budget is not None:
+            print('    选中: ' + ', '.join(f'{backend} {count}次' for backend, count in chosen.most_common()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试: MultiModelPredictor 机器学习训练矩阵的构建
+
+对比两种构建方式, 并校验结果完全一致:
+- 逐元素循环: 原实现, 每个元素通过 data[col].iloc[idx] 取值并逐个检查 NaN
+- 滑动窗口视图: MultiModelPredictor._build_window_features, 对连续 NumPy 数组做 sliding_window_view
+
+data/ 下自带的样例数据很短, 默认再加一组随机游走的5分钟数据 (20个交易日 x 48根 = 960根K线)。
+
+用法:
+    python benchmarks/ml_feature_builder.py
+    python benchmarks/ml_feature_builder.py --synthetic-bars 4800 --repeat 3
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from common import synthetic_series
+from model.data_io import load_bundled_series
+from model.multi_model_predictor import MultiModelPredictor
+from model.indicator_engine import rsi
+
+WINDOW_SIZES = {'daily': 10, '15min': 8, '5min': 12}
+
+
+def prepare(df):
+    """与 _machine_learning_prediction 相同的指标列"""
+    data = df.copy()
+    data['ma5'] = data['close'].rolling(window=5).mean()
+    data['ma10'] = data['close'].rolling(window=10).mean()
+    data['rsi'] = rsi(data['close'], 14)
+    data['price_change'] = data['close'].pct_change()
+    return data
+
+
+def loop_features(data, window_size, pred_days):
+    """原实现: 逐元素 iloc 取值"""
+    features = []
+    targets = []
+    for i in range(window_size, len(data) - pred_days):
+        feature_row = []
+        for j in range(window_size):
+            idx = i - window_size + j
+            feature_row.extend([
+                data['close'].iloc[idx],
+                data['volume'].iloc[idx],
+                data['ma5'].iloc[idx] if not np.isnan(data['ma5'].iloc[idx]) else data['close'].iloc[idx],
+                data['ma10'].iloc[idx] if not np.isnan(data['ma10'].iloc[idx]) else data['close'].iloc[idx],
+                data['rsi'].iloc[idx] if not np.isnan(data['rsi'].iloc[idx]) else 50,
+                data['price_change'].iloc[idx] if not np.isnan(data['price_change'].iloc[idx]) else 0
+            ])
+        features.append(feature_row)
+        targets.append(data['close'].iloc[i + 1])
+    return np.array(features).reshape(len(features), window_size * 6), np.array(targets)
+
+
+def vector_features(predictor, data, window_size, pred_days):
+    raw = data[predictor.ML_FEATURE_COLUMNS].values.astype(np.float64)
+    return predictor._build_window_features(raw, window_size, pred_days)
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='机器学习特征矩阵构建基准测试')
+    parser.add_argument('--pred-days', type=int, default=5)
+    parser.add_argument('--synthetic-bars', type=int, default=960, help='随机游走5分钟数据的K线数, 0 表示不使用')
+    parser.add_argument('--repeat', type=int, default=3, help='每种方式重复次数, 取最快一次')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    predictor = MultiModelPredictor()
+    datasets = [(timeframe, code, df) for timeframe in ('daily', '5min') for code, df in load_bundled_series(timeframe).items()]
+    if args.synthetic_bars > 0:
+        datasets += [('5min', code, df) for code, df in synthetic_series(1, args.synthetic_bars, args.seed, freq='5min').items()]
+
+    print(f"{'数据':<18}{'K线数':>8}{'样本数':>8}{'逐元素循环':>12}{'滑动窗口':>12}{'加速比':>9}  一致")
+    total_loop = total_vector = 0.0
+    all_equal = True
+    for timeframe, code, df in datasets:
+        data = prepare(df)
+        window_size = WINDOW_SIZES[timeframe]
+        loop_time, (X_loop, y_loop) = best_time(lambda: loop_features(data, window_size, args.pred_days), args.repeat)
+        vector_time, (X_vec, y_vec) = best_time(lambda: vector_features(predictor, data, window_size, args.pred_days), args.repeat)
+        equal = np.array_equal(X_loop, X_vec, equal_nan=True) and np.array_equal(y_loop, y_vec, equal_nan=True)
+        all_equal &= equal
+        total_loop += loop_time
+        total_vector += vector_time
+        print(f"{code + ' ' + timeframe:<18}{len(df):>8}{len(X_vec):>8}{loop_time * 1000:>10.2f}ms{vector_time * 1000:>10.3f}ms"
+              f"{loop_time / vector_time:>8.0f}x  {'是' if equal else '否'}")
+
+    print(f"\n合计: 逐元素循环 {total_loop * 1000:.1f}ms, 滑动窗口 {total_vector * 1000:.2f}ms, "
+          f"加速 {total_loop / total_vector:.0f}x, 结果{'全部一致' if all_equal else '存在差异'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试: MultiModelPredictor 机器学习预测的递归模式与直接多步模式
+
+- recursive: 单步随机森林, 递归调用 pred_days 次 predict
+- direct: 一次拟合输出第 1..pred_days 步的多输出随机森林, 一次 predict
+
+在每只股票上逐个截止点滚动: 用截止点之前的K线训练并预测之后 horizon 根K线的收盘价, 与实际值比较。
+输出每种模式的每步 MAE、平均 MAPE、方向命中率, 以及每次调用的平均耗时 (含训练)。
+
+data/ 下的日线样例只有20根K线, 不足以训练 (需至少 窗口 + horizon + 10 根), 会被跳过;
+可用 --synthetic-bars 追加随机游走数据。
+
+用法:
+    python benchmarks/ml_forecast_modes.py --timeframe 5min --horizon 5
+    python benchmarks/ml_forecast_modes.py --timeframe daily --synthetic-bars 300 --stride 5
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from common import synthetic_series
+from model.data_io import load_bundled_series
+from model.multi_model_predictor import MultiModelPredictor
+
+WINDOW_SIZES = {'daily': 10, '15min': 8, '5min': 12}
+MODES = ('recursive', 'direct')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='机器学习递归/直接多步预测对比')
+    parser.add_argument('--timeframe', default='5min', choices=['daily', '5min'])
+    parser.add_argument('--horizon', type=int, default=5, help='预测步数 (pred_days)')
+    parser.add_argument('--stride', type=int, default=1, help='相邻截止点间隔 (K线数)')
+    parser.add_argument('--synthetic-bars', type=int, default=0, help='>0 时追加随机游走数据, 每只股票的K线数')
+    parser.add_argument('--synthetic-series', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    series = load_bundled_series(args.timeframe)
+    if args.synthetic_bars > 0:
+        freq = '5min' if args.timeframe == '5min' else 'B'
+        series.update(synthetic_series(args.synthetic_series, args.synthetic_bars, args.seed, freq=freq))
+
+    horizon = args.horizon
+    min_history = WINDOW_SIZES[args.timeframe] + horizon + 10
+    predictors = {mode: MultiModelPredictor(ml_mode=mode) for mode in MODES}
+    errors = {mode: [] for mode in MODES}
+    actuals = {mode: [] for mode in MODES}
+    hits = {mode: [] for mode in MODES}
+    timings = {mode: [] for mode in MODES}
+    skipped = []
+
+    for code, df in series.items():
+        cutoffs = range(min_history, len(df) - horizon + 1, args.stride)
+        if not cutoffs:
+            skipped.append(code)
+            continue
+        closes = df['close'].values
+        for cutoff in cutoffs:
+            history = df.iloc[:cutoff]
+            actual = closes[cutoff:cutoff + horizon]
+            last_close = closes[cutoff - 1]
+            for mode in MODES:
+                start = time.perf_counter()
+                result = predictors[mode]._machine_learning_prediction(history, horizon, args.timeframe)
+                timings[mode].append(time.perf_counter() - start)
+                if result['method'] != 'machine_learning':
+                    continue
+                pred = np.asarray(result['prices'])
+                errors[mode].append(pred - actual)
+                actuals[mode].append(actual)
+                hits[mode].append(np.sign(pred - last_close) == np.sign(actual - last_close))
+
+    n_cases = len(errors['recursive'])
+    print(f"数据: {args.timeframe}, {len(series) - len(skipped)} 只股票, {n_cases} 个截止点, 预测 {horizon} 步")
+    if skipped:
+        print(f"K线不足 {min_history + horizon} 根, 跳过: {', '.join(skipped)}")
+    if n_cases == 0:
+        raise SystemExit('没有可评估的截止点, 请使用 --synthetic-bars 或更长的历史数据')
+
+    header = ''.join(f'{"MAE@" + str(h + 1):>10}' for h in range(horizon))
+    print(f"\n{'模式':<12}{header}{'MAPE':>9}{'方向命中':>10}{'耗时/次':>11}")
+    for mode in MODES:
+        err = np.abs(np.array(errors[mode]))
+        mae = err.mean(axis=0)
+        mape = np.mean(err / np.abs(np.array(actuals[mode])))
+        print(f"{mode:<12}" + ''.join(f'{m:>10.4f}' for m in mae), end='')
+        print(f"{mape:>9.2%}{np.mean(hits[mode]):>10.1%}{np.mean(timings[mode]) * 1000:>9.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
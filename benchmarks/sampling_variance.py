@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+采样方式基准测试: iid / antithetic / sobol
+
+对 data/ 中的每只股票, 先用大量 iid 采样路径得到参考均值预测, 再对每种采样方式和
+每个 sample_count 重复预测若干次, 统计均值预测 (close) 相对参考值的 RMSE
+(以该股票历史 close 标准差为单位)。最后给出每种方式达到目标误差所需的最少路径数。
+
+用法:
+    python benchmarks/sampling_variance.py --timeframe daily --pred-len 5
+    python benchmarks/sampling_variance.py --random-init   # 离线环境
+"""
+
+import numpy as np
+import torch
+
+from common import default_parser, build_predictor, future_timestamps
+from model.data_io import load_bundled_series
+
+SAMPLE_GRID = [1, 2, 4, 8, 16, 32]
+MODES = ['iid', 'antithetic', 'sobol']
+
+
+def main():
+    parser = default_parser('Kronos 采样方差基准测试')
+    parser.add_argument('--timeframe', default='daily', choices=['daily', '5min'])
+    parser.add_argument('--pred-len', type=int, default=5)
+    parser.add_argument('--reference-samples', type=int, default=256, help='参考均值使用的 iid 路径数')
+    parser.add_argument('--repeats', type=int, default=8, help='每个配置重复次数')
+    parser.add_argument('--target-error', type=float, default=0.05, help='目标RMSE (历史标准差单位)')
+    args = parser.parse_args()
+
+    predictor = build_predictor(args)
+    series = load_bundled_series(args.timeframe)
+    codes = list(series)
+    df_list = [series[c][['open', 'high', 'low', 'close', 'volume', 'amount']] for c in codes]
+    x_ts_list = [series[c]['timestamps'] for c in codes]
+    y_ts_list = [future_timestamps(ts, args.pred_len) for ts in x_ts_list]
+    scale = np.array([series[c]['close'].std() for c in codes])[:, None]
+
+    def mean_close(sample_count, mode):
+        preds = predictor.predict_batch(df_list, x_ts_list, y_ts_list, args.pred_len, sample_count=sample_count,
+                                        verbose=False, sampling=mode)
+        return np.stack([p['close'].values for p in preds])
+
+    torch.manual_seed(args.seed)
+    print(f"股票数: {len(codes)}, 历史长度: {len(df_list[0])}, 预测步数: {args.pred_len}")
+    print(f"计算参考均值 ({args.reference_samples} 条 iid 路径)...")
+    reference = mean_close(args.reference_samples, 'iid')
+
+    errors = {}
+    for mode in MODES:
+        for sample_count in SAMPLE_GRID:
+            rmse = []
+            for _ in range(args.repeats):
+                diff = (mean_close(sample_count, mode) - reference) / scale
+                rmse.append(np.sqrt(np.mean(diff ** 2, axis=1)))
+            errors[mode, sample_count] = float(np.mean(rmse))
+
+    print(f"\n{'samples':>8}" + ''.join(f"{mode:>12}" for mode in MODES))
+    for sample_count in SAMPLE_GRID:
+        print(f"{sample_count:>8}" + ''.join(f"{errors[mode, sample_count]:>12.4f}" for mode in MODES))
+
+    print(f"\n达到目标误差 {args.target_error} 所需路径数:")
+    for mode in MODES:
+        needed = next((n for n in SAMPLE_GRID if errors[mode, n] <= args.target_error), None)
+        print(f"  {mode:<11} {needed if needed is not None else f'> {SAMPLE_GRID[-1]}'}")
+
+
+if __name__ == '__main__':
+    main()
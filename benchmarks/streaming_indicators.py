@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试: 流式指标 vs 每根新K线批量重算
+
+模拟分钟线实时行情: 用前 --history 根K线初始化 (StreamingIndicators.from_history),
+之后逐根推送剩余K线。每根K线比较:
+- 批量: 对截至当前的全部历史调用 indicator_engine 的 macd / rsi / kdj / atr, 取最后一个值
+- 流式: StreamingIndicators.update(bar)
+输出两者每根K线的平均耗时, 以及所有指标的最大相对误差。
+
+用法:
+    python benchmarks/streaming_indicators.py --bars 2000 --history 500
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from common import synthetic_series
+from model import indicator_engine
+from model.streaming_indicators import StreamingIndicators
+
+KEYS = ('macd', 'signal', 'histogram', 'rsi', 'rsv', 'k', 'd', 'j', 'atr')
+
+
+def batch_latest(df):
+    """批量计算后的最后一根K线的指标值"""
+    high, low, close = df['high'], df['low'], df['close']
+    macd, signal, histogram = indicator_engine.macd(close)
+    kdj = indicator_engine.kdj(high, low, close)
+    return {
+        'macd': macd.iloc[-1], 'signal': signal.iloc[-1], 'histogram': histogram.iloc[-1],
+        'rsi': indicator_engine.rsi(close).iloc[-1],
+        'rsv': kdj['RSV'].iloc[-1], 'k': kdj['K'].iloc[-1], 'd': kdj['D'].iloc[-1], 'j': kdj['J'].iloc[-1],
+        'atr': indicator_engine.atr(high, low, close).iloc[-1],
+    }
+
+
+def relative_error(got, want):
+    if np.isnan(got) and np.isnan(want):
+        return 0.0
+    return abs(got - want) / max(1.0, abs(want))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式指标与批量重算对比')
+    parser.add_argument('--bars', type=int, default=2000, help='K线总数')
+    parser.add_argument('--history', type=int, default=500, help='用于初始化的历史K线数')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = synthetic_series(1, args.bars, args.seed, freq='5min')['SYN000']
+    bars = df.to_dict('records')
+
+    start = time.perf_counter()
+    stream = StreamingIndicators.from_history(df.iloc[:args.history])
+    seed_time = time.perf_counter() - start
+
+    batch_time = stream_time = 0.0
+    worst = dict.fromkeys(KEYS, 0.0)
+    for t in range(args.history, args.bars):
+        start = time.perf_counter()
+        want = batch_latest(df.iloc[:t + 1])
+        batch_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        got = stream.update(bars[t])
+        stream_time += time.perf_counter() - start
+
+        for key in KEYS:
+            worst[key] = max(worst[key], relative_error(got[key], want[key]))
+
+    n_updates = args.bars - args.history
+    print(f"初始化 {args.history} 根K线: {seed_time * 1000:.1f}ms, 之后推送 {n_updates} 根")
+    print(f"批量重算: {batch_time / n_updates * 1000:.3f}ms/根")
+    print(f"流式更新: {stream_time / n_updates * 1000:.3f}ms/根 (加速 {batch_time / stream_time:.0f}x)")
+    print('最大相对误差: ' + ', '.join(f'{key} {value:.1e}' for key, value in worst.items()))
+    if max(worst.values()) > 1e-9:
+        raise SystemExit('流式结果与批量结果不一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试: Token 压缩归档 (model/token_archive.py)
+
+将历史K线按归一化窗口分词, 只保存 s1/s2 token 和每个窗口的均值/标准差, 读取时批量解码为近似 OHLCVA。
+对比:
+- 存储大小: CSV / gzip CSV / float32 压缩 npz (无损基线) / Token 归档, 以及每根K线字节数
+- 写入 (分词) 与读取 (解码) 吞吐, 根K线/秒
+- 重建误差: 各列 MAE 与相对误差 (MAE / 列均值绝对值)
+
+data/ 下自带的样例数据很短, 可用 --synthetic-bars 生成更长的随机游走历史来测吞吐。
+注意: --random-init 下 Tokenizer 未训练, 重建误差没有参考意义, 只用于测大小与速度。
+
+用法:
+    python benchmarks/token_archive.py --tokenizer NeoQuasar/Kronos-Tokenizer-base --timeframe daily
+    python benchmarks/token_archive.py --random-init --synthetic-bars 20000 --window 512
+"""
+
+import os
+import io
+import gzip
+import time
+import tempfile
+
+import numpy as np
+
+from common import default_parser, load_model_and_tokenizer, synthetic_series
+from model.data_io import load_bundled_series, OHLCVA_COLS
+from model.token_archive import write_token_archive, read_token_archive
+
+
+def csv_bytes(series):
+    raw = sum(len(df.to_csv(index=False).encode('utf-8')) for df in series.values())
+    zipped = sum(len(gzip.compress(df.to_csv(index=False).encode('utf-8'))) for df in series.values())
+    return raw, zipped
+
+
+def npz_bytes(series):
+    buffer = io.BytesIO()
+    arrays = {}
+    for code, df in series.items():
+        arrays[f'{code}_x'] = df[OHLCVA_COLS].values.astype(np.float32)
+        arrays[f'{code}_t'] = df['timestamps'].values.astype('datetime64[ns]').astype(np.int64)
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getbuffer().nbytes
+
+
+def main():
+    parser = default_parser('Token 压缩归档基准测试')
+    parser.add_argument('--timeframe', default='daily', choices=['daily', '5min'])
+    parser.add_argument('--window', type=int, default=512, help='归一化窗口长度 (K线数)')
+    parser.add_argument('--synthetic-bars', type=int, default=0, help='>0 时改用随机游走数据, 每只股票的K线数')
+    parser.add_argument('--synthetic-series', type=int, default=10, help='随机游走数据的股票数')
+    parser.add_argument('--batch-size', type=int, default=64, help='分词时每批窗口数')
+    parser.add_argument('--decode-batch-size', type=int, default=256, help='解码时每批窗口数')
+    args = parser.parse_args()
+
+    _, tokenizer = load_model_and_tokenizer(args)
+    tokenizer = tokenizer.to(args.device)
+    if args.synthetic_bars > 0:
+        series = synthetic_series(args.synthetic_series, args.synthetic_bars, args.seed)
+        source = f'随机游走 {args.synthetic_series} x {args.synthetic_bars}'
+    else:
+        series = load_bundled_series(args.timeframe)
+        source = f'data/*_historical_{args.timeframe}.csv'
+    if not series:
+        raise SystemExit('没有可用的历史数据')
+    n_bars = sum(len(df) for df in series.values())
+    print(f"数据: {source}, {len(series)} 只股票, {n_bars} 根K线, 窗口: {args.window}, "
+          f"token: {tokenizer.s1_bits}+{tokenizer.s2_bits} bits")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'archive.npz')
+        start = time.perf_counter()
+        info = write_token_archive(path, tokenizer, series, window=args.window, device=args.device, batch_size=args.batch_size)
+        write_time = time.perf_counter() - start
+        archive_size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        restored = read_token_archive(path, tokenizer, device=args.device, batch_size=args.decode_batch_size)
+        read_time = time.perf_counter() - start
+
+    raw_csv, gzip_csv = csv_bytes(series)
+    sizes = [('CSV', raw_csv), ('gzip CSV', gzip_csv), ('float32 npz (无损)', npz_bytes(series)), ('Token 归档', archive_size)]
+    print(f"\n{'格式':<20}{'大小 (KB)':>12}{'字节/K线':>12}{'相对CSV':>10}")
+    for name, size in sizes:
+        print(f"{name:<20}{size / 1024:>12.1f}{size / n_bars:>12.2f}{size / raw_csv:>10.1%}")
+
+    print(f"\n窗口数: {info['n_windows']}")
+    print(f"写入 (归一化+分词): {write_time:.2f}s, {n_bars / write_time:.0f} 根K线/秒")
+    print(f"读取 (解码+反归一化): {read_time:.2f}s, {n_bars / read_time:.0f} 根K线/秒")
+
+    original = np.concatenate([df[OHLCVA_COLS].values for df in series.values()])
+    rebuilt = np.concatenate([restored[code][OHLCVA_COLS].values for code in series])
+    mae = np.abs(rebuilt - original).mean(axis=0)
+    scale = np.abs(original).mean(axis=0)
+    print(f"\n{'列':<10}{'MAE':>14}{'相对误差':>10}")
+    for col, col_mae, col_scale in zip(OHLCVA_COLS, mae, scale):
+        print(f"{col:<10}{col_mae:>14.4f}{col_mae / col_scale if col_scale else float('nan'):>10.2%}")
+    if args.random_init:
+        print("\n注意: 随机初始化的 Tokenizer 未经训练, 以上重建误差不代表预训练模型的效果")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程工作池扩展性基准测试
+
+对比两种 CPU 执行方式的耗时随核数的变化:
+- 单进程: torch 线程数 = N
+- 工作池: N 个进程 (每个进程 --threads-per-worker 个线程), 共享内存中的模型权重
+
+测试两种负载: 单只股票多条采样路径 (按路径切分) 和多只股票批量预测 (按股票切分)。
+
+用法:
+    python benchmarks/worker_pool_scaling.py --random-init --pred-len 10 --sample-count 16
+"""
+
+import os
+import time
+
+import torch
+
+from common import default_parser, build_predictor, future_timestamps
+from model.data_io import load_bundled_series
+
+
+def core_grid(max_cores):
+    grid = [1]
+    while grid[-1] * 2 <= max_cores:
+        grid.append(grid[-1] * 2)
+    if grid[-1] != max_cores:
+        grid.append(max_cores)
+    return grid
+
+
+def timed(fn, repeats):
+    fn()  # 预热
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = default_parser('Kronos 多进程工作池扩展性基准测试')
+    parser.add_argument('--timeframe', default='daily', choices=['daily', '5min'])
+    parser.add_argument('--pred-len', type=int, default=10)
+    parser.add_argument('--sample-count', type=int, default=16, help='单只股票负载的采样路径数')
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--max-cores', type=int, default=os.cpu_count())
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    predictor = build_predictor(args)
+    series = load_bundled_series(args.timeframe)
+    codes = list(series)
+    df_list = [series[c][['open', 'high', 'low', 'close', 'volume', 'amount']] for c in codes]
+    x_ts_list = [series[c]['timestamps'] for c in codes]
+    y_ts_list = [future_timestamps(ts, args.pred_len) for ts in x_ts_list]
+
+    def single():
+        predictor.predict(df_list[0], x_ts_list[0], y_ts_list[0], args.pred_len, sample_count=args.sample_count, verbose=False)
+
+    def batch():
+        predictor.predict_batch(df_list, x_ts_list, y_ts_list, args.pred_len, sample_count=1, verbose=False)
+
+    print(f"股票数: {len(codes)}, 历史长度: {len(df_list[0])}, 预测步数: {args.pred_len}, CPU核数: {os.cpu_count()}")
+    print(f"\n{'cores':>6}{'single/thr':>12}{'single/pool':>13}{'batch/thr':>11}{'batch/pool':>12}")
+
+    results = {}
+    for cores in core_grid(args.max_cores):
+        torch.set_num_threads(cores)
+        thread_times = (timed(single, args.repeats), timed(batch, args.repeats))
+
+        torch.set_num_threads(1)
+        predictor.start_worker_pool(num_workers=max(cores // args.threads_per_worker, 1), threads_per_worker=args.threads_per_worker)
+        pool_times = (timed(single, args.repeats), timed(batch, args.repeats))
+        predictor.close_worker_pool()
+
+        results[cores] = thread_times + pool_times
+        print(f"{cores:>6}{thread_times[0]:>12.3f}{pool_times[0]:>13.3f}{thread_times[1]:>11.3f}{pool_times[1]:>12.3f}")
+
+    base = results[1]
+    print(f"\n相对1核单进程的加速比:")
+    print(f"{'cores':>6}{'single/thr':>12}{'single/pool':>13}{'batch/thr':>11}{'batch/pool':>12}")
+    for cores, (st, bt, sp, bp) in results.items():
+        print(f"{cores:>6}{base[0] / st:>12.2f}{base[0] / sp:>13.2f}{base[1] / bt:>11.2f}{base[1] / bp:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线预分词: 为本地历史K线建立 / 增量更新 Token 缓存
+
+每个 (股票, 时间周期, 归一化窗口) 只分词一次, s1/s2 token 以 uint16 内存映射文件保存, 附带索引文件。
+再次运行时只对新增K线形成的窗口分词; 已缓存K线被修改过的股票会整体重建。
+缓存可直接用于推理 (KronosPredictor.predict_from_cache) 和微调 (finetune_kronos.py)。
+
+用法:
+    python build_token_cache.py --timeframe daily --window 512
+    python build_token_cache.py --random-init --timeframe 5min --window 16   # 离线环境
+"""
+
+import os
+import time
+import argparse
+
+import torch
+
+from model.data_io import load_bundled_series, DATA_DIR, RANDOM_TOKENIZER_CONFIG
+from model.kronos import KronosTokenizer
+from model.token_cache import TokenCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kronos 离线预分词缓存')
+    parser.add_argument('--tokenizer', default='NeoQuasar/Kronos-Tokenizer-base', help='Tokenizer路径或Hugging Face名称')
+    parser.add_argument('--random-init', action='store_true', help='使用随机初始化的 Tokenizer (离线环境下测试用)')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='{code}_historical_{timeframe}.csv 所在目录')
+    parser.add_argument('--timeframe', default='daily', choices=['daily', '5min'])
+    parser.add_argument('--cache-dir', default='token_cache', help='缓存根目录')
+    parser.add_argument('--window', type=int, default=512, help='归一化窗口长度 (K线数), 不超过模型 max_context')
+    parser.add_argument('--stride', type=int, default=None, help='相邻窗口起点间隔 (默认等于窗口长度, 每根K线只分词一次)')
+    parser.add_argument('--clip', type=float, default=5)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    tokenizer = KronosTokenizer(**RANDOM_TOKENIZER_CONFIG) if args.random_init else KronosTokenizer.from_pretrained(args.tokenizer)
+    tokenizer = tokenizer.to(args.device).eval()
+
+    series = load_bundled_series(args.timeframe, args.data_dir)
+    cache = TokenCache(args.cache_dir, tokenizer, args.timeframe, args.window, args.stride, args.clip, args.device, args.batch_size)
+
+    start = time.perf_counter()
+    added = cache.update(series)
+    elapsed = time.perf_counter() - start
+
+    new_windows = sum(added.values())
+    print(f"\n缓存目录: {cache.path}")
+    print(f"股票数: {len(series)}, 已缓存: {len(cache.codes)}, 本次新分词窗口: {new_windows}, 耗时: {elapsed:.2f}s"
+          + (f" ({new_windows * args.window / elapsed:.0f} 根K线/秒)" if new_windows else ""))
+    too_short = [code for code in series if cache.n_windows(code) == 0]
+    if too_short:
+        print(f"K线不足 {args.window} 根, 未缓存: {', '.join(too_short)}")
+
+    csv_bytes = sum(os.path.getsize(os.path.join(args.data_dir, f'{code}_historical_{args.timeframe}.csv')) for code in cache.codes)
+    if csv_bytes:
+        print(f"缓存大小: {cache.size_bytes() / 1024:.1f} KB, 对应CSV: {csv_bytes / 1024:.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
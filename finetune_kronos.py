@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kronos 本地微调脚本
+
+流程:
+1. 用 Tokenizer 将 data/ 下的历史K线切成窗口并预先分词, 写入 Token 缓存 (model/token_cache.py);
+   再次运行时只对新增K线形成的窗口分词
+2. 从内存映射文件中随机抽取窗口, 以下一个token为目标微调 Kronos
+   支持梯度累积、Transformer块梯度检查点、bf16 自动混合精度、断点续训
+3. 训练过程中输出 samples/sec 与峰值内存, 结束后保存为可用 from_pretrained 加载的模型目录
+
+用法:
+    # 使用随机初始化的极小模型跑通全流程 (离线环境, 几秒钟)
+    python finetune_kronos.py --tiny --out-dir finetune_output/tiny
+
+    # 在预训练模型上微调
+    python finetune_kronos.py --model NeoQuasar/Kronos-small --tokenizer NeoQuasar/Kronos-Tokenizer-base \\
+        --timeframe daily --window-len 256 --batch-size 8 --accum-steps 4 --max-steps 2000 --bf16 --grad-ckpt
+"""
+
+import os
+import argparse
+
+import torch
+
+from model.data_io import load_bundled_series, DATA_DIR
+from model.kronos import Kronos, KronosTokenizer
+from model.finetune import TokenWindowDataset, KronosFinetuner
+from model.token_cache import TokenCache
+
+# 极小模型配置: 用于在CPU上几秒内验证 分词 -> 训练 -> 检查点 -> 续训 的完整流程
+TINY_TOKENIZER_CONFIG = {
+    'd_in': 6, 'd_model': 32, 'n_heads': 4, 'ff_dim': 64, 'n_enc_layers': 3, 'n_dec_layers': 3,
+    'ffn_dropout_p': 0.0, 'attn_dropout_p': 0.0, 'resid_dropout_p': 0.0, 's1_bits': 4, 's2_bits': 4,
+    'beta': 1.0, 'gamma0': 1.0, 'gamma': 1.0, 'zeta': 1.0, 'group_size': 4
+}
+TINY_MODEL_CONFIG = {
+    's1_bits': 4, 's2_bits': 4, 'n_layers': 2, 'd_model': 32, 'n_heads': 4, 'ff_dim': 64,
+    'ffn_dropout_p': 0.1, 'attn_dropout_p': 0.0, 'resid_dropout_p': 0.1, 'token_dropout_p': 0.0, 'learn_te': True
+}
+TINY_TRAINING = {'window_len': 12, 'stride': 2, 'batch_size': 4, 'max_steps': 20, 'warmup_steps': 5,
+                 'checkpoint_every': 10, 'log_every': 5, 'lr': 1e-3}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Kronos 本地微调')
+    parser.add_argument('--tiny', action='store_true', help='使用随机初始化的极小模型和极小训练配置 (端到端冒烟测试)')
+    parser.add_argument('--model', default='NeoQuasar/Kronos-small', help='预训练模型路径或Hugging Face名称')
+    parser.add_argument('--tokenizer', default='NeoQuasar/Kronos-Tokenizer-base', help='Tokenizer路径或Hugging Face名称')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='{code}_historical_{timeframe}.csv 所在目录')
+    parser.add_argument('--timeframe', default='daily', choices=['daily', '5min'])
+    parser.add_argument('--out-dir', default='finetune_output', help='检查点与最终模型的输出目录')
+    parser.add_argument('--cache-dir', default=None, help='Token 缓存根目录 (默认 <out-dir>/token_cache)')
+    parser.add_argument('--window-len', type=int, default=256, help='训练窗口长度 (K线数)')
+    parser.add_argument('--stride', type=int, default=None, help='相邻窗口起点间隔 (默认 window_len // 4)')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--accum-steps', type=int, default=1, help='梯度累积步数')
+    parser.add_argument('--lr', type=float, default=4e-5)
+    parser.add_argument('--warmup-steps', type=int, default=100)
+    parser.add_argument('--max-steps', type=int, default=1000)
+    parser.add_argument('--bf16', action='store_true', help='前向计算使用 bfloat16 自动混合精度')
+    parser.add_argument('--grad-ckpt', action='store_true', help='对 Transformer 块启用梯度检查点 (以计算换内存)')
+    parser.add_argument('--checkpoint-every', type=int, default=200)
+    parser.add_argument('--log-every', type=int, default=10)
+    parser.add_argument('--no-resume', action='store_true', help='不从已有检查点续训')
+    parser.add_argument('--stop-after', type=int, default=None, help='本次最多训练的步数 (用于分段训练/测试续训)')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.tiny:
+        defaults = {action.dest: action.default for action in parser._actions}
+        for key, value in TINY_TRAINING.items():
+            if getattr(args, key) == defaults[key]:
+                setattr(args, key, value)
+    return args
+
+
+def load_models(args):
+    tokenizer_dir = os.path.join(args.out_dir, 'tokenizer')
+    torch.manual_seed(args.seed)
+    if args.tiny:
+        if os.path.isdir(tokenizer_dir):
+            tokenizer = KronosTokenizer.from_pretrained(tokenizer_dir)
+        else:
+            tokenizer = KronosTokenizer(**TINY_TOKENIZER_CONFIG)
+            tokenizer.save_pretrained(tokenizer_dir)  # 预分词数据依赖于这个随机 Tokenizer, 需一并保存
+        model = Kronos(**TINY_MODEL_CONFIG)
+    else:
+        tokenizer = KronosTokenizer.from_pretrained(args.tokenizer)
+        model = Kronos.from_pretrained(args.model)
+    tokenizer.eval()
+    return model, tokenizer.to(args.device)
+
+
+def main():
+    args = parse_args()
+    model, tokenizer = load_models(args)
+
+    cache = TokenCache(args.cache_dir or os.path.join(args.out_dir, 'token_cache'), tokenizer, args.timeframe, args.window_len,
+                       args.stride or max(args.window_len // 4, 1), device=args.device)
+    added = cache.update(load_bundled_series(args.timeframe, args.data_dir))
+    dataset = TokenWindowDataset(cache)
+    print(f"Token 缓存: {len(dataset.codes)} 只股票, {len(dataset)} 个窗口 (本次新分词 {sum(added.values())} 个) -> {cache.path}")
+
+    trainer = KronosFinetuner(model, dataset, args.out_dir, batch_size=args.batch_size, accum_steps=args.accum_steps, lr=args.lr,
+                              warmup_steps=args.warmup_steps, max_steps=args.max_steps, bf16=args.bf16,
+                              gradient_checkpointing=args.grad_ckpt, checkpoint_every=args.checkpoint_every,
+                              log_every=args.log_every, seed=args.seed, device=args.device)
+    summary = trainer.train(resume=not args.no_resume, stop_after=args.stop_after)
+
+    peak = 'n/a' if summary['peak_memory_mb'] is None else f"{summary['peak_memory_mb']:.0f} MB"
+    speed = 'n/a' if summary['samples_per_sec'] is None else f"{summary['samples_per_sec']:.1f}"
+    print(f"\n训练步数: {summary['step']}/{args.max_steps}, 最近损失: {summary['loss']}, samples/sec: {speed}, 峰值内存: {peak}")
+    if summary['step'] >= args.max_steps:
+        print(f"模型已保存: {os.path.join(args.out_dir, 'model')}")
+
+
+if __name__ == '__main__':
+    main()
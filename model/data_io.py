@@ -0,0 +1,46 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+OHLCVA_COLS = ['open', 'high', 'low', 'close', 'volume', 'amount']
+
+# Default architecture of batch_stock_analysis.BatchStockAnalyzer._init_kronos_model, randomly initialized for
+# offline runs (no pretrained weights available)
+RANDOM_MODEL_CONFIG = {
+    's1_bits': 8, 's2_bits': 8, 'n_layers': 4, 'd_model': 256, 'n_heads': 4, 'ff_dim': 512,
+    'ffn_dropout_p': 0.0, 'attn_dropout_p': 0.0, 'resid_dropout_p': 0.0, 'token_dropout_p': 0.0, 'learn_te': True
+}
+RANDOM_TOKENIZER_CONFIG = {
+    'd_in': 6, 'd_model': 256, 'n_heads': 4, 'ff_dim': 512, 'n_enc_layers': 4, 'n_dec_layers': 4,
+    'ffn_dropout_p': 0.0, 'attn_dropout_p': 0.0, 'resid_dropout_p': 0.0, 's1_bits': 8, 's2_bits': 8,
+    'beta': 1.0, 'gamma0': 1.0, 'gamma': 1.0, 'zeta': 1.0, 'group_size': 4
+}
+
+
+def load_bundled_series(timeframe='daily', data_dir=DATA_DIR):
+    """
+    Reads every {code}_historical_{timeframe}.csv in `data_dir`.
+
+    Timezone-aware timestamps (yfinance exports) are converted to naive local time, and a missing amount column is
+    filled the way `KronosPredictor` fills it.
+
+    Returns:
+        Dict[str, pd.DataFrame]: Stock code -> OHLCVA columns plus a 'timestamps' column, sorted by time.
+    """
+    series = {}
+    pattern = os.path.join(data_dir, f'*_historical_{timeframe}.csv')
+    for path in sorted(glob.glob(pattern)):
+        code = os.path.basename(path).split('_')[0]
+        df = pd.read_csv(path, encoding='utf-8-sig')
+        timestamps = pd.to_datetime(df['timestamps'])
+        if timestamps.dt.tz is not None:
+            timestamps = timestamps.dt.tz_localize(None)
+        df['timestamps'] = timestamps
+        if 'amount' not in df.columns:
+            df['amount'] = df['volume'] * df[['open', 'high', 'low', 'close']].mean(axis=1)
+        df = df.sort_values('timestamps').reset_index(drop=True)
+        series[code] = df[OHLCVA_COLS + ['timestamps']].astype({c: np.float64 for c in OHLCVA_COLS})
+    return series
@@ -0,0 +1,204 @@
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_memory_mb(device):
+    """Peak memory of the process (CPU) or of the allocator (CUDA) in MB, or None if it cannot be measured."""
+    if str(device).startswith('cuda'):
+        return torch.cuda.max_memory_allocated(device) / 2 ** 20
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10  # bytes on macOS, KB on Linux
+
+
+class TokenWindowDataset:
+    """
+    Training windows read from a `TokenCache`. The per-series arrays are memory-mapped, so only the rows of the
+    requested batches are read from disk.
+
+    Args:
+        cache (TokenCache): Token cache; its windows are the training windows.
+        codes (List[str], optional): Series to use. Defaults to all cached series.
+    """
+
+    def __init__(self, cache, codes=None):
+        self.cache = cache
+        self.codes = [str(c) for c in (cache.codes if codes is None else codes) if cache.n_windows(c)]
+        self.arrays = [cache.windows(code) for code in self.codes]
+        counts = [cache.n_windows(code) for code in self.codes]
+        self.series_of = np.repeat(np.arange(len(self.codes)), counts)  # global window -> series
+        self.offsets = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+
+    def __len__(self):
+        return len(self.series_of)
+
+    def batch(self, indices):
+        """Returns (s1_ids, s2_ids, stamps) tensors for the given windows."""
+        indices = np.sort(indices)
+        series = self.series_of[indices]
+        rows = indices - self.offsets[series]
+        parts = {'s1': [], 's2': [], 'stamps': []}
+        for k in np.unique(series):
+            local = rows[series == k]
+            for name in parts:
+                parts[name].append(self.arrays[k][name][local])
+        s1, s2, stamps = (np.concatenate(parts[name]) for name in ('s1', 's2', 'stamps'))
+        return (torch.from_numpy(s1.astype(np.int64)), torch.from_numpy(s2.astype(np.int64)),
+                torch.from_numpy(stamps.astype(np.float32)))
+
+
+class KronosFinetuner:
+    """
+    Next-token fine-tuning of a `Kronos` model on a `TokenWindowDataset`.
+
+    Each optimizer step averages the gradients of `accum_steps` micro-batches of `batch_size` windows, so the
+    effective batch grows without the activation memory. Windows are drawn without replacement in an order that
+    is reshuffled every epoch from `seed`. The model, optimizer, scheduler, RNG state and position in that order
+    are checkpointed to `out_dir/checkpoint.pt`, and `train` continues from it. A run that is interrupted and
+    resumed therefore sees the same batches as an uninterrupted one.
+
+    Args:
+        model (Kronos): Model to fine-tune.
+        dataset (TokenWindowDataset): Pre-tokenized windows.
+        out_dir (str): Directory for checkpoints and the final model.
+        batch_size (int): Windows per micro-batch.
+        accum_steps (int): Micro-batches per optimizer step.
+        lr (float): Peak learning rate, reached after `warmup_steps` and then decayed with a cosine to 10%.
+        weight_decay (float): AdamW weight decay.
+        grad_clip (float): Gradient norm clipping.
+        warmup_steps (int): Steps of linear learning-rate warmup.
+        max_steps (int): Optimizer steps to train for.
+        bf16 (bool): Run the forward pass under bfloat16 autocast.
+        gradient_checkpointing (bool): Recompute Transformer block activations in the backward pass.
+        checkpoint_every (int): Optimizer steps between checkpoints.
+        log_every (int): Optimizer steps between log lines.
+        seed (int): Seed of the window order and of dropout.
+        device (str): Training device.
+    """
+
+    def __init__(self, model, dataset, out_dir, batch_size=16, accum_steps=1, lr=4e-5, weight_decay=0.1, grad_clip=3.0,
+                 warmup_steps=100, max_steps=1000, bf16=False, gradient_checkpointing=False, checkpoint_every=200,
+                 log_every=10, seed=0, device='cpu'):
+        if batch_size > len(dataset):
+            raise ValueError(f"batch_size={batch_size} exceeds the {len(dataset)} windows in the dataset.")
+        self.model = model.to(device)
+        self.dataset = dataset
+        self.out_dir = out_dir
+        self.batch_size = batch_size
+        self.accum_steps = accum_steps
+        self.grad_clip = grad_clip
+        self.max_steps = max_steps
+        self.bf16 = bf16
+        self.checkpoint_every = checkpoint_every
+        self.log_every = log_every
+        self.seed = seed
+        self.device = device
+        self.model.gradient_checkpointing = gradient_checkpointing
+
+        self.optimizer = torch.optim.AdamW(self.model.parameters(), lr=lr, weight_decay=weight_decay)
+
+        def schedule(step):
+            if step < warmup_steps:
+                return (step + 1) / warmup_steps
+            progress = (step - warmup_steps) / max(max_steps - warmup_steps, 1)
+            return 0.1 + 0.9 * 0.5 * (1 + math.cos(math.pi * min(progress, 1.0)))
+
+        self.scheduler = torch.optim.lr_scheduler.LambdaLR(self.optimizer, schedule)
+        self.step = 0
+        self.history = []
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.out_dir, 'checkpoint.pt')
+
+    def _micro_batch(self, position):
+        """Window indices of the `position`-th micro-batch of the shuffled stream."""
+        per_epoch = len(self.dataset) // self.batch_size
+        epoch, i = divmod(position, per_epoch)
+        order = np.random.default_rng(self.seed + epoch).permutation(len(self.dataset))
+        return order[i * self.batch_size:(i + 1) * self.batch_size]
+
+    def save_checkpoint(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        state = {'model': self.model.state_dict(), 'optimizer': self.optimizer.state_dict(), 'scheduler': self.scheduler.state_dict(),
+                 'step': self.step, 'history': self.history, 'rng': torch.get_rng_state()}
+        tmp_path = self.checkpoint_path + '.tmp'
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, self.checkpoint_path)  # never leave a half-written checkpoint behind
+
+    def load_checkpoint(self):
+        state = torch.load(self.checkpoint_path, map_location=self.device, weights_only=False)
+        self.model.load_state_dict(state['model'])
+        self.optimizer.load_state_dict(state['optimizer'])
+        self.scheduler.load_state_dict(state['scheduler'])
+        self.step = state['step']
+        self.history = state['history']
+        torch.set_rng_state(state['rng'])
+
+    def loss(self, s1_ids, s2_ids, stamps):
+        with torch.autocast(device_type=torch.device(self.device).type, dtype=torch.bfloat16, enabled=self.bf16):
+            s1_logits, s2_logits = self.model(s1_ids[:, :-1], s2_ids[:, :-1], stamps[:, :-1], use_teacher_forcing=True, s1_targets=s1_ids[:, 1:])
+        loss, _, _ = self.model.head.compute_loss(s1_logits.float(), s2_logits.float(), s1_ids[:, 1:], s2_ids[:, 1:])
+        return loss
+
+    def train(self, resume=True, stop_after=None):
+        """
+        Trains until `max_steps` (or `stop_after` more steps), resuming from the checkpoint if there is one.
+
+        Returns:
+            dict: `step`, `loss` (mean of the last log interval), `samples_per_sec` over this run and
+                  `peak_memory_mb`.
+        """
+        if resume and os.path.exists(self.checkpoint_path):
+            self.load_checkpoint()
+            print(f"Resumed from step {self.step}")
+        else:
+            torch.manual_seed(self.seed)
+        last_step = self.max_steps if stop_after is None else min(self.max_steps, self.step + stop_after)
+
+        self.model.train()
+        start, samples, interval_losses = time.perf_counter(), 0, []
+        while self.step < last_step:
+            self.optimizer.zero_grad(set_to_none=True)
+            step_loss = 0.0
+            for k in range(self.accum_steps):
+                batch = self.dataset.batch(self._micro_batch(self.step * self.accum_steps + k))
+                loss = self.loss(*(t.to(self.device) for t in batch)) / self.accum_steps
+                loss.backward()
+                step_loss += loss.item()
+            torch.nn.utils.clip_grad_norm_(self.model.parameters(), self.grad_clip)
+            self.optimizer.step()
+            self.scheduler.step()
+            self.step += 1
+            samples += self.batch_size * self.accum_steps
+            interval_losses.append(step_loss)
+
+            if self.step % self.log_every == 0 or self.step == last_step:
+                elapsed = time.perf_counter() - start
+                record = {'step': self.step, 'loss': float(np.mean(interval_losses)), 'lr': self.scheduler.get_last_lr()[0],
+                          'samples_per_sec': samples / elapsed, 'peak_memory_mb': peak_memory_mb(self.device)}
+                self.history.append(record)
+                interval_losses = []
+                peak = 'n/a' if record['peak_memory_mb'] is None else f"{record['peak_memory_mb']:.0f}MB"
+                print(f"step {self.step}/{self.max_steps}  loss {record['loss']:.4f}  lr {record['lr']:.2e}  "
+                      f"{record['samples_per_sec']:.1f} samples/s  peak {peak}")
+            if self.step % self.checkpoint_every == 0 or self.step == last_step:
+                self.save_checkpoint()
+
+        self.model.eval()
+        if self.step >= self.max_steps:
+            self.model.save_pretrained(os.path.join(self.out_dir, 'model'))
+        elapsed = time.perf_counter() - start
+        return {'step': self.step, 'loss': self.history[-1]['loss'] if self.history else None,
+                'samples_per_sec': samples / elapsed if samples else None, 'peak_memory_mb': peak_memory_mb(self.device)}
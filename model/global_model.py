@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场共享的机器学习模型
+
+MultiModelPredictor 默认为每只股票单独训练随机森林: 日线只有两百多行样本, 模型噪声大, 且每次请求都要完整训练。
+本模块把所有股票的特征窗口归一化后合并, 离线训练一个多输出随机森林并保存到磁盘;
+在线预测时只需构建最近一个窗口的特征并调用一次 predict。
+
+归一化 (与股票价格、成交量的量级无关):
+- 收盘价、MA5、MA10: 相对窗口最后一根收盘价的涨跌幅
+- 成交量: 相对窗口内平均成交量的偏离
+- RSI: 除以100
+- 涨跌幅: 不变
+目标为之后第 1..horizons 根K线收盘价相对窗口最后一根收盘价的涨跌幅。
+
+训练入口见 MultiModelPredictor.train_global_model 和 train_global_model.py。
+"""
+
+import os
+import pickle
+from datetime import datetime
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+GLOBAL_MODEL_VERSION = 1
+FEATURE_COLUMNS = ['close', 'volume', 'ma5', 'ma10', 'rsi', 'price_change']
+
+
+def normalize_windows(windows):
+    """
+    归一化特征窗口
+    windows: ndarray [m, window_size, 6], 已填充缺失值的特征行, 列顺序同 FEATURE_COLUMNS
+    返回: ndarray [m, window_size * 6]
+    """
+    ref = windows[:, -1, 0][:, np.newaxis]
+    volume_mean = windows[:, :, 1].mean(axis=1, keepdims=True)
+    volume_mean = np.where(volume_mean > 0, volume_mean, 1.0)
+    out = np.empty_like(windows, dtype=np.float64)
+    out[:, :, 0] = windows[:, :, 0] / ref - 1
+    out[:, :, 1] = windows[:, :, 1] / volume_mean - 1
+    out[:, :, 2] = windows[:, :, 2] / ref - 1
+    out[:, :, 3] = windows[:, :, 3] / ref - 1
+    out[:, :, 4] = windows[:, :, 4] / 100
+    out[:, :, 5] = windows[:, :, 5]
+    return out.reshape(len(windows), -1)
+
+
+class GlobalMLModel:
+    """
+    全市场共享的多输出随机森林
+
+    Args:
+        model: 已训练的 RandomForestRegressor (多输出)
+        timeframe: str, 训练数据的时间框架
+        window_size: int, 特征窗口长度
+        horizons: int, 预测步数上限
+        info: dict, 训练信息 (股票数、样本数、训练时间等)
+    """
+
+    def __init__(self, model, timeframe, window_size, horizons, info=None):
+        self.model = model
+        self.timeframe = timeframe
+        self.window_size = window_size
+        self.horizons = horizons
+        self.feature_columns = list(FEATURE_COLUMNS)
+        self.info = info or {}
+
+    @classmethod
+    def train(cls, feature_rows, timeframe, window_size, horizons=5, n_estimators=100, min_samples_leaf=5,
+              max_samples_per_stock=None, seed=42, n_jobs=-1):
+        """
+        用多只股票的特征行训练
+
+        feature_rows: list of ndarray [n, 6], 每只股票已填充缺失值的特征行 (时间顺序)
+        max_samples_per_stock: int, 可选, 每只股票最多取最近的多少个样本, 避免长历史的股票主导训练
+        """
+        X_parts, y_parts = [], []
+        n_stocks = 0
+        for rows in feature_rows:
+            n_samples = len(rows) - window_size - horizons + 1
+            if n_samples <= 0:
+                continue
+            windows = np.lib.stride_tricks.sliding_window_view(rows, window_size, axis=0)[:n_samples].transpose(0, 2, 1)
+            closes = rows[:, 0]
+            ref = closes[window_size - 1:window_size - 1 + n_samples]
+            future = np.lib.stride_tricks.sliding_window_view(closes[window_size:], horizons)[:n_samples]
+            X = normalize_windows(windows)
+            y = future / ref[:, np.newaxis] - 1
+            keep = np.isfinite(X).all(axis=1) & np.isfinite(y).all(axis=1)
+            X, y = X[keep], y[keep]
+            if max_samples_per_stock:
+                X, y = X[-max_samples_per_stock:], y[-max_samples_per_stock:]
+            if len(X):
+                X_parts.append(X)
+                y_parts.append(y)
+                n_stocks += 1
+        if not X_parts:
+            raise ValueError(f"没有足够长的历史数据训练全局模型 (每只股票至少需要 {window_size + horizons} 根K线)")
+
+        X, y = np.concatenate(X_parts), np.concatenate(y_parts)
+        model = RandomForestRegressor(n_estimators=n_estimators, min_samples_leaf=min_samples_leaf, random_state=seed, n_jobs=n_jobs)
+        model.fit(X, y)
+        model.n_jobs = None  # 在线每次只预测一行, 并行反而更慢
+        info = {
+            'n_stocks': n_stocks,
+            'n_samples': len(X),
+            'n_estimators': n_estimators,
+            'min_samples_leaf': min_samples_leaf,
+            'trained_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        return cls(model, timeframe, window_size, horizons, info)
+
+    def predict(self, feature_rows, pred_days):
+        """
+        预测之后 pred_days 根K线的收盘价
+        feature_rows: ndarray [n, 6], 已填充缺失值的特征行, 至少 window_size 行
+        """
+        if pred_days > self.horizons:
+            raise ValueError(f"全局模型最多预测 {self.horizons} 步, 请求 {pred_days} 步")
+        window = feature_rows[-self.window_size:]
+        returns = self.model.predict(normalize_windows(window[np.newaxis]))[0]
+        return window[-1, 0] * (1 + np.atleast_1d(returns)[:pred_days])
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': GLOBAL_MODEL_VERSION, 'model': self.model, 'timeframe': self.timeframe,
+                         'window_size': self.window_size, 'horizons': self.horizons,
+                         'feature_columns': self.feature_columns, 'info': self.info}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if state.get('version') != GLOBAL_MODEL_VERSION or state.get('feature_columns') != FEATURE_COLUMNS:
+            raise ValueError(f"全局模型文件 {path} 的版本或特征与当前代码不一致, 请重新训练")
+        return cls(state['model'], state['timeframe'], state['window_size'], state['horizons'], state['info'])
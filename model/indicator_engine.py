@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技术指标引擎
+
+MultiModelPredictor、BatchStockAnalyzer 和 GUI 的交易信号对同一份K线数据各自计算 MA、MACD、RSI、KDJ 等指标。
+本模块把这些指标集中实现为向量化函数, 并由 IndicatorEngine 按 (数据对象, 指标, 参数) 缓存结果:
+同一个 DataFrame 上的同一指标只计算一次, 之后的调用直接返回缓存。
+
+- 模块级函数 (sma, macd, rsi, bollinger, kdj, atr, true_range) 不带缓存, 输入可以是单只股票的 Series,
+  也可以是每列一只股票的 DataFrame 面板 (kdj, atr 除外)
+- IndicatorEngine 的同名方法接受含 open/high/low/close/volume 列的 DataFrame, 结果按数据对象缓存;
+  数据对象被回收时缓存随之释放。原地修改了价格数据时需调用 invalidate(data)
+- 返回的 Series/DataFrame 是缓存本身, 调用方不要原地修改
+
+默认实例 default_engine 供各调用方共享。逐根K线增量更新的版本见 streaming_indicators。
+"""
+
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+
+def sma(values, window):
+    """简单移动平均"""
+    return values.rolling(window=window).mean()
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """
+    MACD
+    返回: (MACD线, 信号线, 柱状图)
+    """
+    macd_line = close.ewm(span=fast).mean() - close.ewm(span=slow).mean()
+    signal_line = macd_line.ewm(span=signal).mean()
+    return macd_line, signal_line, macd_line - signal_line
+
+
+def rsi(close, window=14):
+    """
+    RSI (涨跌幅的简单移动平均)
+    开头的 NaN (面板中较短股票的填充位置) 不计为0涨跌, 使面板上的结果与逐只计算相同
+    """
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    started = close.notna().cummax()
+    gain = gain.where(started).rolling(window=window).mean()
+    loss = loss.where(started).rolling(window=window).mean()
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+
+def bollinger(close, window=20, num_std=2):
+    """
+    布林带
+    返回: (中轨, 上轨, 下轨)
+    """
+    middle = close.rolling(window=window).mean()
+    std = close.rolling(window=window).std()
+    return middle, middle + std * num_std, middle - std * num_std
+
+
+def kdj(high, low, close, n=9, m1=3, m2=3):
+    """
+    KDJ随机指标
+    RSV = (收盘价 - n日最低价) / (n日最高价 - n日最低价) * 100, 不足n日时为50;
+    K = (1 - 1/m1) * 前K + 1/m1 * RSV, D = (1 - 1/m2) * 前D + 1/m2 * K, 首日K、D为50; J = 3K - 2D;
+    K、D、J 截断到 0-100
+    返回: DataFrame, 列为 RSV, K, D, J
+    """
+    rsv, k, d = _kdj_lines(high, low, close, n, m1, m2)
+    j = 3 * k - 2 * d
+    return pd.DataFrame({'RSV': rsv, 'K': np.clip(k, 0, 100), 'D': np.clip(d, 0, 100),
+                         'J': np.clip(j, 0, 100)}, index=close.index)
+
+
+def _kdj_lines(high, low, close, n, m1, m2):
+    """RSV 和截断前的 K、D (ndarray); 流式 KDJ 从这里取递推状态"""
+    if len(close) < n:
+        neutral = np.full(len(close), 50.0)
+        return neutral, neutral.copy(), neutral.copy()
+    lowest_low = low.rolling(window=n).min()
+    highest_high = high.rolling(window=n).max()
+    price_range = (highest_high - lowest_low).replace(0, 1e-8)
+    rsv = ((close - lowest_low) / price_range * 100).fillna(50.0)
+
+    # 首日固定为50, 之后为指数平滑 (adjust=False 即上面的递推)
+    k = rsv.copy()
+    k.iloc[0] = 50.0
+    k = k.ewm(alpha=1.0 / m1, adjust=False).mean()
+    d = k.copy()
+    d.iloc[0] = 50.0
+    d = d.ewm(alpha=1.0 / m2, adjust=False).mean()
+    return rsv.to_numpy(), k.to_numpy(), d.to_numpy()
+
+
+def atr(high, low, close, period=14):
+    """
+    ATR 平均真实波幅 (Wilder 平滑)
+    TR = max(最高价 - 最低价, |最高价 - 前收盘价|, |最低价 - 前收盘价|);
+    第 period 根K线的 ATR 为第 1..period 根 TR 的均值, 之后 ATR = ((period - 1) * 前ATR + TR) / period,
+    之前的位置取第 period 根的值; K线不足 period + 1 根时为收盘价的2%
+    """
+    if len(close) <= period:
+        return close * 0.02
+    values = pd.Series(np.nan, index=close.index)
+    values.iloc[period:] = _wilder_atr(true_range(high, low, close), period)
+    values = values.where(values != 0).bfill()
+    return values.fillna(close * 0.02)
+
+
+def true_range(high, low, close):
+    """TR; 首根K线没有前收盘价, 为最高价 - 最低价"""
+    prev_close = close.shift(1)
+    return pd.concat([high - low, (high - prev_close).abs(), (low - prev_close).abs()], axis=1).max(axis=1)
+
+
+def _wilder_atr(tr, period):
+    """第 period 根K线起的 Wilder ATR (ndarray), 需 len(tr) > period"""
+    seeded = tr.iloc[period:].copy()
+    seeded.iloc[0] = tr.iloc[1:period + 1].mean()
+    return seeded.ewm(alpha=1.0 / period, adjust=False).mean().to_numpy()
+
+
+class IndicatorEngine:
+    """
+    按数据对象缓存的技术指标计算
+
+    data 为含价格列的 DataFrame 时结果按 (数据对象, 指标, 参数) 缓存;
+    data 为 dict (如 {'close': 面板}) 等不能弱引用的对象时直接计算, 不缓存。
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.RLock()  # 弱引用回调可能在持锁期间触发
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # 缓存与弱引用不随对象序列化 (进程池)
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def ma(self, data, window, column='close'):
+        return self._memo(data, ('ma', column, window), lambda: sma(data[column], window))
+
+    def pct_change(self, data, column='close'):
+        return self._memo(data, ('pct_change', column), lambda: data[column].pct_change())
+
+    def macd(self, data, fast=12, slow=26, signal=9):
+        """返回: (MACD线, 信号线, 柱状图)"""
+        return self._memo(data, ('macd', fast, slow, signal), lambda: macd(data['close'], fast, slow, signal))
+
+    def rsi(self, data, window=14):
+        return self._memo(data, ('rsi', window), lambda: rsi(data['close'], window))
+
+    def bollinger(self, data, window=20, num_std=2):
+        """返回: (中轨, 上轨, 下轨)"""
+        return self._memo(data, ('bollinger', window, num_std), lambda: bollinger(data['close'], window, num_std))
+
+    def kdj(self, data, n=9, m1=3, m2=3):
+        """返回: DataFrame, 列为 RSV, K, D, J"""
+        return self._memo(data, ('kdj', n, m1, m2), lambda: kdj(data['high'], data['low'], data['close'], n, m1, m2))
+
+    def atr(self, data, period=14):
+        return self._memo(data, ('atr', period), lambda: atr(data['high'], data['low'], data['close'], period))
+
+    def compute(self, data, names):
+        """
+        一次取得多个指标
+        names: 指标名 (如 'macd') 或 (指标名, 参数dict) 的列表, 如 ['macd', ('ma', {'window': 5}), 'kdj']
+        返回: dict, 指标名 (带参数时为 '名称_参数值') -> 对应方法的返回值
+        """
+        results = {}
+        for item in names:
+            name, params = (item, {}) if isinstance(item, str) else item
+            key = '_'.join([name] + [str(value) for value in params.values()])
+            results[key] = getattr(self, name)(data, **params)
+        return results
+
+    def invalidate(self, data):
+        """丢弃 data 的缓存 (数据被原地修改后调用)"""
+        with self._lock:
+            self._cache.pop(id(data), None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _memo(self, data, key, compute):
+        data_id = id(data)
+        try:
+            ref = weakref.ref(data, lambda ref: self._discard(data_id, ref))
+        except TypeError:
+            return compute()
+        with self._lock:
+            entry = self._cache.get(data_id)
+            # id 可能被回收后的新对象复用, 行数变化 (追加K线) 也视为新数据
+            if entry is None or entry[0]() is not data or entry[1] != len(data):
+                entry = (ref, len(data), {})
+                self._cache[data_id] = entry
+            values = entry[2]
+            if key in values:
+                self.hits += 1
+                return values[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            return values.setdefault(key, value)
+
+    def _discard(self, data_id, ref):
+        with self._lock:
+            entry = self._cache.get(data_id)
+            if entry is not None and entry[0] is ref:
+                del self._cache[data_id]
+
+
+default_engine = IndicatorEngine()
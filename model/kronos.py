@@ -1,8 +1,15 @@
 import numpy as np
 import pandas as pd
 import torch
+import torch.utils.checkpoint
 from huggingface_hub import PyTorchModelHubMixin
 import sys
+import time
+import asyncio
+import inspect
+import hashlib
+import threading
+from collections import deque, OrderedDict
 
 from tqdm import trange
 
@@ -34,10 +41,13 @@ class KronosTokenizer(nn.Module, PyTorchModelHubMixin):
            gamma (float): Gamma parameter for BSQuantizer.
            zeta (float): Zeta parameter for BSQuantizer.
            group_size (int): Group size parameter for BSQuantizer.
+           attn_window (int, optional): Local attention window of the encoder and decoder. None for full attention.
+           attn_stride (int, optional): With `attn_window`, also attend to every `attn_stride`-th earlier position.
 
     """
 
-    def __init__(self, d_in, d_model, n_heads, ff_dim, n_enc_layers, n_dec_layers, ffn_dropout_p, attn_dropout_p, resid_dropout_p, s1_bits, s2_bits, beta, gamma0, gamma, zeta, group_size):
+    def __init__(self, d_in, d_model, n_heads, ff_dim, n_enc_layers, n_dec_layers, ffn_dropout_p, attn_dropout_p, resid_dropout_p, s1_bits, s2_bits, beta, gamma0, gamma, zeta, group_size,
+                 attn_window=None, attn_stride=None):
 
         super().__init__()
         self.d_in = d_in
@@ -49,6 +59,8 @@ class KronosTokenizer(nn.Module, PyTorchModelHubMixin):
         self.ffn_dropout_p = ffn_dropout_p
         self.attn_dropout_p = attn_dropout_p
         self.resid_dropout_p = resid_dropout_p
+        self.attn_window = attn_window
+        self.attn_stride = attn_stride
 
         self.s1_bits = s1_bits
         self.s2_bits = s2_bits
@@ -58,12 +70,14 @@ class KronosTokenizer(nn.Module, PyTorchModelHubMixin):
 
         # Encoder Transformer Blocks
         self.encoder = nn.ModuleList([
-            TransformerBlock(self.d_model, self.n_heads, self.ff_dim, self.ffn_dropout_p, self.attn_dropout_p, self.resid_dropout_p)
+            TransformerBlock(self.d_model, self.n_heads, self.ff_dim, self.ffn_dropout_p, self.attn_dropout_p, self.resid_dropout_p,
+                             self.attn_window, self.attn_stride)
             for _ in range(self.enc_layers - 1)
         ])
         # Decoder Transformer Blocks
         self.decoder = nn.ModuleList([
-            TransformerBlock(self.d_model, self.n_heads, self.ff_dim, self.ffn_dropout_p, self.attn_dropout_p, self.resid_dropout_p)
+            TransformerBlock(self.d_model, self.n_heads, self.ff_dim, self.ffn_dropout_p, self.attn_dropout_p, self.resid_dropout_p,
+                             self.attn_window, self.attn_stride)
             for _ in range(self.dec_layers - 1)
         ])
         self.quant_embed = nn.Linear(in_features=self.d_model, out_features=self.codebook_dim) # Linear layer before quantization
@@ -139,40 +153,44 @@ class KronosTokenizer(nn.Module, PyTorchModelHubMixin):
         x = x * q_scale
         return x
 
-    def encode(self, x, half=False):
+    def encode(self, x, half=False, kv_caches=None):
         """
         Encodes the input data into quantized indices.
 
         Args:
             x (torch.Tensor): Input tensor of shape (batch_size, seq_len, d_in).
             half (bool, optional): Whether to use half quantization in BSQuantizer. Defaults to False.
+            kv_caches (List[KVCache], optional): One cache per encoder layer holding earlier bars. When given, `x` holds
+                only the new bars, which are encoded as a continuation of the cached ones and appended to the caches.
 
         Returns:
             torch.Tensor: Quantized indices from BSQuantizer.
         """
         z = self.embed(x)
-        for layer in self.encoder:
-            z = layer(z)
+        for i, layer in enumerate(self.encoder):
+            z = layer(z, kv_cache=None if kv_caches is None else kv_caches[i])
         z = self.quant_embed(z)
 
         bsq_loss, quantized, z_indices = self.tokenizer(z, half)
         return z_indices
 
-    def decode(self, x, half=False):
+    def decode(self, x, half=False, kv_caches=None):
         """
         Decodes quantized indices back to the input data space.
 
         Args:
             x (torch.Tensor): Quantized indices tensor.
             half (bool, optional): Whether the indices were generated with half quantization. Defaults to False.
+            kv_caches (List[KVCache], optional): One cache per decoder layer holding earlier tokens. When given, `x` holds
+                only the new tokens, which are decoded as a continuation of the cached ones and appended to the caches.
 
         Returns:
             torch.Tensor: Reconstructed output tensor of shape (batch_size, seq_len, d_in).
         """
         quantized = self.indices_to_bits(x, half)
         z = self.post_quant_embed(quantized)
-        for layer in self.decoder:
-            z = layer(z)
+        for i, layer in enumerate(self.decoder):
+            z = layer(z, kv_cache=None if kv_caches is None else kv_caches[i])
         z = self.head(z)
         return z
 
@@ -193,9 +211,12 @@ class Kronos(nn.Module, PyTorchModelHubMixin):
         resid_dropout_p (float): Dropout probability for residual connections.
         token_dropout_p (float): Dropout probability for token embeddings.
         learn_te (bool): Whether to use learnable temporal embeddings.
+        attn_window (int, optional): Local self-attention window (see `MultiHeadAttentionWithRoPE`). None for full attention.
+        attn_stride (int, optional): With `attn_window`, also attend to every `attn_stride`-th earlier position.
     """
 
-    def __init__(self, s1_bits, s2_bits, n_layers, d_model, n_heads, ff_dim, ffn_dropout_p, attn_dropout_p, resid_dropout_p, token_dropout_p, learn_te):
+    def __init__(self, s1_bits, s2_bits, n_layers, d_model, n_heads, ff_dim, ffn_dropout_p, attn_dropout_p, resid_dropout_p, token_dropout_p, learn_te,
+                 attn_window=None, attn_stride=None):
         super().__init__()
         self.s1_bits = s1_bits
         self.s2_bits = s2_bits
@@ -208,18 +229,22 @@ class Kronos(nn.Module, PyTorchModelHubMixin):
         self.attn_dropout_p = attn_dropout_p
         self.resid_dropout_p = resid_dropout_p
         self.token_dropout_p = token_dropout_p
+        self.attn_window = attn_window
+        self.attn_stride = attn_stride
 
         self.s1_vocab_size = 2 ** self.s1_bits
         self.token_drop = nn.Dropout(self.token_dropout_p)
         self.embedding = HierarchicalEmbedding(self.s1_bits, self.s2_bits, self.d_model)
         self.time_emb = TemporalEmbedding(self.d_model, self.learn_te)
         self.transformer = nn.ModuleList([
-            TransformerBlock(self.d_model, self.n_heads, self.ff_dim, self.ffn_dropout_p, self.attn_dropout_p, self.resid_dropout_p)
+            TransformerBlock(self.d_model, self.n_heads, self.ff_dim, self.ffn_dropout_p, self.attn_dropout_p, self.resid_dropout_p,
+                             self.attn_window, self.attn_stride)
             for _ in range(self.n_layers)
         ])
         self.norm = RMSNorm(self.d_model)
         self.dep_layer = DependencyAwareLayer(self.d_model)
         self.head = DualHead(self.s1_bits, self.s2_bits, self.d_model)
+        self.gradient_checkpointing = False  # Recompute Transformer block activations in the backward pass of `forward`
         self.apply(self._init_weights)
 
     def _init_weights(self, module):
@@ -258,7 +283,10 @@ class Kronos(nn.Module, PyTorchModelHubMixin):
         x = self.token_drop(x)
 
         for layer in self.transformer:
-            x = layer(x, key_padding_mask=padding_mask)
+            if self.gradient_checkpointing and self.training:
+                x = torch.utils.checkpoint.checkpoint(layer, x, padding_mask, use_reentrant=False)
+            else:
+                x = layer(x, key_padding_mask=padding_mask)
 
         x = self.norm(x)
 
@@ -275,7 +303,7 @@ class Kronos(nn.Module, PyTorchModelHubMixin):
         s2_logits = self.head.cond_forward(x2)
         return s1_logits, s2_logits
 
-    def decode_s1(self, s1_ids, s2_ids, stamp=None, padding_mask=None):
+    def decode_s1(self, s1_ids, s2_ids, stamp=None, padding_mask=None, kv_caches=None):
         """
         Decodes only the s1 tokens.
 
@@ -287,6 +315,8 @@ class Kronos(nn.Module, PyTorchModelHubMixin):
             s2_ids (torch.Tensor): Input tensor of s2 token IDs. Shape: [batch_size, seq_len]
             stamp (torch.Tensor, optional): Temporal stamp tensor. Shape: [batch_size, seq_len]. Defaults to None.
             padding_mask (torch.Tensor, optional): Mask for padding tokens. Shape: [batch_size, seq_len]. Defaults to None.
+            kv_caches (List[KVCache], optional): One cache per Transformer block holding the prefix. When given, the inputs
+                hold only the new tokens, the outputs cover only those tokens and the caches are extended with them.
 
         Returns:
             Tuple[torch.Tensor, torch.Tensor]:
@@ -299,8 +329,8 @@ class Kronos(nn.Module, PyTorchModelHubMixin):
             x = x + time_embedding
         x = self.token_drop(x)
 
-        for layer in self.transformer:
-            x = layer(x, key_padding_mask=padding_mask)
+        for i, layer in enumerate(self.transformer):
+            x = layer(x, key_padding_mask=padding_mask, kv_cache=None if kv_caches is None else kv_caches[i])
 
         x = self.norm(x)
 
@@ -327,6 +357,23 @@ class Kronos(nn.Module, PyTorchModelHubMixin):
         x2 = self.dep_layer(context, sibling_embed, key_padding_mask=padding_mask)
         return self.head.cond_forward(x2)
 
+    def decode_s2_last(self, context, s1_ids):
+        """
+        Same as `decode_s2(context, s1_ids)[:, -1, :]` for a single s1 token per row, without projecting the
+        positions that would be discarded.
+
+        Args:
+            context (torch.Tensor): Context representation of the whole window. Shape: [batch_size, seq_len, d_model]
+            s1_ids (torch.Tensor): Sampled s1 token of the next step. Shape: [batch_size, 1]
+
+        Returns:
+            torch.Tensor: s2 logits of the next step. Shape: [batch_size, s2_vocab_size]
+        """
+        sibling_embed = self.embedding.emb_s1(s1_ids)
+        attn_out = self.dep_layer.cross_attn(query=sibling_embed, key=context, value=context)
+        x2 = self.dep_layer.norm(context[:, -1:, :] + attn_out)
+        return self.head.cond_forward(x2)[:, -1, :]
+
 
 def top_k_top_p_filtering(
         logits,
@@ -370,7 +417,8 @@ def top_k_top_p_filtering(
         return logits
 
 
-def sample_from_logits(logits, temperature=1.0, top_k=None, top_p=None, sample_logits=True):
+def sample_from_logits(logits, temperature=1.0, top_k=None, top_p=None, sample_logits=True, uniforms=None, token_order=None,
+                       generator=None):
     logits = logits / temperature
     if top_k is not None or top_p is not None:
         if top_k > 0 or top_p < 1.0:
@@ -380,69 +428,281 @@ def sample_from_logits(logits, temperature=1.0, top_k=None, top_p=None, sample_l
 
     if not sample_logits:
         _, x = top_k(probs, k=1, dim=-1)
+    elif uniforms is not None:
+        x = inverse_cdf_sample(probs, uniforms, token_order)
     else:
-        x = torch.multinomial(probs, num_samples=1)
+        x = torch.multinomial(probs, num_samples=1, generator=generator)
 
     return x
 
 
-def auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len, clip=5, T=1.0, top_k=0, top_p=0.99, sample_count=5, verbose=False):
-    with torch.no_grad():
-        batch_size = x.size(0)
-        initial_seq_len = x.size(1)
-        x = torch.clip(x, -clip, clip)
+def inverse_cdf_sample(probs, uniforms, token_order=None):
+    """
+    Draws one token per row by inverting the categorical CDF at the given uniforms.
+
+    Args:
+        probs (torch.Tensor): Token probabilities. Shape: [rows, vocab_size]
+        uniforms (torch.Tensor): One uniform in [0, 1) per row. Shape: [rows]
+        token_order (torch.Tensor, optional): Permutation of the vocabulary along which the CDF is accumulated.
+            Correlated uniforms only reduce variance when the order is roughly monotone in the forecast value
+            (see `token_value_order`).
+
+    Returns:
+        torch.Tensor: Sampled token ids. Shape: [rows, 1]
+    """
+    if token_order is not None:
+        probs = probs[:, token_order]
+    cdf = torch.cumsum(probs, dim=-1)
+    target = (uniforms.to(cdf.dtype) * cdf[:, -1]).unsqueeze(-1)
+    idx = torch.searchsorted(cdf, target, right=True).clamp_(max=probs.size(-1) - 1)
+    if token_order is not None:
+        idx = token_order[idx]
+    return idx
 
-        device = x.device
-        x = x.unsqueeze(1).repeat(1, sample_count, 1, 1).reshape(-1, x.size(1), x.size(2)).to(device)
-        x_stamp = x_stamp.unsqueeze(1).repeat(1, sample_count, 1, 1).reshape(-1, x_stamp.size(1), x_stamp.size(2)).to(device)
-        y_stamp = y_stamp.unsqueeze(1).repeat(1, sample_count, 1, 1).reshape(-1, y_stamp.size(1), y_stamp.size(2)).to(device)
 
-        x_token = tokenizer.encode(x, half=True)
+def token_value_order(tokenizer, col=3):
+    """
+    Orders the s1 and s2 vocabularies by the value each token contributes to feature `col` (close by default).
 
-        def get_dynamic_stamp(x_stamp, y_stamp, current_seq_len, pred_step):
+    The contribution is taken along the residual path of the tokenizer decoder, `head(post_quant_embed(bits))`,
+    with the other sub-token's bits set to zero. It ignores the decoder's attention and feed-forward layers, so
+    it is only a proxy, but one good enough to make inverse-CDF sampling close to monotone in the forecast.
 
-            if current_seq_len <= max_context - pred_step:
-                return torch.cat([x_stamp, y_stamp[:, :pred_step, :]], dim=1)
-            else:
-                start_idx = max_context - pred_step
-                return torch.cat([x_stamp[:, -start_idx:, :], y_stamp[:, :pred_step, :]], dim=1)
+    Returns:
+        List[torch.Tensor]: Vocabulary permutations for s1 and s2 tokens.
+    """
+    orders = []
+    half_bits = tokenizer.codebook_dim // 2
+    ids = torch.arange(2 ** half_bits, device=tokenizer.head.weight.device)
+    bits = tokenizer.indices_to_bits((ids, ids), half=True)
+    for part in (slice(0, half_bits), slice(half_bits, None)):
+        masked = torch.zeros_like(bits)
+        masked[:, part] = bits[:, part]
+        value = tokenizer.head(tokenizer.post_quant_embed(masked))[:, col]
+        orders.append(torch.argsort(value))
+    return orders
+
+
+SAMPLING_MODES = ('iid', 'antithetic', 'sobol')
+
+
+def draw_path_uniforms(mode, batch_size, sample_count, n_dims, device, generator=None):
+    """
+    Draws the uniforms that drive inverse-CDF token sampling for every sample path.
+
+    - 'iid': returns None; tokens are drawn independently with `torch.multinomial`.
+    - 'antithetic': paths come in pairs (u, 1 - u) within each series.
+    - 'sobol': the paths of each series are the points of an independently scrambled Sobol sequence.
 
-        if verbose:
-            ran = trange
+    Args:
+        n_dims (int): Uniforms per path, two per generated step (s1 then s2).
+        generator (torch.Generator, optional): Source of randomness, drawn from on its own device. Defaults to the
+            global CPU generator.
+
+    Returns:
+        torch.Tensor or None: Uniforms of shape [batch_size * sample_count, n_dims], rows ordered like the
+                              repeated sample paths (series-major).
+    """
+    if mode == 'iid':
+        return None
+    rng_device = None if generator is None else generator.device
+    if mode == 'antithetic':
+        half = torch.rand(batch_size, (sample_count + 1) // 2, 1, n_dims, generator=generator, device=rng_device)
+        u = torch.cat([half, 1.0 - half], dim=2).reshape(batch_size, -1, n_dims)[:, :sample_count]
+    elif mode == 'sobol':
+        seeds = torch.randint(0, 2 ** 31 - 1, (batch_size,), generator=generator, device=rng_device).tolist()
+        u = torch.stack([torch.quasirandom.SobolEngine(n_dims, scramble=True, seed=seed).draw(sample_count) for seed in seeds])
+    else:
+        raise ValueError(f"Unknown sampling mode '{mode}', expected one of {SAMPLING_MODES}.")
+    return u.reshape(batch_size * sample_count, n_dims).to(device)
+
+
+def generate_tokens(model, x_token, x_stamp, y_stamp, max_context, pred_len, T=1.0, top_k=0, top_p=0.99, verbose=False,
+                    uniforms=None, token_orders=(None, None), generator=None, step_callback=None):
+    """
+    Autoregressively samples `pred_len` (s1, s2) token pairs after the given history tokens.
+
+    Args:
+        model (Kronos): The Kronos model.
+        x_token (List[torch.Tensor]): History s1 and s2 token ids, each of shape [rows, seq_len]. Extended in place.
+        x_stamp (torch.Tensor): History time features. Shape: [rows, seq_len, time_feat]
+        y_stamp (torch.Tensor): Future time features. Shape: [rows, pred_len, time_feat]
+        max_context (int): Maximum window the model attends to.
+        pred_len (int): Number of steps to generate.
+        uniforms (torch.Tensor, optional): Uniforms of shape [rows, 2 * pred_len] for inverse-CDF sampling of the s1 and s2
+                                           token at each step. Tokens are drawn with `torch.multinomial` when omitted.
+        token_orders (Tuple[torch.Tensor, torch.Tensor], optional): Vocabulary orders for inverse-CDF sampling.
+        generator (torch.Generator, optional): Generator for the multinomial draws, on the model's device.
+        step_callback (Callable[[int, int], None], optional): Called with (steps done, pred_len) after every step. It
+            may raise (e.g. `GenerationCancelled`) to abort the generation.
+
+    Returns:
+        List[torch.Tensor]: s1 and s2 token ids of shape [rows, seq_len + pred_len].
+    """
+    initial_seq_len = x_token[0].size(1)
+
+    def get_dynamic_stamp(x_stamp, y_stamp, current_seq_len, pred_step):
+
+        if current_seq_len <= max_context - pred_step:
+            return torch.cat([x_stamp, y_stamp[:, :pred_step, :]], dim=1)
         else:
-            ran = range
-        for i in ran(pred_len):
-            current_seq_len = initial_seq_len + i
+            start_idx = max_context - pred_step
+            return torch.cat([x_stamp[:, -start_idx:, :], y_stamp[:, :pred_step, :]], dim=1)
 
-            if current_seq_len <= max_context:
-                input_tokens = x_token
-            else:
-                input_tokens = [t[:, -max_context:].contiguous() for t in x_token]
+    if verbose:
+        ran = trange
+    else:
+        ran = range
+    for i in ran(pred_len):
+        current_seq_len = initial_seq_len + i
+
+        if current_seq_len <= max_context:
+            input_tokens = x_token
+        else:
+            input_tokens = [t[:, -max_context:].contiguous() for t in x_token]
+
+        current_stamp = get_dynamic_stamp(x_stamp, y_stamp, current_seq_len, i)
+
+        s1_logits, context = model.decode_s1(input_tokens[0], input_tokens[1], current_stamp)
+        s1_logits = s1_logits[:, -1, :]
+        u_pre, u_post = (None, None) if uniforms is None else (uniforms[:, 2 * i], uniforms[:, 2 * i + 1])
+        sample_pre = sample_from_logits(s1_logits, temperature=T, top_k=top_k, top_p=top_p, sample_logits=True,
+                                        uniforms=u_pre, token_order=token_orders[0], generator=generator)
+
+        s2_logits = model.decode_s2(context, sample_pre)
+        s2_logits = s2_logits[:, -1, :]
+        sample_post = sample_from_logits(s2_logits, temperature=T, top_k=top_k, top_p=top_p, sample_logits=True,
+                                         uniforms=u_post, token_order=token_orders[1], generator=generator)
 
-            current_stamp = get_dynamic_stamp(x_stamp, y_stamp, current_seq_len, i)
+        x_token[0] = torch.cat([x_token[0], sample_pre], dim=1)
+        x_token[1] = torch.cat([x_token[1], sample_post], dim=1)
 
-            s1_logits, context = model.decode_s1(input_tokens[0], input_tokens[1], current_stamp)
-            s1_logits = s1_logits[:, -1, :]
-            sample_pre = sample_from_logits(s1_logits, temperature=T, top_k=top_k, top_p=top_p, sample_logits=True)
+        torch.cuda.empty_cache()
 
-            s2_logits = model.decode_s2(context, sample_pre)
-            s2_logits = s2_logits[:, -1, :]
-            sample_post = sample_from_logits(s2_logits, temperature=T, top_k=top_k, top_p=top_p, sample_logits=True)
+        if step_callback is not None:
+            step_callback(i + 1, pred_len)
 
-            x_token[0] = torch.cat([x_token[0], sample_pre], dim=1)
-            x_token[1] = torch.cat([x_token[1], sample_post], dim=1)
+    return x_token
 
-            torch.cuda.empty_cache()
 
-        input_tokens = [t[:, -max_context:].contiguous() for t in x_token]
-        z = tokenizer.decode(input_tokens, half=True)
-        z = z.reshape(batch_size, sample_count, z.size(1), z.size(2))
-        preds = z.cpu().numpy()
-        preds = np.mean(preds, axis=1)
+def sample_paths(tokenizer, model, x_token, x_stamp, y_stamp, max_context, pred_len, T, top_k, top_p, sample_count, verbose=False,
+                 sampling='iid', step_callback=None):
+    """
+    Generates `sample_count` paths per series from already tokenized history and decodes them.
+
+    `sampling` selects how the token draws of the paths of one series relate to each other (see `draw_path_uniforms`).
+
+    Returns:
+        np.ndarray: Decoded (normalized) window of shape [batch_size, sample_count, window, d_in], whose
+                    last `pred_len` steps are the forecast.
+    """
+    batch_size = x_token[0].size(0)
+    x_token = [t.repeat_interleave(sample_count, dim=0) for t in x_token]
+    x_stamp = x_stamp.repeat_interleave(sample_count, dim=0)
+    y_stamp = y_stamp.repeat_interleave(sample_count, dim=0)
+
+    uniforms = draw_path_uniforms(sampling, batch_size, sample_count, 2 * pred_len, x_stamp.device)
+    token_orders = token_value_order(tokenizer) if uniforms is not None else (None, None)
+
+    x_token = generate_tokens(model, x_token, x_stamp, y_stamp, max_context, pred_len, T, top_k, top_p, verbose, uniforms, token_orders,
+                              step_callback=step_callback)
+    return decode_paths(tokenizer, x_token, batch_size, max_context)
+
+
+def decode_paths(tokenizer, x_token, batch_size, max_context):
+    """
+    Decodes the last `max_context` tokens of every sample path.
+
+    Args:
+        x_token (List[torch.Tensor]): s1 and s2 token ids of shape [batch_size * sample_count, seq_len], series-major.
 
+    Returns:
+        np.ndarray: Decoded (normalized) window of shape [batch_size, sample_count, window, d_in].
+    """
+    input_tokens = [t[:, -max_context:].contiguous() for t in x_token]
+    z = tokenizer.decode(input_tokens, half=True)
+    z = z.reshape(batch_size, -1, z.size(1), z.size(2))
+    return z.cpu().numpy()
+
+
+def auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len, clip=5, T=1.0, top_k=0, top_p=0.99, sample_count=5, verbose=False,
+                              sampling='iid', return_samples=False, step_callback=None):
+    """
+    Generates `sample_count` paths per series and averages them.
+
+    With `return_samples=True`, returns `(preds, paths)` where `paths` holds the individual forecast steps of every
+    path, shape [batch_size, sample_count, pred_len, d_in] (normalized, float32, contiguous).
+    """
+    with torch.no_grad():
+        x = torch.clip(x, -clip, clip)
+
+        # Tokenization is deterministic, so the history is encoded once per series rather than once per sample path
+        x_token = tokenizer.encode(x, half=True)
+
+        paths = sample_paths(tokenizer, model, x_token, x_stamp, y_stamp, max_context, pred_len, T, top_k, top_p, sample_count, verbose,
+                             sampling, step_callback)
+        preds = np.mean(paths, axis=1)
+
+        if return_samples:
+            return preds, np.ascontiguousarray(paths[:, :, -pred_len:, :])
         return preds
 
 
+def sequential_auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len, clip=5, T=1.0, top_k=0, top_p=0.99,
+                                         max_samples=32, round_size=4, tolerance=0.02, min_samples=8, target_col=3, verbose=False,
+                                         sampling='iid', return_samples=False, step_callback=None):
+    """
+    Monte Carlo averaging with per-series early stopping.
+
+    Sample paths are generated in rounds of `round_size`. After each round the standard error of the running
+    mean of `target_col` (close by default) is computed at every forecast step; a series stops sampling once
+    it has at least `min_samples` paths and its largest standard error is within `tolerance`. Series that are
+    still uncertain keep sampling until they reach `max_samples`. Since the inputs are normalized per series,
+    `tolerance` is expressed in units of the series' historical standard deviation.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]:
+            - preds: Mean forecast of shape [batch_size, pred_len, d_in] (normalized).
+            - samples_used: Number of paths averaged for each series. Shape: [batch_size]
+            - paths (only with `return_samples=True`): All drawn paths, shape [batch_size, max_samples, pred_len, d_in];
+              slots beyond a series' `samples_used` are NaN.
+    """
+    with torch.no_grad():
+        batch_size = x.size(0)
+        x = torch.clip(x, -clip, clip)
+        x_token = tokenizer.encode(x, half=True)
+
+        paths = np.full((batch_size, max_samples, pred_len, x.size(2)), np.nan, dtype=np.float32)
+        samples_used = np.zeros(batch_size, dtype=np.int64)
+        active = np.arange(batch_size)
+
+        # All active series have drawn the same number of paths, so each round is one batched generation
+        while active.size:
+            done = samples_used[active[0]]
+            n = min(round_size, max_samples - done)
+            idx = torch.from_numpy(active).to(x.device)
+
+            preds = sample_paths(tokenizer, model, [t[idx] for t in x_token], x_stamp[idx], y_stamp[idx], max_context, pred_len,
+                                 T, top_k, top_p, n, verbose, sampling, step_callback)
+            paths[active, done:done + n] = preds[:, :, -pred_len:, :]
+            samples_used[active] += n
+            done += n
+
+            if done >= max_samples:
+                break
+            if done < min_samples:
+                continue
+
+            target = paths[active, :done, :, target_col]
+            std_err = target.std(axis=1, ddof=1) / np.sqrt(done)
+            active = active[std_err.max(axis=1) > tolerance]
+
+        preds = np.nanmean(paths, axis=1)
+        if return_samples:
+            return preds, samples_used, paths
+        return preds, samples_used
+
+
 def calc_time_stamps(x_timestamp):
     time_df = pd.DataFrame()
     time_df['minute'] = x_timestamp.dt.minute
@@ -453,9 +713,123 @@ def calc_time_stamps(x_timestamp):
     return time_df
 
 
+def calc_time_features(timestamps):
+    """
+    Array version of `calc_time_stamps`.
+
+    Args:
+        timestamps (np.ndarray): datetime64 array of any shape.
+
+    Returns:
+        np.ndarray: float32 array of shape `timestamps.shape + (5,)` holding minute, hour, weekday, day and month.
+    """
+    minutes = timestamps.astype('datetime64[m]').astype(np.int64)
+    days = timestamps.astype('datetime64[D]')
+    months = timestamps.astype('datetime64[M]')
+    features = np.empty(timestamps.shape + (5,), dtype=np.float32)
+    features[..., 0] = minutes % 60
+    features[..., 1] = (minutes // 60) % 24
+    features[..., 2] = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    features[..., 3] = (days - months).astype(np.int64) + 1
+    features[..., 4] = months.astype(np.int64) % 12 + 1
+    return features
+
+
+def to_datetime64(timestamps):
+    """Converts a Series, DatetimeIndex or sequence of timestamps to a datetime64[ns] array (local wall time)."""
+    index = pd.DatetimeIndex(timestamps)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.values.astype('datetime64[ns]')
+
+
+class LatencyCostModel:
+    """
+    Online-calibrated cost model of `auto_regressive_inference` on the current machine.
+
+    The wall time of one generation is modelled as
+
+        t = c0 * pred_len + c1 * pred_len * rows * avg_context + c2 * rows * history_len
+
+    where `rows = batch_size * sample_count` and `avg_context` is the mean model window over the
+    autoregressive steps. The first term is the fixed per-step overhead, the second the transformer
+    work per step and the third the one-off tokenizer encode/decode. The coefficients are refitted
+    by non-negative least squares over the most recent observed generations.
+
+    Args:
+        history (int): Number of recent observations kept for fitting.
+    """
+
+    def __init__(self, history=64):
+        self.observations = deque(maxlen=history)
+        self.coef = None
+
+    @staticmethod
+    def features(rows, history_len, pred_len, max_context):
+        avg_context = np.minimum(history_len + np.arange(pred_len), max_context).mean()
+        return np.array([pred_len, pred_len * rows * avg_context, rows * history_len], dtype=np.float64)
+
+    @property
+    def is_calibrated(self):
+        return len(self.observations) >= 3
+
+    def observe(self, rows, history_len, pred_len, max_context, seconds):
+        self.observations.append((self.features(rows, history_len, pred_len, max_context), float(seconds)))
+        self.coef = None
+
+    def _fit(self):
+        A = np.stack([f for f, _ in self.observations])
+        b = np.array([t for _, t in self.observations])
+        active = np.ones(A.shape[1], dtype=bool)
+        coef = np.zeros(A.shape[1])
+        # Drop coefficients that come out negative (measurement noise) and refit the rest
+        while active.any():
+            coef[:] = 0.0
+            coef[active] = np.linalg.lstsq(A[:, active], b, rcond=None)[0]
+            if (coef >= 0).all():
+                break
+            active &= coef > 0
+        self.coef = coef
+
+    def estimate(self, rows, history_len, pred_len, max_context):
+        """Estimated wall time in seconds of one generation."""
+        if not self.observations:
+            raise RuntimeError("LatencyCostModel has no observations, run KronosPredictor.calibrate_latency() first.")
+        if self.coef is None:
+            self._fit()
+        return float(self.features(rows, history_len, pred_len, max_context) @ self.coef)
+
+
+class GenerationCancelled(Exception):
+    """Raised inside a generation whose `CancellationToken` has been cancelled."""
+
+
+class CancellationToken:
+    """
+    Thread-safe flag for aborting a running prediction.
+
+    The async prediction methods check the token after every autoregressive step, so a cancelled request
+    stops within one step instead of running to completion in its executor thread.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise GenerationCancelled("Prediction was cancelled.")
+
+
 class KronosPredictor:
 
-    def __init__(self, model, tokenizer, device="cuda:0", max_context=512, clip=5):
+    def __init__(self, model, tokenizer, device="cuda:0", max_context=512, clip=5, horizon_cache_size=32):
         self.tokenizer = tokenizer
         self.model = model
         self.max_context = max_context
@@ -469,18 +843,293 @@ class KronosPredictor:
         self.tokenizer = self.tokenizer.to(self.device)
         self.model = self.model.to(self.device)
 
-    def generate(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, verbose):
+        self.cost_model = LatencyCostModel()
+        self.last_inference_settings = None
+
+        # Seeded generations, keyed by everything but the horizon (see `_cached_paths`)
+        self.horizon_cache = OrderedDict()
+        self.horizon_cache_size = horizon_cache_size
+        self.last_horizon_cache_status = None
 
-        x_tensor = torch.from_numpy(np.array(x).astype(np.float32)).to(self.device)
-        x_stamp_tensor = torch.from_numpy(np.array(x_stamp).astype(np.float32)).to(self.device)
-        y_stamp_tensor = torch.from_numpy(np.array(y_stamp).astype(np.float32)).to(self.device)
+        self.worker_pool = None
 
-        preds = auto_regressive_inference(self.tokenizer, self.model, x_tensor, x_stamp_tensor, y_stamp_tensor, self.max_context, pred_len,
-                                          self.clip, T, top_k, top_p, sample_count, verbose)
-        preds = preds[:, -pred_len:, :]
+        # Serializes the async entry points: the model's rotary cache, the horizon cache and
+        # `last_inference_settings` are shared mutable state
+        self._generation_lock = threading.Lock()
+
+    def start_worker_pool(self, num_workers=None, threads_per_worker=1):
+        """
+        Runs subsequent unseeded, fixed-sample-count generations on a `KronosWorkerPool` of CPU processes
+        sharing the model weights. Seeded (horizon-cached) and sequential sampling stay in-process.
+        """
+        from model.worker_pool import KronosWorkerPool
+
+        if torch.device(self.device).type != 'cpu':
+            raise ValueError(f"The worker pool runs on CPU, but the predictor is on {self.device}.")
+        self.close_worker_pool()
+        self.worker_pool = KronosWorkerPool(self.tokenizer, self.model, self.max_context, self.clip, num_workers, threads_per_worker)
+        return self.worker_pool
+
+    def close_worker_pool(self):
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+            self.worker_pool = None
+
+    def generate(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, verbose, sampling='iid', return_samples=False,
+                 seed=None, step_callback=None):
+
+        x_tensor = torch.from_numpy(np.ascontiguousarray(x, dtype=np.float32)).to(self.device)
+        x_stamp_tensor = torch.from_numpy(np.ascontiguousarray(x_stamp, dtype=np.float32)).to(self.device)
+        y_stamp_tensor = torch.from_numpy(np.ascontiguousarray(y_stamp, dtype=np.float32)).to(self.device)
+
+        if seed is not None:
+            paths = self._cached_paths(x_tensor, x_stamp_tensor, y_stamp_tensor, pred_len, T, top_k, top_p, sample_count, verbose,
+                                       sampling, seed, step_callback)
+            preds = np.mean(paths, axis=1)[:, -pred_len:, :]
+            if return_samples:
+                return preds, np.ascontiguousarray(paths[:, :, -pred_len:, :])
+            return preds
+
+        start = time.perf_counter()
+        if self.worker_pool is not None:
+            paths = self.worker_pool.run(x_tensor, x_stamp_tensor, y_stamp_tensor, pred_len, T, top_k, top_p, sample_count, sampling,
+                                         step_callback)
+            result = (np.mean(paths, axis=1), paths) if return_samples else np.mean(paths, axis=1)
+        else:
+            result = auto_regressive_inference(self.tokenizer, self.model, x_tensor, x_stamp_tensor, y_stamp_tensor, self.max_context,
+                                               pred_len, self.clip, T, top_k, top_p, sample_count, verbose, sampling, return_samples,
+                                               step_callback)
+        elapsed = time.perf_counter() - start
+        self.cost_model.observe(x_tensor.size(0) * sample_count, x_tensor.size(1), pred_len, self.max_context, elapsed)
+
+        if return_samples:
+            preds, paths = result
+            return preds[:, -pred_len:, :], paths
+        preds = result[:, -pred_len:, :]
         return preds
 
-    def predict(self, df, x_timestamp, y_timestamp, pred_len, T=1.0, top_k=0, top_p=0.9, sample_count=1, verbose=True):
+    def _cached_paths(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, verbose, sampling, seed, step_callback=None):
+        """
+        Seeded generation that reuses earlier generations of the same request at other horizons.
+
+        Autoregressive sampling produces every horizon as a prefix of the longer ones, so the generated tokens
+        of the longest horizon seen so far are kept per (history, sampling parameters, seed), together with
+        the state of the generator. A shorter horizon is served by decoding a prefix of those tokens, and a
+        longer one continues sampling from where the cached generation stopped. Future time stamps must agree
+        on the shared prefix, otherwise the entry is regenerated.
+
+        With 'iid' sampling the result is identical to a fresh generation with the same seed. The correlated
+        modes draw the uniforms of the extra steps separately, so a continued path is distributed like a fresh
+        one but is not bit-identical to it.
+
+        Returns:
+            np.ndarray: Decoded (normalized) window of shape [batch_size, sample_count, window, d_in].
+        """
+        batch_size, history_len = x.shape[:2]
+        key_parts = (x.cpu().numpy().tobytes(), x_stamp.cpu().numpy().tobytes(),
+                     repr((T, top_k, top_p, sample_count, sampling, seed, self.clip, self.max_context)).encode())
+        key = hashlib.sha1(b'|'.join(key_parts)).hexdigest()
+
+        # Looked up without removing it, so an aborted continuation leaves the entry in place
+        entry = self.horizon_cache.get(key)
+        if entry is not None:
+            shared = min(pred_len, entry['pred_len'])
+            if not torch.equal(entry['y_stamp'][:, :shared], y_stamp[:, :shared]):
+                entry = None
+
+        with torch.no_grad():
+            if entry is None or pred_len > entry['pred_len']:
+                if entry is None:
+                    status, done = 'miss', 0
+                    generator = torch.Generator(device=x.device).manual_seed(seed)
+                    x_token = self.tokenizer.encode(torch.clip(x, -self.clip, self.clip), half=True)
+                    x_token = [t.repeat_interleave(sample_count, dim=0) for t in x_token]
+                else:
+                    status, done = 'extend', entry['pred_len']
+                    generator = torch.Generator(device=x.device)
+                    generator.set_state(entry['rng_state'])
+                    x_token = list(entry['tokens'])
+                    x_stamp = torch.cat([x_stamp, y_stamp[:, :done]], dim=1)
+
+                uniforms = draw_path_uniforms(sampling, batch_size, sample_count, 2 * (pred_len - done), x.device, generator)
+                token_orders = token_value_order(self.tokenizer) if uniforms is not None else (None, None)
+                x_token = generate_tokens(self.model, x_token, x_stamp.repeat_interleave(sample_count, dim=0),
+                                          y_stamp[:, done:].repeat_interleave(sample_count, dim=0), self.max_context,
+                                          pred_len - done, T, top_k, top_p, verbose, uniforms, token_orders, generator, step_callback)
+                entry = {'tokens': x_token, 'y_stamp': y_stamp, 'pred_len': pred_len, 'rng_state': generator.get_state()}
+            else:
+                status = 'hit'
+
+            x_token = [t[:, :history_len + pred_len] for t in entry['tokens']]
+            paths = decode_paths(self.tokenizer, x_token, batch_size, self.max_context)
+
+        self.horizon_cache[key] = entry
+        self.horizon_cache.move_to_end(key)
+        while len(self.horizon_cache) > self.horizon_cache_size:
+            self.horizon_cache.popitem(last=False)
+        self.last_horizon_cache_status = status
+        return paths
+
+    def clear_horizon_cache(self):
+        """Drops all cached generations."""
+        self.horizon_cache.clear()
+
+    def generate_sequential(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, max_samples, tolerance, verbose, sampling='iid',
+                            return_samples=False, step_callback=None):
+        """
+        Like `generate`, but draws sample paths in rounds and stops each series once its mean close forecast has
+        converged (see `sequential_auto_regressive_inference`).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Forecast of shape [batch_size, pred_len, d_in] and the number of sample
+                                           paths used per series, followed by the NaN-padded paths with `return_samples=True`.
+        """
+        x_tensor = torch.from_numpy(np.ascontiguousarray(x, dtype=np.float32)).to(self.device)
+        x_stamp_tensor = torch.from_numpy(np.ascontiguousarray(x_stamp, dtype=np.float32)).to(self.device)
+        y_stamp_tensor = torch.from_numpy(np.ascontiguousarray(y_stamp, dtype=np.float32)).to(self.device)
+
+        round_size = min(4, max_samples)
+        return sequential_auto_regressive_inference(self.tokenizer, self.model, x_tensor, x_stamp_tensor, y_stamp_tensor,
+                                                    self.max_context, pred_len, self.clip, T, top_k, top_p,
+                                                    max_samples=max_samples, round_size=round_size, tolerance=tolerance,
+                                                    min_samples=min(2 * round_size, max_samples), verbose=verbose,
+                                                    sampling=sampling, return_samples=return_samples, step_callback=step_callback)
+
+    def _run_generation(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, settings, sample_tolerance, verbose, return_samples=False,
+                        seed=None, step_callback=None):
+        start = time.perf_counter()
+        paths = None
+        if sample_tolerance is None:
+            result = self.generate(x, x_stamp, y_stamp, pred_len, T, top_k, top_p, settings['sample_count'], verbose, settings['sampling'],
+                                   return_samples, seed, step_callback)
+            preds, paths = result if return_samples else (result, None)
+            if seed is not None:
+                settings['horizon_cache'] = self.last_horizon_cache_status
+        else:
+            result = self.generate_sequential(x, x_stamp, y_stamp, pred_len, T, top_k, top_p,
+                                              settings['sample_count'], sample_tolerance, verbose, settings['sampling'], return_samples,
+                                              step_callback)
+            preds, samples_used = result[:2]
+            if return_samples:
+                paths = result[2]
+            settings['samples_used'] = samples_used.tolist()
+        settings['elapsed_seconds'] = time.perf_counter() - start
+        self.last_inference_settings = settings
+        return preds, paths
+
+    @staticmethod
+    def _denormalize_paths(paths, means, stds, quantiles):
+        """Denormalizes sample paths in place and evaluates the requested quantiles over the sample axis."""
+        paths *= (stds + 1e-5)[:, np.newaxis, np.newaxis, :]
+        paths += means[:, np.newaxis, np.newaxis, :]
+        if not quantiles:
+            return paths, None
+        quantile_fn = np.nanquantile if np.isnan(paths).any() else np.quantile
+        return paths, quantile_fn(paths, list(quantiles), axis=1).astype(np.float32)
+
+    def calibrate_latency(self, probes=None):
+        """
+        Calibrates the latency cost model by timing short generations on synthetic inputs.
+
+        Every regular `predict`/`predict_batch` call also feeds the cost model, so this is only needed
+        to bootstrap it before the first latency-budgeted request.
+
+        Args:
+            probes (Iterable[Tuple[int, int, int]], optional): (rows, history_len, pred_len) triples to time.
+                Defaults to a small grid spanning 1/8 to 1/2 of `max_context`.
+        """
+        if probes is None:
+            short, long = max(self.max_context // 8, 8), max(self.max_context // 2, 16)
+            probes = ((1, short, 2), (4, short, 2), (1, long, 2), (4, long, 4))
+        n_time = len(self.time_cols)
+        # The first call pays one-off allocation costs, keep it out of the fit
+        for i, (rows, history_len, pred_len) in enumerate(((1, 8, 1),) + tuple(probes)):
+            x = np.random.randn(rows, history_len, len(self.price_cols) + 2).astype(np.float32)
+            x_stamp = np.zeros((rows, history_len, n_time), dtype=np.float32)
+            y_stamp = np.zeros((rows, pred_len, n_time), dtype=np.float32)
+            self.generate(x, x_stamp, y_stamp, pred_len, T=1.0, top_k=0, top_p=0.9, sample_count=1, verbose=False)
+            if i == 0:
+                self.cost_model.observations.clear()
+
+    def plan_inference(self, latency_budget, batch_size, history_len, pred_len, sample_count, min_context=32):
+        """
+        Chooses the history length and sample count for a request.
+
+        Without a budget the caller's settings are used unchanged. With a budget, candidate contexts are
+        tried from the full history downwards, and for each one the largest sample count (up to the
+        requested `sample_count`) whose estimated latency fits is taken. The longest fitting context
+        wins, since it matters more for forecast quality than extra sample paths. If nothing fits,
+        the cheapest candidate is returned with `within_budget=False`.
+
+        Args:
+            latency_budget (float or None): Wall-time budget in seconds.
+            batch_size (int): Number of series in the request.
+            history_len (int): Number of historical bars supplied by the caller.
+            pred_len (int): Number of prediction steps.
+            sample_count (int): Requested (maximum) number of sample paths.
+            min_context (int): Shortest history the planner may cut down to.
+
+        Returns:
+            dict: The chosen `context` and `sample_count` together with the budget and latency estimate.
+        """
+        settings = {'context': history_len, 'sample_count': sample_count, 'pred_len': pred_len, 'sampling': 'iid',
+                    'latency_budget': latency_budget, 'estimated_seconds': None, 'within_budget': None}
+        if latency_budget is None:
+            return settings
+
+        if not self.cost_model.is_calibrated:
+            self.calibrate_latency()
+
+        min_context = min(min_context, history_len)
+        contexts = []
+        context = history_len
+        while context > min_context:
+            contexts.append(context)
+            context = int(context * 0.8)
+        contexts.append(min_context)
+
+        for context in contexts:
+            for count in range(sample_count, 0, -1):
+                estimate = self.cost_model.estimate(batch_size * count, context, pred_len, self.max_context)
+                if estimate <= latency_budget:
+                    settings.update(context=context, sample_count=count, estimated_seconds=estimate, within_budget=True)
+                    return settings
+
+        estimate = self.cost_model.estimate(batch_size, min_context, pred_len, self.max_context)
+        settings.update(context=min_context, sample_count=1, estimated_seconds=estimate, within_budget=False)
+        return settings
+
+    def predict(self, df, x_timestamp, y_timestamp, pred_len, T=1.0, top_k=0, top_p=0.9, sample_count=1, verbose=True, latency_budget=None,
+                sample_tolerance=None, sampling='iid', return_samples=False, quantiles=None, seed=None, step_callback=None):
+        """
+        Predict future bars of a single time series.
+
+        With `latency_budget` (seconds) set, `sample_count` becomes an upper bound and the predictor
+        picks the longest history and largest sample count that its calibrated cost model expects to
+        fit the budget (see `plan_inference`).
+
+        With `sample_tolerance` set, sample paths are drawn in rounds and sampling stops as soon as the
+        standard error of the mean close forecast (in units of the historical standard deviation) is within
+        the tolerance, with `sample_count` as the cap.
+
+        `sampling` chooses how the sample paths are drawn: 'iid' (independent multinomial draws), 'antithetic'
+        (paired u / 1 - u inverse-CDF draws) or 'sobol' (scrambled Sobol points across the sample paths). The
+        correlated modes reach the same variance of the mean forecast with fewer paths.
+
+        The settings actually used are reported in `pred_df.attrs['inference_settings']` and
+        `self.last_inference_settings`.
+
+        With `return_samples=True` and/or `quantiles` (e.g. `[0.1, 0.5, 0.9]`) set, the result is a tuple
+        `(pred_df, extras)`. `extras['samples']` holds the denormalized paths from the same generation as a
+        contiguous float32 array of shape (1, sample_count, pred_len, 6), and `extras['quantiles']` maps each
+        requested quantile to a DataFrame shaped like `pred_df`.
+
+        With `seed` set, sampling is reproducible and the generation is cached: a later call on the same history
+        and sampling parameters but a different `pred_len` slices or continues it instead of starting over (see
+        `_cached_paths`). `inference_settings['horizon_cache']` reports 'hit', 'extend' or 'miss'.
+
+        `step_callback(step, pred_len)` is called after every autoregressive step (see `predict_async`).
+        """
 
         if not isinstance(df, pd.DataFrame):
             raise ValueError("Input must be a pandas DataFrame.")
@@ -498,32 +1147,27 @@ class KronosPredictor:
         if df[self.price_cols + [self.vol_col, self.amt_vol]].isnull().values.any():
             raise ValueError("Input DataFrame contains NaN values in price or volume columns.")
 
-        x_time_df = calc_time_stamps(x_timestamp)
-        y_time_df = calc_time_stamps(y_timestamp)
-
         x = df[self.price_cols + [self.vol_col, self.amt_vol]].values.astype(np.float32)
-        x_stamp = x_time_df.values.astype(np.float32)
-        y_stamp = y_time_df.values.astype(np.float32)
-
-        x_mean, x_std = np.mean(x, axis=0), np.std(x, axis=0)
-
-        x = (x - x_mean) / (x_std + 1e-5)
-        x = np.clip(x, -self.clip, self.clip)
-
-        x = x[np.newaxis, :]
-        x_stamp = x_stamp[np.newaxis, :]
-        y_stamp = y_stamp[np.newaxis, :]
-
-        preds = self.generate(x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, verbose)
-
-        preds = preds.squeeze(0)
-        preds = preds * (x_std + 1e-5) + x_mean
-
-        pred_df = pd.DataFrame(preds, columns=self.price_cols + [self.vol_col, self.amt_vol], index=y_timestamp)
-        return pred_df
 
-
-    def predict_batch(self, df_list, x_timestamp_list, y_timestamp_list, pred_len, T=1.0, top_k=0, top_p=0.9, sample_count=1, verbose=True):
+        want_samples = return_samples or bool(quantiles)
+        result = self.predict_array(x[np.newaxis], to_datetime64(x_timestamp), to_datetime64(y_timestamp), pred_len, T, top_k, top_p,
+                                    sample_count, verbose, latency_budget, sample_tolerance, sampling, return_samples, quantiles, seed,
+                                    overwrite_input=True, step_callback=step_callback)
+        preds, extras = result if want_samples else (result, None)
+
+        columns = self.price_cols + [self.vol_col, self.amt_vol]
+        pred_df = pd.DataFrame(preds[0], columns=columns, index=y_timestamp)
+        pred_df.attrs['inference_settings'] = self.last_inference_settings
+        if not want_samples:
+            return pred_df
+
+        if quantiles:
+            extras['quantiles'] = {q: pd.DataFrame(extras['quantiles'][j, 0], columns=columns, index=y_timestamp)
+                                   for j, q in enumerate(quantiles)}
+        return pred_df, extras
+
+    def predict_batch(self, df_list, x_timestamp_list, y_timestamp_list, pred_len, T=1.0, top_k=0, top_p=0.9, sample_count=1, verbose=True, latency_budget=None,
+                      sample_tolerance=None, sampling='iid', return_samples=False, quantiles=None, seed=None, step_callback=None):
         """
         Perform parallel (batch) prediction on multiple time series. All series must have the same historical length and prediction length (pred_len).
 
@@ -537,10 +1181,28 @@ class KronosPredictor:
             top_p (float): Top-p (nucleus sampling) threshold.
             sample_count (int): Number of parallel samples per series, automatically averaged internally.
             verbose (bool): Whether to display autoregressive progress.
+            latency_budget (float, optional): Wall-time budget in seconds for the whole batch. When set, `sample_count`
+                                              is an upper bound and the history may be shortened to fit (see `plan_inference`).
+            sample_tolerance (float, optional): Enables sequential sampling. Each series stops drawing paths once the standard
+                                                error of its mean close forecast is within this tolerance (in units of its
+                                                historical standard deviation); `sample_count` is the cap. The number of paths
+                                                used per series is reported as `samples_used`.
+            sampling (str): How sample paths are drawn: 'iid', 'antithetic' or 'sobol' (see `draw_path_uniforms`).
+            return_samples (bool): Also return the denormalized sample paths of this generation.
+            quantiles (List[float], optional): Quantiles of the sample paths to return, e.g. `[0.1, 0.5, 0.9]`.
+            seed (int, optional): Makes sampling reproducible and enables reuse of the generation across horizons
+                                  (see `predict`). Not supported together with `sample_tolerance`.
+            step_callback (Callable[[int, int], None], optional): Called with (steps done, pred_len) after every autoregressive
+                                                                  step; in sequential sampling mode once per round and step.
 
         Returns:
             List[pd.DataFrame]: List of prediction results in the same order as input, each DataFrame contains
                                 `open, high, low, close, volume, amount` columns, indexed by corresponding `y_timestamp`.
+                                The settings used are reported in each DataFrame's `attrs['inference_settings']`.
+                                With `return_samples` or `quantiles` set, a tuple `(pred_dfs, extras)` is returned, where
+                                `extras['samples']` is a contiguous float32 array of shape (batch, samples, pred_len, 6)
+                                and `extras['quantiles']` maps each quantile to a list of per-series DataFrames. In
+                                sequential sampling mode, path slots a series did not use are NaN.
         """
         # Basic validation
         if not isinstance(df_list, (list, tuple)) or not isinstance(x_timestamp_list, (list, tuple)) or not isinstance(y_timestamp_list, (list, tuple)):
@@ -550,77 +1212,582 @@ class KronosPredictor:
 
         num_series = len(df_list)
 
-        x_list = []
-        x_stamp_list = []
-        y_stamp_list = []
-        means = []
-        stds = []
-        seq_lens = []
-        y_lens = []
-
-        for i in range(num_series):
-            df = df_list[i]
+        for i, df in enumerate(df_list):
             if not isinstance(df, pd.DataFrame):
                 raise ValueError(f"Input at index {i} is not a pandas DataFrame.")
             if not all(col in df.columns for col in self.price_cols):
                 raise ValueError(f"DataFrame at index {i} is missing price columns {self.price_cols}.")
 
-            df = df.copy()
-            if self.vol_col not in df.columns:
-                df[self.vol_col] = 0.0
-                df[self.amt_vol] = 0.0
-            if self.amt_vol not in df.columns and self.vol_col in df.columns:
-                df[self.amt_vol] = df[self.vol_col] * df[self.price_cols].mean(axis=1)
+        seq_lens = np.array([len(df) for df in df_list])
+        x_stamp_batch, x_stamp_lens = self._stack_timestamps(x_timestamp_list)
+        y_stamp_batch, y_lens = self._stack_timestamps(y_timestamp_list)
 
-            if df[self.price_cols + [self.vol_col, self.amt_vol]].isnull().values.any():
-                raise ValueError(f"DataFrame at index {i} contains NaN values in price or volume columns.")
+        mismatch = np.flatnonzero(seq_lens != x_stamp_lens)
+        if mismatch.size:
+            i = mismatch[0]
+            raise ValueError(f"Inconsistent lengths at index {i}: x has {seq_lens[i]} vs x_stamp has {x_stamp_lens[i]}.")
+        mismatch = np.flatnonzero(y_lens != pred_len)
+        if mismatch.size:
+            i = mismatch[0]
+            raise ValueError(f"y_timestamp length at index {i} should equal pred_len={pred_len}, got {y_lens[i]}.")
 
-            x_timestamp = x_timestamp_list[i]
-            y_timestamp = y_timestamp_list[i]
+        # Require all series to have consistent historical and prediction lengths for batch processing
+        if len(set(seq_lens.tolist())) != 1:
+            raise ValueError(f"Parallel prediction requires all series to have consistent historical lengths, got: {seq_lens.tolist()}")
+        if len(set(y_lens.tolist())) != 1:
+            raise ValueError(f"Parallel prediction requires all series to have consistent prediction lengths, got: {y_lens.tolist()}")
+
+        x_batch = self._stack_frames(df_list, seq_lens[0])  # (B, seq_len, feat)
+        nan_series = np.flatnonzero(np.isnan(x_batch).any(axis=(1, 2)))
+        if nan_series.size:
+            raise ValueError(f"DataFrame at index {nan_series[0]} contains NaN values in price or volume columns.")
+
+        want_samples = return_samples or bool(quantiles)
+        result = self.predict_array(x_batch, x_stamp_batch, y_stamp_batch, pred_len, T, top_k, top_p, sample_count, verbose,
+                                    latency_budget, sample_tolerance, sampling, return_samples, quantiles, seed, overwrite_input=True,
+                                    step_callback=step_callback)
+        preds, extras = result if want_samples else (result, None)
+        # preds: (B, pred_len, feat)
+
+        columns = pd.Index(self.price_cols + [self.vol_col, self.amt_vol])  # shared by all output frames
+        settings = self.last_inference_settings
+        pred_dfs = []
+        for i in range(num_series):
+            pred_df = pd.DataFrame(preds[i], columns=columns, index=y_timestamp_list[i])
+            pred_df.attrs['inference_settings'] = settings
+            pred_dfs.append(pred_df)
 
-            x_time_df = calc_time_stamps(x_timestamp)
-            y_time_df = calc_time_stamps(y_timestamp)
+        if not want_samples:
+            return pred_dfs
 
-            x = df[self.price_cols + [self.vol_col, self.amt_vol]].values.astype(np.float32)
-            x_stamp = x_time_df.values.astype(np.float32)
-            y_stamp = y_time_df.values.astype(np.float32)
+        if quantiles:
+            extras['quantiles'] = {q: [pd.DataFrame(extras['quantiles'][j, i], columns=columns, index=y_timestamp_list[i])
+                                       for i in range(num_series)]
+                                   for j, q in enumerate(quantiles)}
+        return pred_dfs, extras
 
-            if x.shape[0] != x_stamp.shape[0]:
-                raise ValueError(f"Inconsistent lengths at index {i}: x has {x.shape[0]} vs x_stamp has {x_stamp.shape[0]}.")
-            if y_stamp.shape[0] != pred_len:
-                raise ValueError(f"y_timestamp length at index {i} should equal pred_len={pred_len}, got {y_stamp.shape[0]}.")
+    def predict_array(self, x, x_timestamp, y_timestamp, pred_len, T=1.0, top_k=0, top_p=0.9, sample_count=1, verbose=True,
+                      latency_budget=None, sample_tolerance=None, sampling='iid', return_samples=False, quantiles=None, seed=None,
+                      overwrite_input=False, step_callback=None):
+        """
+        Array-level prediction for a batch of series with equal history length; `predict` and `predict_batch`
+        are wrappers around it. Normalization and denormalization are vectorised over the batch and no
+        DataFrames are built.
 
-            x_mean, x_std = np.mean(x, axis=0), np.std(x, axis=0)
-            x_norm = (x - x_mean) / (x_std + 1e-5)
-            x_norm = np.clip(x_norm, -self.clip, self.clip)
+        Args:
+            x (np.ndarray): OHLCVA bars (`open, high, low, close, volume, amount`) of shape (batch, seq_len, 6).
+            x_timestamp (np.ndarray): datetime64 stamps of the history, shape (batch, seq_len), or (seq_len,) when
+                                      shared by all series.
+            y_timestamp (np.ndarray): datetime64 stamps of the forecast, shape (batch, pred_len) or (pred_len,).
+            overwrite_input (bool): Normalize `x` in place when it already is a writable float32 array, instead of
+                                    working on a copy. The caller's array is left normalized.
 
-            x_list.append(x_norm)
-            x_stamp_list.append(x_stamp)
-            y_stamp_list.append(y_stamp)
-            means.append(x_mean)
-            stds.append(x_std)
+            The remaining arguments are those of `predict_batch`.
 
-            seq_lens.append(x_norm.shape[0])
-            y_lens.append(y_stamp.shape[0])
+        Returns:
+            np.ndarray: Float32 forecast of shape (batch, pred_len, 6). With `return_samples` or `quantiles` set, a
+                        tuple `(preds, extras)`, where `extras['samples']` has shape (batch, samples, pred_len, 6) and
+                        `extras['quantiles']` shape (len(quantiles), batch, pred_len, 6). The settings used are in
+                        `self.last_inference_settings`.
+        """
+        x = np.asarray(x)
+        if x.ndim != 3 or x.shape[2] != len(self.price_cols) + 2:
+            raise ValueError(f"x should have shape (batch, seq_len, {len(self.price_cols) + 2}), got {x.shape}.")
+        if not (overwrite_input and x.dtype == np.float32 and x.flags.writeable):
+            x = np.array(x, dtype=np.float32)
+        nan_series = np.isnan(x).any(axis=(1, 2))
+        if nan_series.any():
+            raise ValueError(f"Series at index {int(np.argmax(nan_series))} contains NaN values in price or volume columns.")
+
+        batch_size, seq_len = x.shape[:2]
+        x_stamp = self._stamp_features(x_timestamp, batch_size, seq_len, 'x_timestamp')
+        y_stamp = self._stamp_features(y_timestamp, batch_size, pred_len, 'y_timestamp')
+
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{sampling}', expected one of {SAMPLING_MODES}.")
+        if seed is not None and sample_tolerance is not None:
+            raise ValueError("seed is not supported together with sample_tolerance.")
+
+        settings = self.plan_inference(latency_budget, batch_size, seq_len, pred_len, sample_count)
+        settings['sampling'] = sampling
+        x = x[:, -settings['context']:]
+        x_stamp = x_stamp[:, -settings['context']:]
+
+        means, stds = x.mean(axis=1), x.std(axis=1)  # (B, feat)
+        x -= means[:, np.newaxis]
+        x /= (stds + 1e-5)[:, np.newaxis]
+        np.clip(x, -self.clip, self.clip, out=x)
+
+        want_samples = return_samples or bool(quantiles)
+        preds, paths = self._run_generation(x, x_stamp, y_stamp, pred_len, T, top_k, top_p, settings, sample_tolerance, verbose,
+                                            want_samples, seed, step_callback)
+        preds *= (stds + 1e-5)[:, np.newaxis]
+        preds += means[:, np.newaxis]
+        if not want_samples:
+            return preds
+
+        paths, quantile_values = self._denormalize_paths(paths, means, stds, quantiles)
+        extras = {}
+        if return_samples:
+            extras['samples'] = paths
+        if quantiles:
+            extras['quantiles'] = quantile_values
+        return preds, extras
+
+    def _stack_frames(self, df_list, seq_len):
+        """
+        Stacks the OHLCVA columns of equally long DataFrames into one float32 array of shape (batch, seq_len, 6).
 
-        # Require all series to have consistent historical and prediction lengths for batch processing
-        if len(set(seq_lens)) != 1:
-            raise ValueError(f"Parallel prediction requires all series to have consistent historical lengths, got: {seq_lens}")
-        if len(set(y_lens)) != 1:
-            raise ValueError(f"Parallel prediction requires all series to have consistent prediction lengths, got: {y_lens}")
+        Frames sharing the same columns are concatenated and converted in one go. A missing volume is filled
+        with zeros (and so is the amount), a missing amount with volume times the mean price, as in `predict`.
+        """
+        # Time is the fastest-varying axis, as in a DataFrame's column blocks, so the per-series statistics
+        # reduce over contiguous memory (pairwise summation) exactly like in `predict`
+        x_batch = np.empty((len(df_list), len(self.price_cols) + 2, seq_len), dtype=np.float32).transpose(0, 2, 1)
+        groups = {}
+        for i, df in enumerate(df_list):
+            groups.setdefault(tuple(df.columns), []).append(i)
+
+        n_price = len(self.price_cols)
+        for columns, index in groups.items():
+            present = [col for col in self.price_cols + [self.vol_col, self.amt_vol] if col in columns]
+            if self.vol_col not in columns:
+                present = self.price_cols
+            frames = [df_list[i] for i in index]
+            stacked = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+            values = stacked[present].to_numpy(dtype=np.float64).reshape(len(index), seq_len, len(present))
+
+            x = np.zeros((len(index), seq_len, n_price + 2), dtype=np.float64)
+            x[..., :len(present)] = values
+            if len(present) == n_price + 1:
+                x[..., -1] = x[..., n_price] * x[..., :n_price].mean(axis=-1)
+            x_batch[index] = x
+        return x_batch
+
+    @staticmethod
+    def _stack_timestamps(timestamp_list):
+        """
+        Converts a list of timestamp Series/DatetimeIndex objects into datetime64 arrays.
 
-        x_batch = np.stack(x_list, axis=0).astype(np.float32)           # (B, seq_len, feat)
-        x_stamp_batch = np.stack(x_stamp_list, axis=0).astype(np.float32) # (B, seq_len, time_feat)
-        y_stamp_batch = np.stack(y_stamp_list, axis=0).astype(np.float32) # (B, pred_len, time_feat)
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The stacked (batch, length) datetime64[ns] array (None if the lengths
+                                           differ) and the length of every entry.
+        """
+        arrays = []
+        for timestamps in timestamp_list:
+            dtype = getattr(timestamps, 'dtype', None)
+            if isinstance(dtype, np.dtype) and dtype.kind == 'M':
+                # Naive datetime Series/DatetimeIndex: no parsing or tz handling needed
+                arrays.append(np.asarray(timestamps).astype('datetime64[ns]', copy=False))
+            else:
+                arrays.append(to_datetime64(timestamps))
+        lens = np.array([len(a) for a in arrays])
+        if len(set(lens.tolist())) > 1:
+            return None, lens
+        return np.stack(arrays), lens
+
+    @staticmethod
+    def _stamp_features(timestamps, batch_size, length, name):
+        timestamps = np.asarray(timestamps)
+        if not np.issubdtype(timestamps.dtype, np.datetime64):
+            raise ValueError(f"{name} should be a datetime64 array, got dtype {timestamps.dtype}.")
+        shape = timestamps.shape
+        if timestamps.ndim == 1:
+            timestamps = timestamps[np.newaxis]
+        if timestamps.ndim != 2 or timestamps.shape[1] != length or timestamps.shape[0] not in (1, batch_size):
+            raise ValueError(f"{name} should have shape ({batch_size}, {length}) or ({length},), got {shape}.")
+        features = calc_time_features(timestamps)
+        if features.shape[0] != batch_size:
+            features = np.repeat(features, batch_size, axis=0)
+        return features
+
+    async def predict_async(self, df, x_timestamp, y_timestamp, pred_len, *, progress=None, cancel_token=None, executor=None, **kwargs):
+        """
+        Awaitable `predict` that runs the generation in an executor.
 
-        preds = self.generate(x_batch, x_stamp_batch, y_stamp_batch, pred_len, T, top_k, top_p, sample_count, verbose)
-        # preds: (B, pred_len, feat)
+        Cancelling the awaiting task (e.g. when a newer request supersedes it) cancels the generation as well: the
+        worker thread stops after the current autoregressive step. The generation can also be stopped through
+        `cancel_token`, in which case the await raises `GenerationCancelled`.
 
+        Args:
+            progress (Callable[[int, int], Any], optional): Called on the event loop with (steps done, pred_len) after
+                every autoregressive step. May be a coroutine function. Replaces the tqdm bar, so `verbose` defaults
+                to False here.
+            cancel_token (CancellationToken, optional): Token to stop the generation from elsewhere.
+            executor (concurrent.futures.Executor, optional): Executor to run in. Defaults to the loop's default executor.
+                Generations of one predictor run one at a time whatever the executor; a superseded request releases
+                the model after its current step.
+            **kwargs: Other keyword arguments of `predict`.
+        """
+        return await self._run_async(self.predict, (df, x_timestamp, y_timestamp, pred_len), kwargs, progress, cancel_token, executor)
+
+    async def predict_batch_async(self, df_list, x_timestamp_list, y_timestamp_list, pred_len, *, progress=None, cancel_token=None,
+                                  executor=None, **kwargs):
+        """Awaitable `predict_batch`, with the same progress and cancellation handling as `predict_async`."""
+        return await self._run_async(self.predict_batch, (df_list, x_timestamp_list, y_timestamp_list, pred_len), kwargs, progress,
+                                     cancel_token, executor)
+
+    async def _run_async(self, func, args, kwargs, progress, cancel_token, executor):
+        loop = asyncio.get_running_loop()
+        token = cancel_token if cancel_token is not None else CancellationToken()
+
+        def on_step(step, total):
+            token.raise_if_cancelled()
+            if progress is None:
+                return
+            if inspect.iscoroutinefunction(progress):
+                asyncio.run_coroutine_threadsafe(progress(step, total), loop)
+            else:
+                loop.call_soon_threadsafe(progress, step, total)
+
+        def run():
+            with self._generation_lock:
+                # The request may have been superseded while it was queued
+                token.raise_if_cancelled()
+                return func(*args, **kwargs)
+
+        kwargs = dict(kwargs, step_callback=on_step)
+        kwargs.setdefault('verbose', False)
+        try:
+            return await loop.run_in_executor(executor, run)
+        except asyncio.CancelledError:
+            token.cancel()
+            raise
+
+    def predict_from_cache(self, cache, codes, y_timestamp_list, pred_len, T=1.0, top_k=0, top_p=0.9, sample_count=1, verbose=True,
+                           sampling='iid', series=None):
+        """
+        Forecasts every series from the `cache.window` bars ending at its last bar, reading the history tokens from a
+        `TokenCache` instead of running the tokenizer encoder.
+
+        A cached window holds the same tokens and normalization as `predict` on its bars would compute, so the
+        result equals `predict_batch` on the last `cache.window` bars. The forecast continues from the end of the
+        window, given in `attrs['context_end']` of each output frame.
+
+        Windows are only cached once complete, so a series usually has bars after its last cached window. Pass the
+        current histories in `series`: series whose last bar is not the end of a cached window get that window
+        tokenized here (see `TokenCache.latest`). Without `series`, a series known to continue past its last cached
+        window raises a ValueError.
+
+        Args:
+            cache (TokenCache): Cache built with this predictor's tokenizer and clip value, with a window no longer
+                                than `max_context`.
+            codes (List[str]): Series to forecast.
+            y_timestamp_list (List[pd.DatetimeIndex or Series]): Forecast timestamps per series, of length `pred_len`.
+                                                                 They must start after the series' last bar.
+            series (Dict[str, pd.DataFrame], optional): Code -> current history, as passed to `TokenCache.update`.
+
+            The remaining arguments are those of `predict_batch`.
+
+        Returns:
+            List[pd.DataFrame]: One forecast per series.
+        """
+        if cache.window > self.max_context:
+            raise ValueError(f"Cache window {cache.window} exceeds max_context={self.max_context}.")
+        if cache.clip != self.clip:
+            raise ValueError(f"Cache was built with clip={cache.clip}, predictor uses clip={self.clip}.")
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{sampling}', expected one of {SAMPLING_MODES}.")
+        if len(y_timestamp_list) != len(codes):
+            raise ValueError("y_timestamp_list must have one entry per code.")
+
+        latest = [cache.latest(code, None if series is None else series[code]) for code in codes]
+        y_timestamps = np.stack([to_datetime64(ts) for ts in y_timestamp_list])
+        for code, window, y_ts in zip(codes, latest, y_timestamps):
+            if y_ts[0] <= np.datetime64(pd.Timestamp(window[5])):
+                raise ValueError(f"y_timestamp of series {code} starts at {pd.Timestamp(y_ts[0])}, not after its context end "
+                                 f"{pd.Timestamp(window[5])}.")
+        s1_ids = torch.from_numpy(np.stack([w[0] for w in latest]).astype(np.int64)).to(self.device)
+        s2_ids = torch.from_numpy(np.stack([w[1] for w in latest]).astype(np.int64)).to(self.device)
+        x_stamp = torch.from_numpy(np.stack([w[2] for w in latest]).astype(np.float32)).to(self.device)
+        means, stds = np.stack([w[3] for w in latest]), np.stack([w[4] for w in latest])
+        y_stamp = self._stamp_features(y_timestamps, len(codes), pred_len, 'y_timestamp')
+        y_stamp = torch.from_numpy(y_stamp).to(self.device)
+
+        with torch.no_grad():
+            paths = sample_paths(self.tokenizer, self.model, [s1_ids, s2_ids], x_stamp, y_stamp, self.max_context, pred_len,
+                                 T, top_k, top_p, sample_count, verbose, sampling)
+        preds = np.mean(paths, axis=1)[:, -pred_len:]
+        preds *= (stds + 1e-5)[:, np.newaxis]
+        preds += means[:, np.newaxis]
+
+        columns = pd.Index(self.price_cols + [self.vol_col, self.amt_vol])
         pred_dfs = []
-        for i in range(num_series):
-            preds_i = preds[i] * (stds[i] + 1e-5) + means[i]
-            pred_df = pd.DataFrame(preds_i, columns=self.price_cols + [self.vol_col, self.amt_vol], index=y_timestamp_list[i])
+        for i, window in enumerate(latest):
+            pred_df = pd.DataFrame(preds[i], columns=columns, index=y_timestamp_list[i])
+            pred_df.attrs['context_end'] = pd.Timestamp(window[5])
             pred_dfs.append(pred_df)
-
         return pred_dfs
 
+    def create_session(self, df, x_timestamp, max_pred_len=64, refresh_every=None, drift_threshold=None):
+        """Starts a `ForecastSession` on the given history (see `ForecastSession`)."""
+        return ForecastSession(self, df, x_timestamp, max_pred_len, refresh_every, drift_threshold)
+
+
+class PrefixState:
+    """
+    Key/value caches of the tokenizer encoder, tokenizer decoder and Kronos transformer for a batch of normalized
+    histories of equal length. Histories are extended bar by bar, and forecasts are sampled from the cached prefix
+    without re-running it. Used by `ForecastSession` (one series) and the walk-forward backtest (many series in
+    lock-step).
+
+    The caller must keep `seq_len` plus the forecast horizon within the model's `max_context`, since the cached
+    prefix cannot slide.
+    """
+
+    def __init__(self, tokenizer, model, device):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.device = device
+        self.reset()
+
+    def reset(self):
+        self.encoder_caches = [KVCache() for _ in self.tokenizer.encoder]
+        self.decoder_caches = [KVCache() for _ in self.tokenizer.decoder]
+        self.model_caches = [KVCache() for _ in self.model.transformer]
+        self.context = None
+        self.s1_logits = None
+
+    @property
+    def seq_len(self):
+        return 0 if self.context is None else self.context.size(1)
+
+    def _tensor(self, array):
+        return torch.from_numpy(np.ascontiguousarray(array, dtype=np.float32)).to(self.device)
+
+    def extend(self, x_norm, x_stamp):
+        """
+        Runs new bars through the tokenizer and model, extending every cache.
+
+        Args:
+            x_norm (np.ndarray): Normalized, clipped bars. Shape: [batch_size, n_bars, d_in]
+            x_stamp (np.ndarray): Their time features. Shape: [batch_size, n_bars, time_feat]
+        """
+        with torch.no_grad():
+            x_token = self.tokenizer.encode(self._tensor(x_norm), half=True, kv_caches=self.encoder_caches)
+            self.tokenizer.decode(x_token, half=True, kv_caches=self.decoder_caches)
+            s1_logits, context = self.model.decode_s1(x_token[0], x_token[1], self._tensor(x_stamp), kv_caches=self.model_caches)
+        self.s1_logits = s1_logits[:, -1, :]
+        self.context = context if self.context is None else torch.cat([self.context, context], dim=1)
+
+    def select(self, index):
+        """Keeps only the given batch rows."""
+        index = torch.as_tensor(index, dtype=torch.long, device=self.context.device)
+        self.encoder_caches = [cache.index_select(index) for cache in self.encoder_caches]
+        self.decoder_caches = [cache.index_select(index) for cache in self.decoder_caches]
+        self.model_caches = [cache.index_select(index) for cache in self.model_caches]
+        self.context = self.context.index_select(0, index)
+        self.s1_logits = self.s1_logits.index_select(0, index)
+
+    def sample(self, y_stamp, T=1.0, top_k=0, top_p=0.9, sample_count=1, sampling='iid'):
+        """
+        Samples `sample_count` continuations of every history.
+
+        Args:
+            y_stamp (np.ndarray): Time features of the forecast steps. Shape: [batch_size, pred_len, time_feat]
+
+        Returns:
+            np.ndarray: Decoded (normalized) paths of shape [batch_size, sample_count, pred_len, d_in].
+        """
+        tokenizer, model = self.tokenizer, self.model
+        batch_size, pred_len = y_stamp.shape[:2]
+        with torch.no_grad():
+            y_stamp_tensor = self._tensor(y_stamp).repeat_interleave(sample_count, dim=0)
+            model_caches = [cache.repeat_interleave(sample_count) for cache in self.model_caches]
+            decoder_caches = [cache.repeat_interleave(sample_count) for cache in self.decoder_caches]
+            context = self.context.repeat_interleave(sample_count, dim=0)
+            s1_logits = self.s1_logits.repeat_interleave(sample_count, dim=0)
+
+            uniforms = draw_path_uniforms(sampling, batch_size, sample_count, 2 * pred_len, context.device)
+            token_orders = token_value_order(tokenizer) if uniforms is not None else (None, None)
+
+            s1_ids, s2_ids = [], []
+            for i in range(pred_len):
+                u_pre, u_post = (None, None) if uniforms is None else (uniforms[:, 2 * i], uniforms[:, 2 * i + 1])
+                sample_pre = sample_from_logits(s1_logits, temperature=T, top_k=top_k, top_p=top_p, sample_logits=True,
+                                                uniforms=u_pre, token_order=token_orders[0])
+                s2_logits = model.decode_s2_last(context, sample_pre)
+                sample_post = sample_from_logits(s2_logits, temperature=T, top_k=top_k, top_p=top_p, sample_logits=True,
+                                                 uniforms=u_post, token_order=token_orders[1])
+                s1_ids.append(sample_pre)
+                s2_ids.append(sample_post)
+                if i + 1 < pred_len:
+                    s1_logits, new_context = model.decode_s1(sample_pre, sample_post, y_stamp_tensor[:, i:i + 1], kv_caches=model_caches)
+                    s1_logits = s1_logits[:, -1, :]
+                    context = torch.cat([context, new_context], dim=1)
+
+            z = tokenizer.decode([torch.cat(s1_ids, dim=1), torch.cat(s2_ids, dim=1)], half=True, kv_caches=decoder_caches)
+        return z.reshape(batch_size, sample_count, pred_len, z.size(-1)).cpu().numpy()
+
+
+class ForecastSession:
+    """
+    Stateful rolling forecaster for one series that is extended one bar at a time.
+
+    The session keeps the tokenized history together with the key/value caches of the tokenizer encoder,
+    tokenizer decoder and Kronos transformer. `append` encodes only the new bars and extends the caches, and
+    `forecast` starts generating from the cached prefix, so neither re-normalizes, re-tokenizes nor re-prefills
+    the history the way a fresh `KronosPredictor.predict` call on the moved window does.
+
+    The normalization statistics are frozen when the state is (re)built from the raw history, which happens:
+
+    - when the history would exceed `window = max_context - max_pred_len` bars; the oldest bars are dropped so
+      that about 1/8 of the window is free again, which keeps rebuilds rare;
+    - every `refresh_every` appended bars, if set;
+    - when a new bar's normalized price lies more than `drift_threshold` standard deviations from the frozen
+      mean, if set.
+
+    Right after a (re)build, `forecast` matches `predict` on the same history; in between, it differs only in
+    using the slightly older statistics.
+
+    Args:
+        predictor (KronosPredictor): Predictor providing the model, tokenizer and device.
+        df (pd.DataFrame): Initial history with price columns and optional volume/amount columns.
+        x_timestamp (pd.Series): Timestamps of the history.
+        max_pred_len (int): Longest horizon `forecast` will be asked for.
+        refresh_every (int, optional): Rebuild the state after this many appended bars.
+        drift_threshold (float, optional): Rebuild the state when a new bar's normalized price exceeds this.
+    """
+
+    def __init__(self, predictor, df, x_timestamp, max_pred_len=64, refresh_every=None, drift_threshold=None):
+        if max_pred_len >= predictor.max_context:
+            raise ValueError(f"max_pred_len={max_pred_len} must be smaller than max_context={predictor.max_context}.")
+        self.predictor = predictor
+        self.max_pred_len = max_pred_len
+        self.window = predictor.max_context - max_pred_len
+        self.refresh_every = refresh_every
+        self.drift_threshold = drift_threshold
+        self.columns = predictor.price_cols + [predictor.vol_col, predictor.amt_vol]
+        self.state = PrefixState(predictor.tokenizer, predictor.model, predictor.device)
+        self.rebuild_count = 0
+
+        x, timestamps = self._to_arrays(df, x_timestamp)
+        self.x = x[-self.window:]
+        self.timestamps = timestamps[-self.window:]
+        self.x_stamp = calc_time_stamps(pd.Series(self.timestamps)).values.astype(np.float32)
+        self.rebuild()
+
+    def __len__(self):
+        return len(self.x)
+
+    def _to_arrays(self, df, timestamps):
+        predictor = self.predictor
+        if isinstance(df, (pd.Series, dict)):
+            df = pd.DataFrame([df])
+        if not isinstance(df, pd.DataFrame):
+            raise ValueError("Input must be a pandas DataFrame, Series or dict.")
+        if not all(col in df.columns for col in predictor.price_cols):
+            raise ValueError(f"Price columns {predictor.price_cols} not found in input.")
+
+        df = df.copy()
+        if predictor.vol_col not in df.columns:
+            df[predictor.vol_col] = 0.0
+            df[predictor.amt_vol] = 0.0
+        if predictor.amt_vol not in df.columns and predictor.vol_col in df.columns:
+            df[predictor.amt_vol] = df[predictor.vol_col] * df[predictor.price_cols].mean(axis=1)
+
+        x = df[self.columns].values.astype(np.float32)
+        if np.isnan(x).any():
+            raise ValueError("Input contains NaN values in price or volume columns.")
+        timestamps = pd.to_datetime(pd.Series(np.atleast_1d(timestamps))).values
+        if len(timestamps) != len(x):
+            raise ValueError(f"Got {len(x)} bars but {len(timestamps)} timestamps.")
+        return x, timestamps
+
+    def _normalize(self, x):
+        x = (x - self.mean) / (self.std + 1e-5)
+        return np.clip(x, -self.predictor.clip, self.predictor.clip)
+
+    def rebuild(self):
+        """Recomputes the normalization statistics from the raw history and re-encodes it."""
+        self.mean, self.std = np.mean(self.x, axis=0), np.std(self.x, axis=0)
+        self.state.reset()
+        self.state.extend(self._normalize(self.x)[np.newaxis], self.x_stamp[np.newaxis])
+        self.bars_since_rebuild = 0
+        self.rebuild_count += 1
+
+    def append(self, bars, timestamps):
+        """
+        Appends one or more new bars.
+
+        Args:
+            bars (pd.DataFrame, pd.Series or dict): New bar(s) with price columns and optional volume/amount.
+            timestamps: Timestamp of the bar, or a sequence of timestamps for several bars.
+
+        Returns:
+            bool: Whether the state was rebuilt (normalization refreshed) instead of extended incrementally.
+        """
+        x, new_timestamps = self._to_arrays(bars, timestamps)
+        x_stamp = calc_time_stamps(pd.Series(new_timestamps)).values.astype(np.float32)
+        self.x = np.concatenate([self.x, x])
+        self.timestamps = np.concatenate([self.timestamps, new_timestamps])
+        self.x_stamp = np.concatenate([self.x_stamp, x_stamp])
+        self.bars_since_rebuild += len(x)
+
+        x_norm = (x - self.mean) / (self.std + 1e-5)
+        n_price = len(self.predictor.price_cols)
+        drifted = self.drift_threshold is not None and np.abs(x_norm[:, :n_price]).max() > self.drift_threshold
+        stale = self.refresh_every is not None and self.bars_since_rebuild >= self.refresh_every
+
+        if len(self.x) > self.window:
+            keep = self.window - max(self.window // 8, 1)
+            self.x, self.timestamps, self.x_stamp = self.x[-keep:], self.timestamps[-keep:], self.x_stamp[-keep:]
+            self.rebuild()
+            return True
+        if drifted or stale:
+            self.rebuild()
+            return True
+        self.state.extend(self._normalize(x)[np.newaxis], x_stamp[np.newaxis])
+        return False
+
+    def refresh(self):
+        """Forces a rebuild with fresh normalization statistics."""
+        self.rebuild()
+
+    def _future_timestamps(self, pred_len):
+        # Median spacing of recent bars; pass y_timestamp explicitly for calendars with gaps
+        step = pd.Series(self.timestamps[-64:]).diff().median()
+        return pd.Series(pd.date_range(pd.Timestamp(self.timestamps[-1]) + step, periods=pred_len, freq=step))
+
+    def forecast(self, pred_len, y_timestamp=None, T=1.0, top_k=0, top_p=0.9, sample_count=1, sampling='iid',
+                 return_samples=False, quantiles=None):
+        """
+        Forecasts the next `pred_len` bars from the cached state.
+
+        Takes the same sampling arguments as `KronosPredictor.predict` and returns the same
+        `pred_df` or `(pred_df, extras)`.
+
+        Args:
+            pred_len (int): Number of prediction steps, at most `max_pred_len`.
+            y_timestamp (pd.Series, optional): Future timestamps. Extrapolated from the median bar spacing if omitted.
+        """
+        if pred_len > self.max_pred_len:
+            raise ValueError(f"pred_len={pred_len} exceeds the session's max_pred_len={self.max_pred_len}.")
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{sampling}', expected one of {SAMPLING_MODES}.")
+        if y_timestamp is None:
+            y_timestamp = self._future_timestamps(pred_len)
+        y_stamp = calc_time_stamps(pd.Series(y_timestamp)).values.astype(np.float32)
+        if y_stamp.shape[0] != pred_len:
+            raise ValueError(f"y_timestamp length should equal pred_len={pred_len}, got {y_stamp.shape[0]}.")
+
+        start = time.perf_counter()
+        paths = self.state.sample(y_stamp[np.newaxis], T, top_k, top_p, sample_count, sampling)
+
+        preds = paths.mean(axis=1)[0] * (self.std + 1e-5) + self.mean
+        settings = {'context': len(self.x), 'sample_count': sample_count, 'pred_len': pred_len, 'sampling': sampling,
+                    'bars_since_rebuild': self.bars_since_rebuild, 'rebuild_count': self.rebuild_count,
+                    'elapsed_seconds': time.perf_counter() - start}
+        pred_df = pd.DataFrame(preds, columns=self.columns, index=y_timestamp)
+        pred_df.attrs['inference_settings'] = settings
+
+        if not (return_samples or quantiles):
+            return pred_df
+        paths, quantile_values = KronosPredictor._denormalize_paths(paths, self.mean[np.newaxis], self.std[np.newaxis], quantiles)
+        extras = {}
+        if return_samples:
+            extras['samples'] = paths
+        if quantiles:
+            extras['quantiles'] = {q: pd.DataFrame(quantile_values[j, 0], columns=self.columns, index=y_timestamp)
+                                   for j, q in enumerate(quantiles)}
+        return pred_df, extras
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MultiModelPredictor 机器学习预测的可替换模型后端
+
+后端 (按预测质量从高到低):
+- 'random_forest_parallel': 随机森林, n_jobs=-1 多核并行训练; 与 'random_forest' 结果相同, 共用模型缓存
+- 'random_forest': 随机森林 (默认, 与原实现相同)
+- 'hist_gradient_boosting': 直方图梯度提升树, 多步输出时每步一个模型
+- 'ridge': 岭回归, 闭式解
+- 'linear': 线性回归, 闭式解
+
+MLCostModel 记录每个后端的训练/预测耗时, 估计一次调用的耗时:
+    训练: t_fit = c0 + c1 * 样本数 * 特征数 * k  (k: 不支持多输出的后端为输出数, 其余为1)
+    预测: t_predict = 每次 predict 的平均耗时 * predict 次数
+系数按最近的观测用非负最小二乘拟合。设置延迟预算时, MultiModelPredictor 选择估计耗时在预算内、质量最高的后端,
+同等质量下选耗时最短的。
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.multioutput import MultiOutputRegressor
+
+
+class MLBackend:
+    """
+    机器学习后端
+
+    Args:
+        name: str, 后端名称
+        model_type: str, 结果中的 model_type
+        estimator: sklearn 回归器类
+        params: dict, 回归器的构造参数
+        spec: dict, 影响预测结果的参数, 作为模型缓存键的一部分
+        quality: int, 质量等级, 延迟预算下优先选择等级高的后端
+        multi_output: bool, 回归器是否原生支持多输出; 否则多步预测时用 MultiOutputRegressor 包装
+    """
+
+    def __init__(self, name, model_type, estimator, params, spec, quality, multi_output=True):
+        self.name = name
+        self.model_type = model_type
+        self.estimator = estimator
+        self.params = params
+        self.spec = spec
+        self.quality = quality
+        self.multi_output = multi_output
+
+    def make(self, n_outputs=1):
+        model = self.estimator(**self.params)
+        if n_outputs > 1 and not self.multi_output:
+            model = MultiOutputRegressor(model)
+        return model
+
+    def fit_scale(self, n_outputs):
+        """训练耗时随输出数增长的倍数"""
+        return n_outputs if not self.multi_output else 1
+
+    def __repr__(self):
+        return f"MLBackend({self.name!r})"
+
+
+_RANDOM_FOREST_SPEC = {'model': 'RandomForest', 'n_estimators': 50, 'random_state': 42}
+
+ML_BACKENDS = {backend.name: backend for backend in (
+    MLBackend('random_forest_parallel', 'RandomForest', RandomForestRegressor,
+              {'n_estimators': 50, 'random_state': 42, 'n_jobs': -1}, _RANDOM_FOREST_SPEC, quality=3),
+    MLBackend('random_forest', 'RandomForest', RandomForestRegressor,
+              {'n_estimators': 50, 'random_state': 42}, _RANDOM_FOREST_SPEC, quality=3),
+    MLBackend('hist_gradient_boosting', 'HistGradientBoosting', HistGradientBoostingRegressor,
+              {'max_iter': 100, 'random_state': 42},
+              {'model': 'HistGradientBoosting', 'max_iter': 100, 'random_state': 42}, quality=2, multi_output=False),
+    MLBackend('ridge', 'Ridge', Ridge, {'alpha': 1.0}, {'model': 'Ridge', 'alpha': 1.0}, quality=1),
+    MLBackend('linear', 'LinearRegression', LinearRegression, {}, {'model': 'LinearRegression'}, quality=0),
+)}
+
+
+def get_backend(backend):
+    """后端名称或 MLBackend 实例 -> MLBackend"""
+    if isinstance(backend, MLBackend):
+        return backend
+    if backend not in ML_BACKENDS:
+        raise ValueError(f"未知的机器学习后端: {backend}, 可选: {', '.join(ML_BACKENDS)}")
+    return ML_BACKENDS[backend]
+
+
+class MLCostModel:
+    """
+    各后端训练/预测耗时的在线估计
+
+    Args:
+        history: int, 每个后端保留的最近观测数
+    """
+
+    def __init__(self, history=32):
+        self.history = history
+        self._fit_obs = {}
+        self._predict_obs = {}
+        self._coef = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        with self._lock:
+            state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def is_calibrated(self, backend):
+        name = get_backend(backend).name
+        return len(self._fit_obs.get(name, ())) >= 2 and len(self._predict_obs.get(name, ())) >= 1
+
+    def observe_fit(self, backend, n_samples, n_features, n_outputs, seconds):
+        backend = get_backend(backend)
+        size = n_samples * n_features * backend.fit_scale(n_outputs)
+        with self._lock:
+            self._fit_obs.setdefault(backend.name, deque(maxlen=self.history)).append((size, float(seconds)))
+            self._coef.pop(backend.name, None)
+
+    def observe_predict(self, backend, n_calls, seconds):
+        if n_calls <= 0:
+            return
+        name = get_backend(backend).name
+        with self._lock:
+            self._predict_obs.setdefault(name, deque(maxlen=self.history)).append(float(seconds) / n_calls)
+
+    def estimate(self, backend, n_samples, n_features, n_outputs=1, n_predict_calls=1):
+        """估计一次训练加 n_predict_calls 次预测的耗时 (秒)"""
+        backend = get_backend(backend)
+        with self._lock:
+            fit_obs = list(self._fit_obs.get(backend.name, ()))
+            predict_obs = list(self._predict_obs.get(backend.name, ()))
+            coef = self._coef.get(backend.name)
+        if not fit_obs or not predict_obs:
+            raise RuntimeError(f"后端 {backend.name} 没有耗时观测, 请先调用 calibrate")
+        if coef is None:
+            coef = self._fit(fit_obs)
+            with self._lock:
+                self._coef[backend.name] = coef
+        size = n_samples * n_features * backend.fit_scale(n_outputs)
+        return float(coef[0] + coef[1] * size) + float(np.mean(predict_obs)) * n_predict_calls
+
+    @staticmethod
+    def _fit(observations):
+        A = np.array([[1.0, size] for size, _ in observations])
+        b = np.array([seconds for _, seconds in observations])
+        active = np.ones(2, dtype=bool)
+        coef = np.zeros(2)
+        # 负系数 (测量噪声) 置0后重新拟合其余项
+        while active.any():
+            coef[:] = 0.0
+            coef[active] = np.linalg.lstsq(A[:, active], b, rcond=None)[0]
+            if (coef >= 0).all():
+                break
+            active &= coef > 0
+        return coef
+
+    def calibrate(self, backends, n_features, sizes=(40, 200), seed=0):
+        """在随机数据上计时训练和预测, 为没有观测的后端建立初始估计"""
+        rng = np.random.default_rng(seed)
+        for backend in backends:
+            backend = get_backend(backend)
+            if self.is_calibrated(backend):
+                continue
+            # 第一次训练包含一次性开销 (导入、线程池启动), 不计入
+            for i, n_samples in enumerate((sizes[0],) + tuple(sizes)):
+                X, y = rng.standard_normal((n_samples, n_features)), rng.standard_normal(n_samples)
+                model = backend.make()
+                start = time.perf_counter()
+                model.fit(X, y)
+                fit_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                model.predict(X[:1])
+                predict_seconds = time.perf_counter() - start
+                if i > 0:
+                    self.observe_fit(backend, n_samples, n_features, 1, fit_seconds)
+                    self.observe_predict(backend, 1, predict_seconds)
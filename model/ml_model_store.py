@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+机器学习模型持久化缓存
+
+MultiModelPredictor 每次预测都要重新拟合 StandardScaler + RandomForestRegressor。
+GUI 刷新时数据往往只多了几根K线, 重新训练没有必要。本模块按 (股票代码, 时间框架, 特征规格) 缓存
+已拟合的 (scaler, model), 同时保存在内存和磁盘上:
+
+- 数据相对训练时新增的K线少于 max_new_bars 根: 直接复用 (命中)
+- 新增K线达到 max_new_bars 根: 先返回旧模型, 同时在后台线程重新训练 (过期)
+- 没有缓存, 或历史数据被修改 (训练用过、仍在当前数据中的任一根K线变化): 同步训练 (未命中)
+
+每次查询都会返回状态和原因, MultiModelPredictor 将其放在结果的 machine_learning['model_cache'] 中。
+"""
+
+import os
+import re
+import json
+import pickle
+import hashlib
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+STORE_VERSION = 2
+
+
+class MLModelStore:
+    """
+    按 (股票代码, 时间框架, 特征规格) 缓存已拟合的 scaler 和模型
+
+    新增K线数的判断: 训练时记录训练数据除最后一根外所有K线的 (收盘价, 成交量)。
+    查询时在新数据中找到其最后 anchor_len 根 (锚点) 最后出现的位置, 其后的K线数减1 (训练时的最后一根) 即为新增K线数;
+    同时比较新数据中仍然存在的全部训练K线 (数据窗口滚动时, 最早的K线可能已不在新数据中), 任何一根被修改都判为历史被修改。
+    不比较最后一根K线, 因此盘中最后一根K线未走完、数值变化时不会被判为历史被修改。
+
+    Args:
+        root: str, 缓存目录
+        max_new_bars: int, 新增K线达到该数量时模型过期
+        background: bool, 过期模型是否在后台线程重训 (False 时同步重训)
+        anchor_len: int, 用于定位训练数据末尾的K线数
+    """
+
+    def __init__(self, root='ml_model_cache', max_new_bars=5, background=True, anchor_len=10):
+        self.root = root
+        self.max_new_bars = max_new_bars
+        self.background = background
+        self.anchor_len = anchor_len
+        self._entries = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ml-retrain') if background else None
+
+    def __getstate__(self):
+        # 进程池中使用时只传递配置, 子进程从磁盘读取模型
+        return {'root': self.root, 'max_new_bars': self.max_new_bars, 'background': self.background, 'anchor_len': self.anchor_len}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @staticmethod
+    def spec_digest(spec):
+        """特征规格 (dict) 的短哈希, 用于区分不同的特征窗口、特征列和模型参数"""
+        return hashlib.sha1(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+    def _path(self, key):
+        stock_code, timeframe, spec = key
+        name = re.sub(r'[^0-9A-Za-z.-]', '_', f'{stock_code}_{timeframe}')
+        return os.path.join(self.root, f'{name}_{self.spec_digest(spec)}.pkl')
+
+    def _load(self, key):
+        path = self._path(key)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None or not os.path.exists(path):
+            return entry, None
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except Exception:
+            return None, 'unreadable_cache_file'
+        if entry.get('version') != STORE_VERSION or entry.get('spec') != key[2]:
+            return None, 'incompatible_cache_file'
+        with self._lock:
+            self._entries[path] = entry
+        return entry, None
+
+    def _save(self, key, scaler, model, raw):
+        path = self._path(key)
+        entry = {
+            'version': STORE_VERSION,
+            'spec': key[2],
+            'scaler': scaler,
+            'model': model,
+            'rows': np.ascontiguousarray(raw[:-1, :2]),
+            'trained_bars': len(raw),
+            'trained_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with self._lock:
+            self._entries[path] = entry
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"模型缓存写入失败: {str(e)}")
+        return entry
+
+    def new_bars(self, entry, raw):
+        """训练后新增的K线数; 找不到训练数据末尾, 或仍在新数据中的训练K线被修改时返回 None"""
+        rows = entry['rows']
+        anchor = rows[-self.anchor_len:]
+        if len(anchor) == 0 or len(raw) < len(anchor) + 1:
+            return None
+        windows = np.lib.stride_tricks.sliding_window_view(raw[:, :2], len(anchor), axis=0)
+        matches = np.flatnonzero((windows == anchor.T).all(axis=(1, 2)))
+        if matches.size == 0:
+            return None
+        end = int(matches[-1]) + len(anchor)
+        # 新数据第 end 行对应训练数据最后一根 (可能已变化); 之前与训练数据重叠的部分必须完全相同
+        overlap = min(end, len(rows))
+        if not np.array_equal(raw[end - overlap:end, :2], rows[len(rows) - overlap:], equal_nan=True):
+            return None
+        return len(raw) - end - 1
+
+    def get(self, key, raw, fit):
+        """
+        返回 (scaler, model, info)
+
+        key: (股票代码, 时间框架, 特征规格dict)
+        raw: ndarray [n, k], 当前数据的特征行, 前两列为收盘价和成交量
+        fit: 无参函数, 在当前数据上训练并返回 (scaler, model)
+        info: dict, status 为 'hit' / 'stale' / 'miss', reason 为原因代码, 另含 new_bars, trained_bars, trained_at
+        """
+        entry, load_error = self._load(key)
+        if entry is None:
+            return self._fit_now(key, raw, fit, load_error or 'no_cached_model', None)
+
+        new_bars = self.new_bars(entry, raw)
+        if new_bars is None:
+            return self._fit_now(key, raw, fit, 'history_changed', None)
+        if new_bars == 0:
+            return entry['scaler'], entry['model'], self._info('hit', 'unchanged', new_bars, entry)
+        if new_bars < self.max_new_bars:
+            return entry['scaler'], entry['model'], self._info('hit', 'new_bars_below_threshold', new_bars, entry)
+        if not self.background:
+            return self._fit_now(key, raw, fit, 'stale_retrained', new_bars)
+
+        path = self._path(key)
+        with self._lock:
+            submit = path not in self._pending
+            self._pending.add(path)
+        if submit:
+            self._executor.submit(self._retrain, path, key, raw, fit)
+        return entry['scaler'], entry['model'], self._info('stale', 'stale_retraining_in_background', new_bars, entry)
+
+    def _fit_now(self, key, raw, fit, reason, new_bars):
+        scaler, model = fit()
+        entry = self._save(key, scaler, model, raw)
+        return scaler, model, self._info('miss', reason, new_bars, entry)
+
+    def _retrain(self, path, key, raw, fit):
+        try:
+            scaler, model = fit()
+            self._save(key, scaler, model, raw)
+        except Exception as e:
+            print(f"后台重训失败 {key[0]}: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(path)
+
+    def wait(self):
+        """等待所有后台重训完成"""
+        if self._executor is not None:
+            self._executor.submit(lambda: None).result()
+
+    @staticmethod
+    def _info(status, reason, new_bars, entry):
+        return {
+            'status': status,
+            'reason': reason,
+            'new_bars': new_bars,
+            'trained_bars': entry['trained_bars'],
+            'trained_at': entry['trained_at'],
+        }
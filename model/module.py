@@ -297,8 +297,11 @@ class RotaryPositionalEmbedding(nn.Module):
             self.sin_cached = emb.sin()[None, None, :, :]
         return self.cos_cached, self.sin_cached
 
-    def forward(self, q, k):
-        cos, sin = self._update_cos_sin_cache(q, q.shape[-2])
+    def forward(self, q, k, offset=0):
+        """Rotates q and k, whose first position is `offset` (non-zero when earlier keys come from a KVCache)."""
+        cos, sin = self._update_cos_sin_cache(q, offset + q.shape[-2])
+        if offset:
+            cos, sin = cos[:, :, offset:], sin[:, :, offset:]
         return (
             (q * cos) + (self._rotate_half(q) * sin),
             (k * cos) + (self._rotate_half(k) * sin),
@@ -336,12 +339,127 @@ def scaled_dot_product_attention(query, key, value, attn_mask=None, dropout_p=0.
     return attn_weight @ value
 
 
+def local_attention_mask(pos_q, pos_k, window, stride=None):
+    """
+    True where query position `pos_q` must not attend to key position `pos_k` under the local pattern: a query sees
+    the `window` most recent positions up to and including itself, plus, with `stride`, every earlier position
+    `j` with `j % stride == stride - 1`.
+    """
+    visible = pos_k > pos_q - window
+    if stride:
+        visible = visible | (pos_k % stride == stride - 1)
+    return (pos_k > pos_q) | ~visible
+
+
+def local_attention(query, key, value, window, stride=None, key_padding_mask=None, dropout_p=0.0, training=True):
+    """
+    Causal attention under the local pattern of `local_attention_mask`, computed block-wise.
+
+    The sequence is cut into blocks of `window` positions and each block attends only to itself and the previous
+    block, so time and memory grow linearly with the sequence length instead of quadratically. The strided
+    positions add `seq_len / stride` keys per query.
+
+    Args:
+        query, key, value (torch.Tensor): Shape: [batch, n_heads, seq_len, head_dim]
+        key_padding_mask (torch.Tensor, optional): True for padded positions. Shape: [batch, seq_len]
+    """
+    batch_size, n_heads, seq_len, head_dim = query.shape
+    pad = (-seq_len) % window
+    if pad:
+        query, key, value = (F.pad(t, (0, 0, 0, pad)) for t in (query, key, value))
+    n_blocks = (seq_len + pad) // window
+    scale = 1 / math.sqrt(head_dim)
+    device = query.device
+
+    def with_previous(t):  # [batch, n_heads, n_blocks, 2 * window, head_dim]
+        t = t.view(batch_size, n_heads, n_blocks, window, head_dim)
+        return torch.cat([F.pad(t, (0, 0, 0, 0, 1, 0))[:, :, :-1], t], dim=3)
+
+    q = query.view(batch_size, n_heads, n_blocks, window, head_dim)
+    k_near, v_near = with_previous(key), with_previous(value)
+    pos_q = torch.arange(n_blocks * window, device=device).view(n_blocks, window, 1)
+    pos_k = (torch.arange(n_blocks, device=device).view(n_blocks, 1) * window - window
+             + torch.arange(2 * window, device=device)).view(n_blocks, 1, 2 * window)
+    # Keys of the previous block that are out of the window, or before the start of the sequence
+    near_mask = (pos_k > pos_q) | (pos_k <= pos_q - window) | (pos_k < 0)
+    if key_padding_mask is not None:
+        kpm = F.pad(key_padding_mask, (window, pad), value=True)
+        kpm = torch.cat([kpm[:, :-window].view(batch_size, n_blocks, window), kpm[:, window:].view(batch_size, n_blocks, window)], dim=2)
+        near_mask = near_mask | kpm[:, None, :, None, :]
+    scores = (q @ k_near.transpose(-2, -1) * scale).masked_fill(near_mask, float("-inf"))
+
+    if stride:
+        k_far, v_far = key[:, :, stride - 1:seq_len:stride], value[:, :, stride - 1:seq_len:stride]
+        pos_far = torch.arange(stride - 1, seq_len, stride, device=device)
+        # Strided keys inside the window are already covered by the near keys
+        far_mask = pos_far > pos_q - window
+        if key_padding_mask is not None:
+            far_mask = far_mask | key_padding_mask[:, None, None, None, stride - 1::stride]
+        far_scores = (q @ k_far.transpose(-2, -1).unsqueeze(2) * scale).masked_fill(far_mask, float("-inf"))
+        scores = torch.cat([scores, far_scores], dim=-1)
+
+    weights = torch.softmax(scores, dim=-1)
+    weights = torch.dropout(weights, dropout_p, train=training)
+    out = weights[..., :2 * window] @ v_near
+    if stride:
+        out = out + weights[..., 2 * window:] @ v_far.unsqueeze(2)
+    return out.reshape(batch_size, n_heads, n_blocks * window, head_dim)[:, :, :seq_len]
+
+
+class KVCache:
+    """
+    Keys and values of one self-attention layer for the tokens processed so far.
+
+    Passing a cache to `MultiHeadAttentionWithRoPE` (via `TransformerBlock`) makes the layer attend over the cached
+    tokens plus the new ones and then append the new keys and values, so a causal stack can be extended one token
+    at a time instead of re-running the whole prefix.
+    """
+
+    def __init__(self, k=None, v=None):
+        self.k = k  # [batch, n_heads, seq_len, head_dim]
+        self.v = v
+
+    @property
+    def seq_len(self):
+        return 0 if self.k is None else self.k.size(-2)
+
+    def update(self, k, v):
+        if self.k is None:
+            self.k, self.v = k, v
+        else:
+            self.k = torch.cat([self.k, k], dim=-2)
+            self.v = torch.cat([self.v, v], dim=-2)
+        return self.k, self.v
+
+    def repeat_interleave(self, repeats):
+        """Copy of the cache with each batch row repeated `repeats` times (e.g. once per sample path)."""
+        if self.k is None:
+            return KVCache()
+        return KVCache(self.k.repeat_interleave(repeats, dim=0), self.v.repeat_interleave(repeats, dim=0))
+
+    def index_select(self, index):
+        """Copy of the cache restricted to the given batch rows."""
+        if self.k is None:
+            return KVCache()
+        return KVCache(self.k.index_select(0, index), self.v.index_select(0, index))
+
+
 class MultiHeadAttentionWithRoPE(nn.Module):
-    def __init__(self, d_model, n_heads, attn_dropout_p=0.0, resid_dropout_p=0.0):
+    """
+    Causal self-attention with rotary position embeddings.
+
+    With `attn_window`, each position attends only to the `attn_window` most recent positions (plus every
+    `attn_stride`-th earlier one, if set) and the cost grows linearly with the sequence length. The pattern adds no
+    parameters, so checkpoints load unchanged, and sequences that fit in the window take the dense path.
+    """
+
+    def __init__(self, d_model, n_heads, attn_dropout_p=0.0, resid_dropout_p=0.0, attn_window=None, attn_stride=None):
         super().__init__()
         self.d_model = d_model
         self.n_heads = n_heads
         self.head_dim = d_model // n_heads
+        self.attn_window = attn_window
+        self.attn_stride = attn_stride
 
         self.q_proj = nn.Linear(d_model, d_model)
         self.k_proj = nn.Linear(d_model, d_model)
@@ -351,15 +469,24 @@ class MultiHeadAttentionWithRoPE(nn.Module):
         self.attn_dropout_p = attn_dropout_p
         self.resid_dropout = nn.Dropout(resid_dropout_p)
 
-    def forward(self, x, key_padding_mask=None):
+    def forward(self, x, key_padding_mask=None, kv_cache=None):
         batch_size, seq_len, _ = x.shape
 
         q = self.q_proj(x).view(batch_size, seq_len, self.n_heads, self.head_dim).transpose(1, 2)
         k = self.k_proj(x).view(batch_size, seq_len, self.n_heads, self.head_dim).transpose(1, 2)
         v = self.v_proj(x).view(batch_size, seq_len, self.n_heads, self.head_dim).transpose(1, 2)
 
+        if kv_cache is not None:
+            return self._forward_cached(q, k, v, kv_cache)
+
         q, k = self.rotary(q, k)
 
+        if self.attn_window is not None and seq_len > self.attn_window:
+            attn_output = local_attention(q, k, v, self.attn_window, self.attn_stride, key_padding_mask=key_padding_mask,
+                                          dropout_p=self.attn_dropout_p, training=self.training)
+            attn_output = attn_output.transpose(1, 2).contiguous().view(batch_size, seq_len, self.d_model)
+            return self.resid_dropout(self.out_proj(attn_output))
+
         if key_padding_mask is not None:
             attn_mask = key_padding_mask.unsqueeze(1).unsqueeze(2)  # [batch, 1, 1, seq_len]
             attn_mask = attn_mask.expand(-1, self.n_heads, seq_len, -1)  # [batch, n_heads, q_len, k_len]
@@ -377,6 +504,51 @@ class MultiHeadAttentionWithRoPE(nn.Module):
         attn_output = attn_output.transpose(1, 2).contiguous().view(batch_size, seq_len, self.d_model)
         return self.resid_dropout(self.out_proj(attn_output))
 
+    def _forward_cached(self, q, k, v, kv_cache):
+        batch_size, _, seq_len, _ = q.shape
+        past_len = kv_cache.seq_len
+
+        q, k = self.rotary(q, k, offset=past_len)
+        total_len = past_len + seq_len
+
+        if self.attn_window is not None and total_len > self.attn_window:
+            if past_len == 0:
+                attn_output = local_attention(q, k, v, self.attn_window, self.attn_stride, dropout_p=self.attn_dropout_p, training=self.training)
+                kv_cache.update(k, v)
+            else:
+                k, v = kv_cache.update(k, v)
+                # Only keys some new token can see: the recent window and the strided positions before it
+                start = max(past_len + 1 - self.attn_window, 0)
+                pos_k = torch.arange(start, total_len, device=q.device)
+                if self.attn_stride:
+                    pos_k = torch.cat([torch.arange(self.attn_stride - 1, max(start, self.attn_stride - 1), self.attn_stride, device=q.device), pos_k])
+                pos_q = torch.arange(past_len, total_len, device=q.device).unsqueeze(1)
+                attn_output = scaled_dot_product_attention(
+                    q, k.index_select(2, pos_k), v.index_select(2, pos_k),
+                    attn_mask=local_attention_mask(pos_q, pos_k, self.attn_window, self.attn_stride),
+                    dropout_p=self.attn_dropout_p,
+                    training=self.training
+                )
+            attn_output = attn_output.transpose(1, 2).contiguous().view(batch_size, seq_len, self.d_model)
+            return self.resid_dropout(self.out_proj(attn_output))
+
+        k, v = kv_cache.update(k, v)
+
+        # New token i sits at position past_len + i and may attend to every key up to and including itself
+        attn_mask = None
+        if seq_len > 1:
+            attn_mask = torch.ones(seq_len, total_len, dtype=torch.bool, device=q.device).triu(diagonal=past_len + 1)
+
+        attn_output = scaled_dot_product_attention(
+            q, k, v,
+            attn_mask=attn_mask,
+            dropout_p=self.attn_dropout_p,
+            training=self.training
+        )
+
+        attn_output = attn_output.transpose(1, 2).contiguous().view(batch_size, seq_len, self.d_model)
+        return self.resid_dropout(self.out_proj(attn_output))
+
 
 class MultiHeadCrossAttentionWithRoPE(nn.Module):
     def __init__(self, d_model, n_heads, attn_dropout_p=0.0, resid_dropout=0.0):
@@ -474,17 +646,17 @@ class DependencyAwareLayer(nn.Module):
 
 
 class TransformerBlock(nn.Module):
-    def __init__(self, d_model, n_heads, ff_dim=1024, ffn_dropout_p=0.0, attn_dropout_p=0.0, resid_dropout_p=0.0):
+    def __init__(self, d_model, n_heads, ff_dim=1024, ffn_dropout_p=0.0, attn_dropout_p=0.0, resid_dropout_p=0.0, attn_window=None, attn_stride=None):
         super().__init__()
         self.norm1 = RMSNorm(d_model)
-        self.self_attn = MultiHeadAttentionWithRoPE(d_model, n_heads, attn_dropout_p, resid_dropout_p)
+        self.self_attn = MultiHeadAttentionWithRoPE(d_model, n_heads, attn_dropout_p, resid_dropout_p, attn_window, attn_stride)
         self.norm2 = RMSNorm(d_model)
         self.ffn = FeedForward(d_model, ff_dim, ffn_dropout_p)
 
-    def forward(self, x, key_padding_mask=None):
+    def forward(self, x, key_padding_mask=None, kv_cache=None):
         residual = x
         x = self.norm1(x)
-        attn_out = self.self_attn(x, key_padding_mask=key_padding_mask)
+        attn_out = self.self_attn(x, key_padding_mask=key_padding_mask, kv_cache=kv_cache)
         x = residual + attn_out
 
         residual = x
@@ -22,46 +22,184 @@ v2.1.0:
 Copyright © 2024-2025 Kronos AI Team. All rights reserved.
 """
 
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
+from model.global_model import GlobalMLModel
+from model.ml_backends import ML_BACKENDS, MLCostModel, get_backend
+from model.indicator_engine import default_engine
+from model.support_resistance import LevelIndex, EXTREMA_WINDOWS, CLUSTER_TOLERANCE
 import warnings
 warnings.filterwarnings('ignore')
 
 class MultiModelPredictor:
     """多模型集成预测器"""
     
-    def __init__(self, weights=None):
+    # 机器学习模型每个时间点的特征: 收盘价, 成交量, MA5, MA10, RSI, 涨跌幅
+    ML_FEATURE_COLUMNS = ['close', 'volume', 'ma5', 'ma10', 'rsi', 'price_change']
+    
+    def __init__(self, weights=None, model_store=None, ml_mode='recursive', global_model=None, indicator_engine=None,
+                 ml_backend='random_forest', latency_budget=None):
         """
         初始化预测器
         weights: dict, 各模型权重 {'technical': 0.3, 'ml': 0.4, 'support_resistance': 0.3}
+        model_store: MLModelStore, 可选, 按股票缓存已训练的机器学习模型 (需在预测时传入 stock_code)
+        ml_mode: str, 机器学习预测方式
+                 'recursive': 单步模型递归预测 pred_days 次, 每步把预测值作为新K线
+                 'direct': 一次拟合同时输出第 1..pred_days 步的多输出模型, 一次 predict 得到全部步
+                 'global': 使用离线训练的全市场共享模型 (global_model), 在线不训练;
+                           时间框架不一致或预测步数超过模型上限时, 改用 'recursive'
+        global_model: GlobalMLModel 或模型文件路径, ml_mode='global' 时必需
+        indicator_engine: IndicatorEngine, 可选, 技术指标的计算与缓存, 默认共享 default_engine
+        ml_backend: str 或 MLBackend, 机器学习模型后端 ('random_forest', 'random_forest_parallel',
+                    'hist_gradient_boosting', 'ridge', 'linear'), 见 model.ml_backends
+        latency_budget: float, 可选, 每次机器学习预测 (训练 + 预测) 的耗时预算 (秒);
+                        设置后 ml_backend 为质量上限, 按耗时估计选择预算内质量最高的后端;
+                        构造时即校准各后端的耗时估计 (见 calibrate_ml_backends), 不占用预测请求的时间
         """
+        if ml_mode not in ('recursive', 'direct', 'global'):
+            raise ValueError(f"ml_mode 必须是 'recursive'、'direct' 或 'global', 收到: {ml_mode}")
+        if ml_mode == 'global' and global_model is None:
+            raise ValueError("ml_mode='global' 需要提供 global_model")
+        if isinstance(global_model, str):
+            global_model = GlobalMLModel.load(global_model)
         self.weights = weights or {'technical': 0.3, 'ml': 0.4, 'support_resistance': 0.3}
         self.scaler = StandardScaler()
+        self.model_store = model_store
+        self.ml_mode = ml_mode
+        self.global_model = global_model
+        self.indicators = indicator_engine or default_engine
+        self.ml_backend = get_backend(ml_backend)
+        self.latency_budget = latency_budget
+        self.ml_cost_model = MLCostModel()
+        if latency_budget is not None:
+            self.calibrate_ml_backends()
         
-    def predict_short_term(self, stock_data, pred_days=5, timeframe='daily'):
+    def predict_short_term(self, stock_data, pred_days=5, timeframe='daily', stock_code=None):
         """
         短期预测主函数
         stock_data: DataFrame, 股票历史数据
         pred_days: int, 预测天数
         timeframe: str, 时间框架 ('daily', '15min', '5min')
+        stock_code: str, 可选, 股票代码; 与 model_store 一起使用时复用该股票已训练的模型
         返回: dict, 包含各模型预测结果和集成结果
+              使用模型缓存时, machine_learning['model_cache'] 给出命中/未命中状态及原因
+        """
+        return self._predict_short_term(stock_data, pred_days, timeframe, stock_code)
+    
+    def predict_short_term_batch(self, stock_data, pred_days=5, timeframe='daily', max_workers=None, executor='thread'):
+        """
+        批量短期预测
+        
+        先把所有股票的收盘价、成交量右对齐 (末行对齐, 前面补 NaN) 拼成面板, 一次计算全部股票的技术指标和
+        机器学习特征, 再通过线程池或进程池并行训练各股票的模型。
+        每只股票的结果与单独调用 predict_short_term 相同。
+        
+        stock_data: dict 股票代码 -> DataFrame, 或 DataFrame 列表 (列表输入没有股票代码, 不使用模型缓存)
+        pred_days: int, 预测天数
+        timeframe: str, 时间框架 ('daily', '15min', '5min')
+        max_workers: int, 并行训练的线程/进程数, 默认 CPU 核数; 1 表示在当前线程中依次执行
+        executor: str, 'thread' 或 'process'
+        返回: list, 与输入顺序一致; 每项同 predict_short_term 的返回值
+              某只股票无法预测时该项为 {'error': 错误信息}, 不影响其他股票
+        """
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"executor 必须是 'thread' 或 'process', 收到: {executor}")
+        if isinstance(stock_data, dict):
+            codes, frames = list(stock_data.keys()), list(stock_data.values())
+        else:
+            frames = list(stock_data)
+            codes = [None] * len(frames)
+        
+        results = [None] * len(frames)
+        prepared = self._prepare_panel(frames)
+        
+        jobs = [(i, frames[i], pred_days, timeframe, codes[i], tech_latest, ml_raw) for i, (tech_latest, ml_raw) in enumerate(prepared)]
+        max_workers = max_workers or os.cpu_count() or 1
+        if max_workers == 1 or len(jobs) <= 1:
+            for job in jobs:
+                results[job[0]] = self._predict_isolated(*job[1:])
+        else:
+            pool_class = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+            with pool_class(max_workers=min(max_workers, len(jobs))) as pool:
+                futures = [(job[0], pool.submit(self._predict_isolated, *job[1:])) for job in jobs]
+                for i, future in futures:
+                    try:
+                        results[i] = future.result()
+                    except Exception as e:
+                        results[i] = {'error': f"{type(e).__name__}: {str(e)}"}
+        return results
+    
+    def _prepare_panel(self, frames):
         """
+        在右对齐的面板上计算所有股票的技术指标和机器学习特征
+        返回: list, 与 frames 对应的 (最新技术指标 dict, 机器学习特征行 ndarray);
+              缺少收盘价/成交量等无法放入面板的股票为 (None, None), 预测时按单只股票的流程处理
+        """
+        prepared = [(None, None)] * len(frames)
+        columns = {'close': [], 'volume': []}
+        usable = []
+        for i, df in enumerate(frames):
+            try:
+                close = np.asarray(df['close'], dtype=np.float64)
+                volume = np.asarray(df['volume'], dtype=np.float64)
+                if len(close) == 0 or close.shape != volume.shape or close.ndim != 1:
+                    continue
+            except Exception:
+                continue
+            columns['close'].append(close)
+            columns['volume'].append(volume)
+            usable.append(i)
+        if not usable:
+            return prepared
+        
+        lengths = np.array([len(close) for close in columns['close']])
+        n_rows = lengths.max()
+        panels = {}
+        for name, arrays in columns.items():
+            values = np.full((n_rows, len(arrays)), np.nan)
+            for j, array in enumerate(arrays):
+                values[n_rows - len(array):, j] = array
+            panels[name] = pd.DataFrame(values)
+        
+        # 面板为 dict, 指标引擎直接计算不缓存; RSI 跳过开头的填充位置
+        tech = self._technical_indicators(panels)
+        ml = self._ml_indicator_frames(panels)
+        ml['close'], ml['volume'] = panels['close'], panels['volume']
+        tech_latest = {name: values.iloc[-1].values for name, values in tech.items()}
+        ml_values = np.stack([ml[col].values for col in self.ML_FEATURE_COLUMNS], axis=-1)
+        
+        for j, i in enumerate(usable):
+            latest = {name: values[j] for name, values in tech_latest.items()}
+            prepared[i] = (latest, ml_values[n_rows - lengths[j]:, j])
+        return prepared
+    
+    def _predict_isolated(self, stock_data, pred_days, timeframe, stock_code, tech_latest, ml_raw):
+        """批量预测中的单只股票, 异常只影响该股票"""
+        try:
+            return self._predict_short_term(stock_data, pred_days, timeframe, stock_code, tech_latest, ml_raw)
+        except Exception as e:
+            return {'error': f"{type(e).__name__}: {str(e)}"}
+    
+    def _predict_short_term(self, stock_data, pred_days, timeframe, stock_code, tech_latest=None, ml_raw=None):
+        """predict_short_term 的实现; tech_latest / ml_raw 为批量预测在面板上预先算好的指标"""
         results = {}
         
         try:
             # 方法1: 技术指标预测
-            tech_pred = self._technical_indicator_prediction(stock_data, pred_days)
+            tech_pred = self._technical_indicator_prediction(stock_data, pred_days, tech_latest)
             results['technical'] = tech_pred
             
             # 方法2: 机器学习预测
-            ml_pred = self._machine_learning_prediction(stock_data, pred_days, timeframe)
+            ml_pred = self._machine_learning_prediction(stock_data, pred_days, timeframe, stock_code, ml_raw)
             results['machine_learning'] = ml_pred
             
             # 方法3: 支撑阻力位预测
-            sr_pred = self._support_resistance_prediction(stock_data, pred_days)
+            sr_pred = self._support_resistance_prediction(stock_data, pred_days, timeframe)
             results['support_resistance'] = sr_pred
             
             # 集成预测
@@ -78,45 +216,44 @@ class MultiModelPredictor:
             print(f"多模型预测失败: {str(e)}")
             return self._fallback_prediction(stock_data, pred_days)
     
-    def _technical_indicator_prediction(self, data, pred_days):
-        """方法1: 基于技术指标的预测"""
+    def _technical_indicators(self, data):
+        """
+        计算技术指标预测所用的指标: MACD, RSI, 移动平均线, 布林带
+        data: 单只股票的 DataFrame (指标按数据缓存), 或 {'close': DataFrame 面板 (每列一只股票)}
+        返回: dict, 指标名 -> 与收盘价形状相同的 Series/DataFrame
+        """
+        indicators = self.indicators
+        macd, signal, _ = indicators.macd(data)
+        _, bb_upper, bb_lower = indicators.bollinger(data, 20, 2)
+        
+        return {
+            'close': data['close'],
+            'macd': macd,
+            'signal': signal,
+            'rsi': indicators.rsi(data, 14),
+            'ma5': indicators.ma(data, 5),
+            'ma20': indicators.ma(data, 20),
+            'bb_upper': bb_upper,
+            'bb_lower': bb_lower,
+        }
+    
+    def _technical_indicator_prediction(self, data, pred_days, latest=None):
+        """
+        方法1: 基于技术指标的预测
+        latest: dict, 可选, 预先算好的最新指标值 (批量预测)
+        """
         try:
-            # 计算技术指标
-            data = data.copy()
-            
-            # MACD
-            ema12 = data['close'].ewm(span=12).mean()
-            ema26 = data['close'].ewm(span=26).mean()
-            macd = ema12 - ema26
-            signal = macd.ewm(span=9).mean()
-            macd_hist = macd - signal
-            
-            # RSI
-            delta = data['close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            
-            # 移动平均线
-            ma5 = data['close'].rolling(window=5).mean()
-            ma20 = data['close'].rolling(window=20).mean()
-            
-            # 布林带
-            bb_middle = data['close'].rolling(window=20).mean()
-            bb_std = data['close'].rolling(window=20).std()
-            bb_upper = bb_middle + (bb_std * 2)
-            bb_lower = bb_middle - (bb_std * 2)
-            
             # 获取最新指标值
-            latest_close = data['close'].iloc[-1]
-            latest_macd = macd.iloc[-1]
-            latest_signal = signal.iloc[-1]
-            latest_rsi = rsi.iloc[-1]
-            latest_ma5 = ma5.iloc[-1]
-            latest_ma20 = ma20.iloc[-1]
-            latest_bb_upper = bb_upper.iloc[-1]
-            latest_bb_lower = bb_lower.iloc[-1]
+            if latest is None:
+                latest = {name: values.iloc[-1] for name, values in self._technical_indicators(data).items()}
+            latest_close = latest['close']
+            latest_macd = latest['macd']
+            latest_signal = latest['signal']
+            latest_rsi = latest['rsi']
+            latest_ma5 = latest['ma5']
+            latest_ma20 = latest['ma20']
+            latest_bb_upper = latest['bb_upper']
+            latest_bb_lower = latest['bb_lower']
             
             # 预测逻辑
             predictions = []
@@ -169,123 +306,140 @@ class MultiModelPredictor:
             print(f"技术指标预测失败: {str(e)}")
             return self._simple_trend_prediction(data, pred_days)
     
-    def _machine_learning_prediction(self, data, pred_days, timeframe='daily'):
-        """方法2: 机器学习预测"""
+    def _ml_indicator_frames(self, data):
+        """
+        机器学习特征中的指标列: MA5, MA10, RSI, 涨跌幅
+        data: 同 _technical_indicators; MA5 和 RSI 与技术指标预测共用缓存
+        """
+        indicators = self.indicators
+        return {
+            'ma5': indicators.ma(data, 5),
+            'ma10': indicators.ma(data, 10),
+            'rsi': indicators.rsi(data, 14),
+            'price_change': indicators.pct_change(data),
+        }
+    
+    def _machine_learning_prediction(self, data, pred_days, timeframe='daily', stock_code=None, raw=None):
+        """
+        方法2: 机器学习预测
+        raw: ndarray [n, 6], 可选, 预先算好的特征行 (批量预测), 列顺序同 ML_FEATURE_COLUMNS
+        """
         try:
             # 准备特征
-            features = []
-            targets = []
-            window_size = 10  # 使用10天的数据作为特征（对于分钟级数据则是10个时间点）
-            if timeframe == '5min':
-                window_size = 12  # 12个5分钟K线 = 60分钟历史数据
-            elif timeframe == '15min':
-                window_size = 8   # 8个15分钟K线 = 120分钟历史数据
-            else:
-                window_size = 10  # 10天的数据作为特征
+            window_size = self._ml_window_size(timeframe)
             
             # 计算技术指标作为特征
-            data = data.copy()
-            data['ma5'] = data['close'].rolling(window=5).mean()
-            data['ma10'] = data['close'].rolling(window=10).mean()
-            data['rsi'] = self._calculate_rsi(data['close'], 14)
-            data['volume_ma'] = data['volume'].rolling(window=5).mean()
-            
-            # 价格变化率
-            data['price_change'] = data['close'].pct_change()
-            data['volume_change'] = data['volume'].pct_change()
-            
-            # 构建训练数据
-            for i in range(window_size, len(data) - pred_days):
-                # 特征：过去window_size天的数据
-                feature_row = []
-                for j in range(window_size):
-                    idx = i - window_size + j
-                    feature_row.extend([
-                        data['close'].iloc[idx],
-                        data['volume'].iloc[idx],
-                        data['ma5'].iloc[idx] if not np.isnan(data['ma5'].iloc[idx]) else data['close'].iloc[idx],
-                        data['ma10'].iloc[idx] if not np.isnan(data['ma10'].iloc[idx]) else data['close'].iloc[idx],
-                        data['rsi'].iloc[idx] if not np.isnan(data['rsi'].iloc[idx]) else 50,
-                        data['price_change'].iloc[idx] if not np.isnan(data['price_change'].iloc[idx]) else 0
-                    ])
-                
-                features.append(feature_row)
-                # 目标：未来第1天的收盘价
-                targets.append(data['close'].iloc[i + 1])
+            if raw is None:
+                features = self._ml_indicator_frames(data)
+                features['close'], features['volume'] = data['close'], data['volume']
+                raw = np.column_stack([np.asarray(features[col], dtype=np.float64) for col in self.ML_FEATURE_COLUMNS])
+            
+            # 全局模型: 只构建最近一个窗口的特征并预测, 不训练
+            global_model = self.global_model if self.ml_mode == 'global' else None
+            if global_model is not None:
+                if global_model.timeframe == timeframe and pred_days <= global_model.horizons and len(raw) >= global_model.window_size:
+                    predictions = global_model.predict(self._fill_feature_rows(raw[-global_model.window_size:]), pred_days)
+                    return {
+                        'prices': predictions.tolist(),
+                        'method': 'machine_learning',
+                        'model_type': 'RandomForest',
+                        'forecast_mode': 'global'
+                    }
+                print(f"全局模型不适用 (时间框架 {global_model.timeframe}, 最多 {global_model.horizons} 步), 改为单只股票训练")
+            
+            # 构建训练数据: 特征为过去window_size个时间点的特征行展平
+            # 目标为下一时间点的收盘价; direct 模式下为之后 pred_days 个时间点的收盘价
+            direct = self.ml_mode == 'direct'
+            features, targets = self._build_window_features(raw, window_size, pred_days, pred_days if direct else None)
             
             if len(features) < 10:  # 数据不足
                 return self._simple_trend_prediction(data, pred_days)
             
-            # 训练模型
-            X = np.array(features)
-            y = np.array(targets)
-            
-            # 标准化
-            X_scaled = self.scaler.fit_transform(X)
-            
-            # 使用随机森林
-            model = RandomForestRegressor(n_estimators=50, random_state=42)
-            model.fit(X_scaled, y)
-            
-            # 预测
-            predictions = []
-            current_data = data.tail(window_size).copy()
-            
-            for i in range(pred_days):
-                # 准备预测特征
-                feature_row = []
-                for j in range(window_size):
-                    idx = -window_size + j
-                    feature_row.extend([
-                        current_data['close'].iloc[idx],
-                        current_data['volume'].iloc[idx],
-                        current_data['ma5'].iloc[idx] if not np.isnan(current_data['ma5'].iloc[idx]) else current_data['close'].iloc[idx],
-                        current_data['ma10'].iloc[idx] if not np.isnan(current_data['ma10'].iloc[idx]) else current_data['close'].iloc[idx],
-                        current_data['rsi'].iloc[idx] if not np.isnan(current_data['rsi'].iloc[idx]) else 50,
-                        current_data['price_change'].iloc[idx] if not np.isnan(current_data['price_change'].iloc[idx]) else 0
-                    ])
-                
-                X_pred = np.array([feature_row])
-                X_pred_scaled = self.scaler.transform(X_pred)
-                pred_price = model.predict(X_pred_scaled)[0]
-                predictions.append(pred_price)
+            n_outputs = pred_days if direct else 1
+            n_predict_calls = 1 if direct else pred_days
+            backend, settings = self._plan_ml_backend(len(features), features.shape[1], n_outputs, n_predict_calls)
+            fit_seconds = []
+            
+            def fit():
+                # 标准化 + 后端模型
+                scaler = StandardScaler()
+                X = scaler.fit_transform(features)
+                model = backend.make(n_outputs)
+                start = time.perf_counter()
+                model.fit(X, targets)
+                seconds = time.perf_counter() - start
+                self.ml_cost_model.observe_fit(backend, len(features), features.shape[1], n_outputs, seconds)
+                fit_seconds.append(seconds)
+                return scaler, model
+            
+            # 有模型缓存时按 (股票, 时间框架, 特征规格) 复用已训练的模型
+            cache_info = None
+            if self.model_store is not None and stock_code is not None:
+                spec = {'columns': self.ML_FEATURE_COLUMNS, 'window_size': window_size, **backend.spec}
+                if direct:
+                    spec['horizons'] = pred_days
+                scaler, model, cache_info = self.model_store.get((str(stock_code), timeframe, spec), raw, fit)
+            else:
+                scaler, model = fit()
+            self.scaler = scaler
+            
+            start = time.perf_counter()
+            if direct:
+                # 直接多步预测: 最近 window_size 个时间点的特征一次得到全部 pred_days 步
+                X_pred = self._fill_feature_rows(raw[-window_size:]).reshape(1, -1)
+                predictions = model.predict(scaler.transform(X_pred))[0]
+            else:
+                # 递归预测: 每步把预测收盘价作为新K线追加, 并增量更新涨跌幅、MA5/MA10 和 RSI
+                state = _RecursiveFeatureState(raw, window_size, pred_days)
+                predictions = np.empty(pred_days)
                 
-                # 更新数据用于下一次预测
-                new_row = current_data.iloc[-1].copy()
-                new_row['close'] = pred_price
-                new_row['price_change'] = (pred_price - current_data['close'].iloc[-1]) / current_data['close'].iloc[-1]
-                current_data = pd.concat([current_data.iloc[1:], pd.DataFrame([new_row])], ignore_index=True)
-            
-            return {
-                'prices': predictions,
+                for i in range(pred_days):
+                    X_pred_scaled = scaler.transform(state.features())
+                    predictions[i] = model.predict(X_pred_scaled)[0]
+                    state.append_close(predictions[i])
+            predict_seconds = time.perf_counter() - start
+            self.ml_cost_model.observe_predict(backend, n_predict_calls, predict_seconds)
+            # 命中模型缓存 (或缓存过期、后台重新训练) 时本次没有训练
+            settings.update(fit_seconds=fit_seconds[0] if fit_seconds else 0.0, predict_seconds=predict_seconds)
+            
+            result = {
+                'prices': predictions.tolist(),
                 'method': 'machine_learning',
-                'model_type': 'RandomForest'
+                'model_type': backend.model_type,
+                'forecast_mode': 'direct' if direct else 'recursive',
+                'backend_settings': settings
             }
+            if cache_info is not None:
+                result['model_cache'] = cache_info
+            return result
             
         except Exception as e:
             print(f"机器学习预测失败: {str(e)}")
             return self._simple_trend_prediction(data, pred_days)
     
-    def _support_resistance_prediction(self, data, pred_days):
+    def _support_resistance_prediction(self, data, pred_days, timeframe='daily'):
         """方法3: 支撑阻力位预测"""
         try:
             # 识别支撑阻力位
-            highs = data['high'].values
-            lows = data['low'].values
+            highs = data['high'].values.astype(np.float64)
+            lows = data['low'].values.astype(np.float64)
             closes = data['close'].values
             
-            # 找到局部高点和低点
-            resistance_levels = self._find_resistance_levels(highs, closes)
-            support_levels = self._find_support_levels(lows, closes)
+            # 局部高点/低点聚类为阻力位/支撑位, 相距不超过半根K线平均振幅的价位合并
+            window = EXTREMA_WINDOWS.get(timeframe, EXTREMA_WINDOWS['daily'])
+            tolerance = CLUSTER_TOLERANCE * np.nanmean(highs - lows)
+            resistance = LevelIndex.from_prices(highs, window, tolerance, kind='max')
+            support = LevelIndex.from_prices(lows, window, tolerance, kind='min')
             
             current_price = closes[-1]
             
             # 找到最近的支撑阻力位
-            nearby_resistance = [r for r in resistance_levels if r > current_price]
-            nearby_support = [s for s in support_levels if s < current_price]
-            
-            next_resistance = min(nearby_resistance) if nearby_resistance else current_price * 1.05
-            next_support = max(nearby_support) if nearby_support else current_price * 0.95
+            next_resistance = resistance.above(current_price)
+            next_support = support.below(current_price)
+            if next_resistance is None:
+                next_resistance = current_price * 1.05
+            if next_support is None:
+                next_support = current_price * 0.95
             
             # 计算趋势
             recent_trend = np.polyfit(range(10), closes[-10:], 1)[0]  # 最近10天的趋势
@@ -314,8 +468,8 @@ class MultiModelPredictor:
             return {
                 'prices': predictions,
                 'method': 'support_resistance',
-                'support_levels': support_levels,
-                'resistance_levels': resistance_levels,
+                'support_levels': support.nearest_below(current_price),  # 由近到远, 最多5个
+                'resistance_levels': resistance.nearest_above(current_price),
                 'next_support': next_support,
                 'next_resistance': next_resistance
             }
@@ -386,30 +540,114 @@ class MultiModelPredictor:
         except Exception as e:
             return {'overall_confidence': 0.5, 'error': str(e)}
     
-    def _calculate_rsi(self, prices, window=14):
-        """计算RSI指标"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+    def _ml_backend_candidates(self):
+        """延迟预算下可选的后端: 质量不高于 ml_backend 的内置后端, 及 ml_backend 本身"""
+        candidates = [b for b in ML_BACKENDS.values() if b.quality <= self.ml_backend.quality]
+        if self.ml_backend.name not in {b.name for b in candidates}:
+            candidates.append(self.ml_backend)
+        return candidates
+    
+    def calibrate_ml_backends(self, n_features=None):
+        """
+        在随机数据上计时各候选后端的训练和预测, 建立耗时估计 (已有观测的后端跳过)
+        设置 latency_budget 时由构造函数调用; 之后修改 ml_backend 或 latency_budget 时可再次调用, 避免首个预测请求承担校准耗时。
+        进程池中的子进程随预测器一起得到已有的耗时观测, 不会重新校准。
+        n_features: int, 校准数据的特征数, 默认为日线窗口的特征数
+        返回: float, 校准耗时 (秒)
+        """
+        if n_features is None:
+            n_features = 10 * len(self.ML_FEATURE_COLUMNS)
+        start = time.perf_counter()
+        self.ml_cost_model.calibrate(self._ml_backend_candidates(), n_features)
+        return time.perf_counter() - start
     
-    def _find_resistance_levels(self, highs, closes, window=5):
-        """找到阻力位"""
-        resistance_levels = []
-        for i in range(window, len(highs) - window):
-            if highs[i] == max(highs[i-window:i+window+1]):
-                resistance_levels.append(highs[i])
-        return sorted(set(resistance_levels), reverse=True)[:5]  # 返回前5个阻力位
+    def _plan_ml_backend(self, n_samples, n_features, n_outputs, n_predict_calls):
+        """
+        选择机器学习后端
+        未设置 latency_budget 时使用 ml_backend; 否则在质量不高于 ml_backend 的后端中, 选估计耗时在预算内、
+        质量最高的 (同等质量取耗时最短), 都超出预算时选估计耗时最短的, within_budget 为 False。
+        耗时估计不考虑模型缓存命中, 按需要训练计算。
+        尚未校准的后端在此校准, 校准耗时 (calibration_seconds) 从本次预算中扣除。
+        返回: (MLBackend, dict 选择结果)
+        """
+        settings = {'backend': self.ml_backend.name, 'latency_budget': self.latency_budget,
+                    'estimated_seconds': None, 'within_budget': None, 'calibration_seconds': 0.0}
+        if self.latency_budget is None:
+            return self.ml_backend, settings
+        
+        candidates = self._ml_backend_candidates()
+        calibration_seconds = 0.0
+        if not all(self.ml_cost_model.is_calibrated(b) for b in candidates):
+            calibration_seconds = self.calibrate_ml_backends(n_features)
+        budget = self.latency_budget - calibration_seconds
+        estimates = {b.name: self.ml_cost_model.estimate(b, n_samples, n_features, n_outputs, n_predict_calls)
+                     for b in candidates}
+        fitting = [b for b in candidates if estimates[b.name] <= budget]
+        if fitting:
+            backend = min(fitting, key=lambda b: (-b.quality, estimates[b.name]))
+        else:
+            backend = min(candidates, key=lambda b: estimates[b.name])
+        settings.update(backend=backend.name, estimated_seconds=estimates[backend.name], within_budget=bool(fitting),
+                        calibration_seconds=calibration_seconds)
+        return backend, settings
     
-    def _find_support_levels(self, lows, closes, window=5):
-        """找到支撑位"""
-        support_levels = []
-        for i in range(window, len(lows) - window):
-            if lows[i] == min(lows[i-window:i+window+1]):
-                support_levels.append(lows[i])
-        return sorted(set(support_levels))[:5]  # 返回前5个支撑位
+    def train_global_model(self, stock_data, timeframe='daily', horizons=5, **kwargs):
+        """
+        离线训练全市场共享的机器学习模型
+        stock_data: dict 股票代码 -> DataFrame, 或 DataFrame 列表
+        horizons: int, 模型一次输出的预测步数 (在线 pred_days 不能超过该值)
+        kwargs: 传给 GlobalMLModel.train (n_estimators, min_samples_leaf, max_samples_per_stock, ...)
+        返回: GlobalMLModel, 可用 save() 保存, 再以 MultiModelPredictor(ml_mode='global', global_model=路径) 加载
+        """
+        frames = list(stock_data.values()) if isinstance(stock_data, dict) else list(stock_data)
+        feature_rows = [self._fill_feature_rows(ml_raw) for _, ml_raw in self._prepare_panel(frames) if ml_raw is not None]
+        return GlobalMLModel.train(feature_rows, timeframe, self._ml_window_size(timeframe), horizons, **kwargs)
+    
+    @staticmethod
+    def _ml_window_size(timeframe):
+        """机器学习特征窗口长度"""
+        if timeframe == '5min':
+            return 12  # 12个5分钟K线 = 60分钟历史数据
+        elif timeframe == '15min':
+            return 8   # 8个15分钟K线 = 120分钟历史数据
+        return 10  # 10天的数据作为特征
+    
+    @staticmethod
+    def _fill_feature_rows(raw):
+        """
+        填充特征行中的缺失值: MA5/MA10 缺失时取收盘价, RSI 缺失取50, 涨跌幅缺失取0
+        raw: ndarray [n, 6], 列顺序同 ML_FEATURE_COLUMNS
+        """
+        filled = raw.copy()
+        close = raw[:, 0]
+        for col in (2, 3):
+            missing = np.isnan(raw[:, col])
+            filled[missing, col] = close[missing]
+        filled[np.isnan(raw[:, 4]), 4] = 50
+        filled[np.isnan(raw[:, 5]), 5] = 0
+        return filled
+
+    def _build_window_features(self, raw, window_size, pred_days, horizons=None):
+        """
+        构建滑动窗口训练矩阵
+        raw: ndarray [n, 6], 列顺序同 ML_FEATURE_COLUMNS (未填充缺失值)
+        horizons: int, 可选, 给定时目标为多步收盘价 (direct 模式), 不超过 pred_days
+        返回: (X, y), X[k] 为第 k..k+window_size-1 行特征按时间展平, y[k] 为第 k+window_size+1 行的收盘价;
+              给定 horizons 时 y[k] 为第 k+window_size+1 .. k+window_size+horizons 行的收盘价 [n_samples, horizons]
+        样本数为 n - window_size - pred_days (不足时为0)
+        """
+        n_samples = max(len(raw) - window_size - pred_days, 0)
+        if n_samples == 0:
+            return np.empty((0, window_size * raw.shape[1])), np.empty((0,) if horizons is None else (0, horizons))
+        filled = self._fill_feature_rows(raw)
+        # sliding_window_view 得到 [窗口数, 6, window_size] 的视图, 转置后展平成与逐行拼接相同的顺序
+        windows = np.lib.stride_tricks.sliding_window_view(filled, window_size, axis=0)[:n_samples]
+        X = windows.transpose(0, 2, 1).reshape(n_samples, window_size * raw.shape[1])
+        if horizons is None:
+            y = raw[window_size + 1:window_size + 1 + n_samples, 0].copy()
+        else:
+            y = np.lib.stride_tricks.sliding_window_view(raw[:, 0], horizons)[window_size + 1:window_size + 1 + n_samples].copy()
+        return X, y
     
     def _simple_trend_prediction(self, data, pred_days):
         """简单趋势预测作为后备方案"""
@@ -439,6 +677,80 @@ class MultiModelPredictor:
             'confidence': {'overall_confidence': 0.3}
         }
 
+class _RecursiveFeatureState:
+    """
+    机器学习递归预测的特征状态
+    
+    预先分配 window_size + pred_days 行特征 (列顺序同 ML_FEATURE_COLUMNS), 第 i 步的模型输入
+    就是第 i 至 i+window_size-1 行的连续视图, 无需逐步拼接。
+    MA5/MA10 和 RSI 的滚动和保存在环形缓冲区中, 每追加一根K线 O(1) 更新, 定义与
+    _machine_learning_prediction 所用指标引擎的 sma 和 rsi 相同。
+    成交量沿用最后一根K线的值。
+    
+    raw: ndarray [n, 6], 历史特征行, 需至少 rsi_window + 1 行
+    """
+    
+    def __init__(self, raw, window_size, pred_days, rsi_window=14):
+        self.window_size = window_size
+        self.rows = np.empty((window_size + pred_days, raw.shape[1]))
+        self.rows[:window_size] = MultiModelPredictor._fill_feature_rows(raw[-window_size:])
+        self.n_rows = window_size
+        self.step = 0
+        
+        closes = raw[:, 0]
+        # 最近10个收盘价, _close_pos 指向最早的一个
+        self._closes = closes[-10:].copy()
+        self._close_pos = 0
+        self._sum5 = closes[-5:].sum()
+        self._sum10 = closes[-10:].sum()
+        self._last_close = closes[-1]
+        # 最近 rsi_window 个涨幅/跌幅
+        delta = np.diff(closes[-rsi_window - 1:])
+        self._gains = np.maximum(delta, 0)
+        self._losses = np.maximum(-delta, 0)
+        self._delta_pos = 0
+        self._gain_sum = self._gains.sum()
+        self._loss_sum = self._losses.sum()
+        self._rsi_window = rsi_window
+    
+    def features(self):
+        """当前一步的模型输入 [1, window_size * 6]"""
+        return self.rows[self.step:self.step + self.window_size].reshape(1, -1)
+    
+    def append_close(self, close):
+        """追加一根收盘价为 close 的K线, 窗口前移一步"""
+        prev = self._last_close
+        
+        pos = self._close_pos
+        self._sum10 += close - self._closes[pos]
+        self._sum5 += close - self._closes[(pos + 5) % 10]
+        self._closes[pos] = close
+        self._close_pos = (pos + 1) % 10
+        
+        pos = self._delta_pos
+        delta = close - prev
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        self._gain_sum += gain - self._gains[pos]
+        self._loss_sum += loss - self._losses[pos]
+        self._gains[pos], self._losses[pos] = gain, loss
+        self._delta_pos = (pos + 1) % self._rsi_window
+        
+        row = self.rows[self.n_rows]
+        row[:] = self.rows[self.n_rows - 1]
+        row[0] = close
+        row[2] = self._sum5 / 5
+        row[3] = self._sum10 / 10
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = (self._gain_sum / self._rsi_window) / (self._loss_sum / self._rsi_window)
+            row[4] = 100 - (100 / (1 + rs))
+        row[5] = (close - prev) / prev
+        self.rows[self.n_rows] = MultiModelPredictor._fill_feature_rows(row[np.newaxis])[0]
+        
+        self._last_close = close
+        self.n_rows += 1
+        self.step += 1
+
+
 # 使用示例
 if __name__ == "__main__":
     # 示例数据
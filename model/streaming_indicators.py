@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式技术指标
+
+分钟线实时行情每到一根新K线, 用 indicator_engine 的批量函数需要对全部历史重新计算 ewm/rolling。
+本模块的指标对象只保存递推所需的状态, 每根K线 O(1) 更新:
+
+- StreamingEMA: 指数加权的分子/分母累加器 (与 pandas ewm(span=...).mean() 的 adjust=True 相同)
+- StreamingMACD: 快线、慢线、信号线三个 StreamingEMA
+- StreamingRSI: 最近 window 个涨幅/跌幅的环形队列及其和
+- StreamingKDJ: 单调队列维护 n 根K线的最高价/最低价, K、D 递推
+- StreamingATR: Wilder 平滑
+
+各指标的定义与 indicator_engine 中的同名函数一致: 第 t 根K线上 update 的返回值等于
+对前 t 根K线调用批量函数结果的最后一个值 (浮点误差内)。
+每个类的 from_history 用批量函数在历史数据上计算一次, 由结果设置递推状态, 之后逐根 update。
+
+    stream = StreamingIndicators.from_history(history_df)
+    latest = stream.update(bar)   # bar: 含 high/low/close 的 dict 或 Series
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from model.indicator_engine import rsi, _kdj_lines, _wilder_atr, true_range
+
+
+class StreamingEMA:
+    """
+    指数移动平均, 与 pandas ewm(span=span).mean() 相同
+    y_t = sum((1 - a)^i * x_{t-i}) / sum((1 - a)^i), a = 2 / (span + 1)
+    """
+
+    def __init__(self, span):
+        self.span = span
+        self.decay = 1 - 2.0 / (span + 1)
+        self._num = 0.0
+        self._den = 0.0
+        self.value = math.nan
+
+    def update(self, x):
+        # 与 pandas (ignore_na=False) 相同: NaN 不计入但权重照常衰减
+        self._num *= self.decay
+        self._den *= self.decay
+        if not math.isnan(x):
+            self._num += x
+            self._den += 1.0
+            self.value = self._num / self._den
+        return self.value
+
+    def seed(self, value, count):
+        """由批量结果的最后一个值和已处理的K线数 (无缺失值) 设置状态"""
+        self._den = (1 - self.decay ** count) / (1 - self.decay)
+        self._num = value * self._den
+        self.value = value
+        return self
+
+    @classmethod
+    def from_history(cls, values, span):
+        values = np.asarray(values, dtype=np.float64)
+        ema = cls(span)
+        if len(values):
+            ema.seed(_last(_ewm(values, span)), len(values))
+        return ema
+
+
+class StreamingMACD:
+    """MACD, 与 indicator_engine.macd 相同"""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal = StreamingEMA(signal)
+
+    def update(self, close):
+        """返回: (MACD线, 信号线, 柱状图)"""
+        line = self.fast.update(close) - self.slow.update(close)
+        signal = self.signal.update(line)
+        return line, signal, line - signal
+
+    @classmethod
+    def from_history(cls, close, fast=12, slow=26, signal=9):
+        close = np.asarray(close, dtype=np.float64)
+        stream = cls(fast, slow, signal)
+        if len(close):
+            fast_line, slow_line = _ewm(close, fast), _ewm(close, slow)
+            stream.fast.seed(_last(fast_line), len(close))
+            stream.slow.seed(_last(slow_line), len(close))
+            stream.signal.seed(_last(_ewm(fast_line - slow_line, signal)), len(close))
+        return stream
+
+
+class StreamingRSI:
+    """RSI (涨跌幅的简单移动平均), 与 indicator_engine.rsi 相同"""
+
+    def __init__(self, window=14):
+        self.window = window
+        self._gains = deque(maxlen=window)
+        self._losses = deque(maxlen=window)
+        self._gain_sum = 0.0
+        self._loss_sum = 0.0
+        # 队列中非零项的个数; 为0时把和置为精确的0, 避免累加误差把 0/0 变成有限值
+        self._gain_nonzero = 0
+        self._loss_nonzero = 0
+        self._prev_close = None
+        self.value = math.nan
+
+    def update(self, close):
+        if self._prev_close is None:
+            # 与批量计算相同: 第一根K线没有涨跌幅, 计为0涨0跌
+            self._push(0.0, 0.0)
+        else:
+            delta = close - self._prev_close
+            self._push(max(delta, 0.0), min(delta, 0.0) * -1.0)
+        self._prev_close = close
+        if len(self._gains) < self.window:
+            self.value = math.nan
+        elif self._loss_sum == 0:
+            self.value = 100.0 if self._gain_sum > 0 else math.nan
+        else:
+            rs = (self._gain_sum / self.window) / (self._loss_sum / self.window)
+            self.value = 100 - (100 / (1 + rs))
+        return self.value
+
+    def _push(self, gain, loss):
+        if len(self._gains) == self.window:
+            old_gain, old_loss = self._gains[0], self._losses[0]
+            self._gain_sum -= old_gain
+            self._loss_sum -= old_loss
+            self._gain_nonzero -= old_gain != 0
+            self._loss_nonzero -= old_loss != 0
+        self._gains.append(gain)
+        self._losses.append(loss)
+        self._gain_sum += gain
+        self._loss_sum += loss
+        self._gain_nonzero += gain != 0
+        self._loss_nonzero += loss != 0
+        if self._gain_nonzero == 0:
+            self._gain_sum = 0.0
+        if self._loss_nonzero == 0:
+            self._loss_sum = 0.0
+
+    @classmethod
+    def from_history(cls, close, window=14):
+        close = np.asarray(close, dtype=np.float64)
+        stream = cls(window)
+        tail = close[-window - 1:]
+        delta = np.diff(tail)
+        if 0 < len(close) <= window:
+            # 第一根K线仍在窗口内, 计为0涨跌幅
+            delta = np.concatenate([[0.0], delta])
+        for gain, loss in zip(np.maximum(delta, 0), np.maximum(-delta, 0)):
+            stream._push(float(gain), float(loss))
+        if len(close):
+            stream._prev_close = float(close[-1])
+            stream.value = _last(rsi(pd.Series(close), window).to_numpy())
+        return stream
+
+
+class StreamingKDJ:
+    """KDJ随机指标, 与 indicator_engine.kdj 相同"""
+
+    def __init__(self, n=9, m1=3, m2=3):
+        self.n, self.m1, self.m2 = n, m1, m2
+        # 单调队列: (序号, 价格), 最高价递减 / 最低价递增, 队首即窗口内的最高/最低价
+        self._highs = deque()
+        self._lows = deque()
+        self._index = -1
+        self._k = 50.0
+        self._d = 50.0
+
+    def update(self, high, low, close):
+        """返回: (RSV, K, D, J), K、D、J 截断到 0-100"""
+        self._push(high, low)
+        i = self._index
+
+        rsv = 50.0
+        if i + 1 >= self.n:
+            lowest_low = self._lows[0][1]
+            price_range = self._highs[0][1] - lowest_low
+            value = (close - lowest_low) / (price_range if price_range != 0 else 1e-8) * 100
+            if not math.isnan(value):
+                rsv = value
+        if i > 0:
+            self._k = (1 - 1.0 / self.m1) * self._k + rsv / self.m1
+            self._d = (1 - 1.0 / self.m2) * self._d + self._k / self.m2
+        j = 3 * self._k - 2 * self._d
+        return rsv, _clip(self._k), _clip(self._d), _clip(j)
+
+    def _push(self, high, low):
+        self._index += 1
+        i = self._index
+        while self._highs and self._highs[-1][1] <= high:
+            self._highs.pop()
+        self._highs.append((i, high))
+        while self._lows and self._lows[-1][1] >= low:
+            self._lows.pop()
+        self._lows.append((i, low))
+        while self._highs[0][0] <= i - self.n:
+            self._highs.popleft()
+        while self._lows[0][0] <= i - self.n:
+            self._lows.popleft()
+
+    @classmethod
+    def from_history(cls, high, low, close, n=9, m1=3, m2=3):
+        high, low, close = (np.asarray(values, dtype=np.float64) for values in (high, low, close))
+        stream = cls(n, m1, m2)
+        if len(close) == 0:
+            return stream
+        _, k, d = _kdj_lines(pd.Series(high), pd.Series(low), pd.Series(close), n, m1, m2)
+        stream._k, stream._d = float(k[-1]), float(d[-1])
+        # 只需把最近 n-1 根K线放入单调队列
+        start = max(len(close) - n + 1, 0)
+        stream._index = start - 1
+        for h, l in zip(high[start:], low[start:]):
+            stream._push(float(h), float(l))
+        return stream
+
+
+class StreamingATR:
+    """
+    ATR (Wilder 平滑), 与 indicator_engine.atr 在最后一根K线上的值相同:
+    前 period 根K线 (不足以计算) 及 ATR 为0时返回收盘价的2%
+    """
+
+    def __init__(self, period=14):
+        self.period = period
+        self._count = 0
+        self._prev_close = None
+        self._tr_sum = 0.0
+        self._atr = math.nan
+
+    def update(self, high, low, close):
+        if self._prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self._prev_close), abs(low - self._prev_close))
+        i = self._count
+        if 1 <= i <= self.period:
+            self._tr_sum += tr
+        if i == self.period:
+            self._atr = self._tr_sum / self.period
+        elif i > self.period:
+            alpha = 1.0 / self.period
+            self._atr = (1 - alpha) * self._atr + alpha * tr
+        self._count += 1
+        self._prev_close = close
+        if i < self.period or self._atr == 0 or math.isnan(self._atr):
+            return close * 0.02
+        return self._atr
+
+    @classmethod
+    def from_history(cls, high, low, close, period=14):
+        high, low, close = (pd.Series(np.asarray(values, dtype=np.float64)) for values in (high, low, close))
+        stream = cls(period)
+        stream._count = len(close)
+        if len(close) == 0:
+            return stream
+        tr = true_range(high, low, close)
+        stream._prev_close = float(close.iloc[-1])
+        stream._tr_sum = float(tr.iloc[1:period + 1].sum())
+        if len(close) > period:
+            stream._atr = float(_wilder_atr(tr, period)[-1])
+        return stream
+
+
+class StreamingIndicators:
+    """
+    一只股票的流式指标集合: MACD, RSI, KDJ, ATR
+
+    update(bar) 返回 dict: macd, signal, histogram, rsi, rsv, k, d, j, atr
+    """
+
+    def __init__(self, macd_params=(12, 26, 9), rsi_window=14, kdj_params=(9, 3, 3), atr_period=14):
+        self.macd = StreamingMACD(*macd_params)
+        self.rsi = StreamingRSI(rsi_window)
+        self.kdj = StreamingKDJ(*kdj_params)
+        self.atr = StreamingATR(atr_period)
+
+    def update(self, bar):
+        high, low, close = float(bar['high']), float(bar['low']), float(bar['close'])
+        line, signal, histogram = self.macd.update(close)
+        rsv, k, d, j = self.kdj.update(high, low, close)
+        return {
+            'macd': line, 'signal': signal, 'histogram': histogram,
+            'rsi': self.rsi.update(close),
+            'rsv': rsv, 'k': k, 'd': d, 'j': j,
+            'atr': self.atr.update(high, low, close),
+        }
+
+    @classmethod
+    def from_history(cls, data, macd_params=(12, 26, 9), rsi_window=14, kdj_params=(9, 3, 3), atr_period=14):
+        """data: 含 high/low/close 列的历史K线"""
+        stream = cls.__new__(cls)
+        stream.macd = StreamingMACD.from_history(data['close'], *macd_params)
+        stream.rsi = StreamingRSI.from_history(data['close'], rsi_window)
+        stream.kdj = StreamingKDJ.from_history(data['high'], data['low'], data['close'], *kdj_params)
+        stream.atr = StreamingATR.from_history(data['high'], data['low'], data['close'], atr_period)
+        return stream
+
+
+def _ewm(values, span):
+    return pd.Series(values).ewm(span=span).mean().to_numpy()
+
+
+def _last(values):
+    return float(values[-1]) if len(values) else math.nan
+
+
+def _clip(value):
+    return min(max(value, 0.0), 100.0)
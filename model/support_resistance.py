@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+支撑阻力位识别
+
+- local_extrema: 基于滑动窗口最大/最小值的局部高低点检测 (NumPy 向量化)
+- cluster_levels: 一维聚类, 把相距不超过容差的价位合并为一个价位, 并记录触及次数
+- LevelIndex: 排序后的价位索引, 用二分查找在 O(log n) 内回答 "当前价之上/之下最近的价位"
+
+日线和分钟线共用同一套逻辑, 窗口长度按时间框架选择, 合并容差按K线平均振幅 (最高价 - 最低价) 缩放。
+"""
+
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+# 局部高低点的左右窗口 (K线数)
+EXTREMA_WINDOWS = {'daily': 5, '15min': 4, '5min': 6}
+# 合并容差 = 系数 x K线平均振幅
+CLUSTER_TOLERANCE = 0.5
+
+
+def local_extrema(values, window, kind='max'):
+    """
+    局部高点/低点的位置
+    values[i] 等于 values[i-window : i+window+1] 的最大值 (kind='max') 或最小值 (kind='min') 时, i 为局部极值点;
+    两端不足 window 根K线的位置不参与判断
+    返回: ndarray, 按时间顺序的下标
+    """
+    values = np.asarray(values, dtype=np.float64)
+    span = 2 * window + 1
+    if len(values) < span:
+        return np.empty(0, dtype=np.int64)
+    windows = np.lib.stride_tricks.sliding_window_view(values, span)
+    extreme = windows.max(axis=1) if kind == 'max' else windows.min(axis=1)
+    return np.flatnonzero(values[window:len(values) - window] == extreme) + window
+
+
+def cluster_levels(levels, tolerance):
+    """
+    一维聚类: 排序后相邻价位之差不超过 tolerance 的归为一组 (链式合并)
+    返回: (centers, touches), 按价格升序的各组均价和组内价位个数
+    """
+    levels = np.sort(np.asarray(levels, dtype=np.float64))
+    if len(levels) == 0:
+        return levels, np.empty(0, dtype=np.int64)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(levels) > tolerance) + 1])
+    touches = np.diff(np.append(starts, len(levels)))
+    centers = np.add.reduceat(levels, starts) / touches
+    return centers, touches
+
+
+class LevelIndex:
+    """
+    支撑位或阻力位的有序索引
+
+    Args:
+        levels: 价位 (升序)
+        touches: 可选, 每个价位合并前的个数
+    """
+
+    def __init__(self, levels, touches=None):
+        self.levels = [float(level) for level in levels]
+        self.touches = [int(t) for t in touches] if touches is not None else [1] * len(self.levels)
+
+    @classmethod
+    def from_prices(cls, values, window, tolerance, kind='max'):
+        """从最高价 (kind='max', 阻力位) 或最低价 (kind='min', 支撑位) 序列建立索引"""
+        values = np.asarray(values, dtype=np.float64)
+        return cls(*cluster_levels(values[local_extrema(values, window, kind)], tolerance))
+
+    def __len__(self):
+        return len(self.levels)
+
+    def above(self, price):
+        """严格高于 price 的最近价位, 没有时返回 None"""
+        i = bisect_right(self.levels, price)
+        return self.levels[i] if i < len(self.levels) else None
+
+    def below(self, price):
+        """严格低于 price 的最近价位, 没有时返回 None"""
+        i = bisect_left(self.levels, price)
+        return self.levels[i - 1] if i > 0 else None
+
+    def nearest_above(self, price, k=5):
+        """高于 price 的最近 k 个价位, 由近到远"""
+        i = bisect_right(self.levels, price)
+        return self.levels[i:i + k]
+
+    def nearest_below(self, price, k=5):
+        """低于 price 的最近 k 个价位, 由近到远"""
+        i = bisect_left(self.levels, price)
+        return self.levels[max(i - k, 0):i][::-1]
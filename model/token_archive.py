@@ -0,0 +1,148 @@
+import json
+
+import numpy as np
+import pandas as pd
+import torch
+
+from model.kronos import to_datetime64
+from model.token_cache import tokenize_windows, tokenizer_fingerprint
+
+ARCHIVE_VERSION = 1
+OHLCVA_COLS = ['open', 'high', 'low', 'close', 'volume', 'amount']
+
+
+def _pack(s1, s2, s2_bits, n_bytes):
+    codes = (s1.astype(np.uint32) << s2_bits) | s2.astype(np.uint32)
+    return codes.astype('<u4').view(np.uint8).reshape(-1, 4)[:, :n_bytes]
+
+
+def _unpack(packed, s2_bits):
+    raw = np.zeros((len(packed), 4), dtype=np.uint8)
+    raw[:, :packed.shape[1]] = packed
+    codes = raw.view('<u4').ravel()
+    return (codes >> s2_bits).astype(np.int64), (codes & ((1 << s2_bits) - 1)).astype(np.int64)
+
+
+def write_token_archive(path, tokenizer, series, window=512, clip=5, device='cpu', batch_size=64):
+    """
+    Archives bar histories as token streams.
+
+    Each series is cut into consecutive windows of `window` bars (the last may be shorter). Every window is
+    normalized on its own bars and tokenized as in `KronosPredictor.predict`. Only its s1/s2 codes, packed into
+    `ceil((s1_bits + s2_bits) / 8)` bytes per bar, and its mean and std are kept. Timestamps are stored as deltas,
+    which compress to almost nothing for regular bars. Everything is written to one compressed `.npz` file.
+
+    The archive is lossy: `read_token_archive` reconstructs the bars through `KronosTokenizer.decode`, with the
+    tokenizer's quantization error, and values clipped at `clip` standard deviations stay clipped.
+
+    Args:
+        path (str): Output file (.npz).
+        tokenizer (KronosTokenizer): Tokenizer, in eval mode. The same weights are needed to read the archive.
+        series (Dict[str, pd.DataFrame]): Code -> bars sorted by time, with price columns, optional volume/amount
+            and a `timestamps` column.
+        window (int): Normalization window in bars.
+
+    Returns:
+        dict: `n_series`, `n_bars` and `n_windows`.
+    """
+    if tokenizer.s1_bits + tokenizer.s2_bits > 32:
+        raise ValueError("Token codes wider than 32 bits are not supported.")
+    n_bytes = (tokenizer.s1_bits + tokenizer.s2_bits + 7) // 8
+
+    codes, n_bars, packed, stats, deltas = [], [], [], [], []
+    for code, df in series.items():
+        df = df.copy()
+        if 'volume' not in df.columns:
+            df['volume'] = 0.0
+            df['amount'] = 0.0
+        if 'amount' not in df.columns:
+            df['amount'] = df['volume'] * df[OHLCVA_COLS[:4]].mean(axis=1)
+        x = df[OHLCVA_COLS].values.astype(np.float32)
+        if np.isnan(x).any():
+            raise ValueError(f"Series {code} contains NaN values in price or volume columns.")
+        timestamps = to_datetime64(df['timestamps']).astype(np.int64)
+        full = len(x) // window * window
+        parts = []
+        if full:
+            parts.append(x[:full].reshape(-1, window, x.shape[1]))
+        if full < len(x):
+            parts.append(x[np.newaxis, full:])
+        for windows in parts:
+            for b in range(0, len(windows), batch_size):
+                s1, s2, means, stds = tokenize_windows(tokenizer, windows[b:b + batch_size].copy(), clip, device)
+                packed.append(_pack(s1.ravel(), s2.ravel(), tokenizer.s2_bits, n_bytes))
+                stats.append(np.stack([means, stds], axis=1))
+        codes.append(str(code))
+        n_bars.append(len(x))
+        deltas.append(np.diff(timestamps, prepend=0))
+
+    meta = {'version': ARCHIVE_VERSION, 'window': window, 'clip': clip, 's1_bits': tokenizer.s1_bits, 's2_bits': tokenizer.s2_bits,
+            'tokenizer': tokenizer_fingerprint(tokenizer)}
+    stats = np.concatenate(stats).astype(np.float32) if stats else np.zeros((0, 2, len(OHLCVA_COLS)), np.float32)
+    np.savez_compressed(path, meta=np.array(json.dumps(meta)), codes=np.array(codes), n_bars=np.array(n_bars, dtype=np.int64),
+                        tokens=np.concatenate(packed) if packed else np.zeros((0, n_bytes), np.uint8), stats=stats,
+                        time_deltas=np.concatenate(deltas) if deltas else np.zeros(0, np.int64))
+    return {'n_series': len(codes), 'n_bars': int(sum(n_bars)), 'n_windows': len(stats)}
+
+
+def read_token_archive(path, tokenizer, codes=None, device='cpu', batch_size=256):
+    """
+    Reconstructs bar histories from an archive written by `write_token_archive`.
+
+    All windows of equal length, across series, are decoded together in batches of `batch_size`.
+
+    Args:
+        codes (List[str], optional): Series to decode. Defaults to all.
+
+    Returns:
+        Dict[str, pd.DataFrame]: Code -> approximate OHLCVA bars with a `timestamps` column.
+    """
+    with np.load(path) as archive:
+        meta = json.loads(str(archive['meta']))
+        if meta['tokenizer'] != tokenizer_fingerprint(tokenizer):
+            raise ValueError(f"Archive {path} was written with a different tokenizer.")
+        all_codes = [str(c) for c in archive['codes']]
+        n_bars = archive['n_bars']
+        tokens, stats, time_deltas = archive['tokens'], archive['stats'], archive['time_deltas']
+
+    window = meta['window']
+    n_windows = -(-n_bars // window)
+    bar_offsets = np.concatenate([[0], np.cumsum(n_bars)])
+    window_offsets = np.concatenate([[0], np.cumsum(n_windows)])
+    wanted = all_codes if codes is None else [str(c) for c in codes]
+    missing = set(wanted) - set(all_codes)
+    if missing:
+        raise KeyError(f"Series not in archive: {sorted(missing)}")
+
+    # (series, first bar, length, stats row) of every window to decode, grouped by length
+    groups = {}
+    for code in wanted:
+        i = all_codes.index(code)
+        for w in range(n_windows[i]):
+            start = bar_offsets[i] + w * window
+            length = min(window, bar_offsets[i + 1] - start)
+            groups.setdefault(length, []).append((code, start, window_offsets[i] + w))
+
+    s1_all, s2_all = _unpack(tokens, meta['s2_bits'])
+    decoded = {code: np.empty((n_bars[all_codes.index(code)], len(OHLCVA_COLS)), dtype=np.float32) for code in wanted}
+    for length, items in groups.items():
+        for b in range(0, len(items), batch_size):
+            batch = items[b:b + batch_size]
+            idx = np.array([start for _, start, _ in batch])[:, np.newaxis] + np.arange(length)
+            with torch.no_grad():
+                z = tokenizer.decode([torch.from_numpy(s1_all[idx]).to(device), torch.from_numpy(s2_all[idx]).to(device)], half=True)
+            z = z.cpu().numpy()
+            rows = np.array([row for _, _, row in batch])
+            z = z * (stats[rows, 1] + 1e-5)[:, np.newaxis] + stats[rows, 0][:, np.newaxis]
+            for (code, start, _), values in zip(batch, z):
+                offset = start - bar_offsets[all_codes.index(code)]
+                decoded[code][offset:offset + length] = values
+
+    result = {}
+    for code in wanted:
+        i = all_codes.index(code)
+        timestamps = np.cumsum(time_deltas[bar_offsets[i]:bar_offsets[i + 1]]).astype('datetime64[ns]')
+        df = pd.DataFrame(decoded[code], columns=OHLCVA_COLS)
+        df['timestamps'] = timestamps
+        result[code] = df
+    return result
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import torch
+from tqdm import tqdm
+
+from model.kronos import calc_time_features, to_datetime64
+
+
+def tokenizer_fingerprint(tokenizer):
+    """Hash of the tokenizer weights; tokens cached with one tokenizer are meaningless to another."""
+    digest = hashlib.sha1()
+    for name, tensor in tokenizer.state_dict().items():
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+
+def tokenize_windows(tokenizer, windows, clip=5, device='cpu'):
+    """
+    Normalizes every window on its own bars, clips and tokenizes it.
+
+    The arithmetic is that of `KronosPredictor.predict_array`. Given windows in the same time-contiguous layout as
+    the frames `predict` normalizes (e.g. a transposed sliding-window view), the statistics and tokens match
+    `predict` bit for bit.
+
+    Args:
+        windows (np.ndarray): Float32 bars of shape [n_windows, window, d_in]; normalized in place if writable.
+
+    Returns:
+        Tuple[np.ndarray, ...]: s1 and s2 indices [n_windows, window] (int64), means and stds [n_windows, d_in].
+    """
+    if not (windows.dtype == np.float32 and windows.flags.writeable):
+        windows = np.array(windows, dtype=np.float32)
+    means, stds = windows.mean(axis=1), windows.std(axis=1)
+    windows -= means[:, np.newaxis]
+    windows /= (stds + 1e-5)[:, np.newaxis]
+    np.clip(windows, -clip, clip, out=windows)
+    with torch.no_grad():
+        s1, s2 = tokenizer.encode(torch.from_numpy(np.ascontiguousarray(windows)).to(device), half=True)
+    return s1.cpu().numpy(), s2.cpu().numpy(), means, stds
+
+
+class TokenCache:
+    """
+    Pre-tokenized history on disk, for one tokenizer and one (timeframe, window, stride).
+
+    Every series is cut into windows of `window` bars that start `stride` bars apart. Each window is normalized
+    with its own mean and standard deviation, clipped and tokenized in one pass. This is exactly what
+    `KronosPredictor.predict` does with a history of the same bars, so the cached tokens can replace the
+    tokenizer encoder at inference time (see `KronosPredictor.predict_from_cache`) as well as in training
+    (see `model.finetune.TokenWindowDataset`). With the default `stride=window`, every bar is tokenized once.
+
+    `update` only tokenizes windows that were completed by bars appended since the last update. If the bars
+    already covered have changed (e.g. a data revision), the series is rebuilt.
+
+    Layout under `root/{timeframe}/w{window}_s{stride}/`, with raw little-endian arrays appended per series:
+
+        index.json       settings, tokenizer fingerprint and per-series window count and digest of the covered bars
+        {code}.s1/.s2    uint16 [n_windows, window]       s1/s2 token indices
+        {code}.stamps    uint8  [n_windows, window, 5]    minute, hour, weekday, day, month
+        {code}.stats     float32 [n_windows, 2, d_in]     per-window mean and std
+
+    Args:
+        root (str): Cache root directory.
+        tokenizer (KronosTokenizer): Tokenizer, in eval mode.
+        timeframe (str): Name of the bar timeframe, e.g. 'daily' or '5min'.
+        window (int): Bars per window (the normalization window).
+        stride (int, optional): Bars between window starts. Defaults to `window`.
+        clip (float): Clipping value for the normalized bars.
+        device (str): Device for tokenization.
+        batch_size (int): Windows tokenized per forward pass.
+    """
+
+    FILES = {'s1': np.uint16, 's2': np.uint16, 'stamps': np.uint8, 'stats': np.float32}
+
+    def __init__(self, root, tokenizer, timeframe='daily', window=512, stride=None, clip=5, device='cpu', batch_size=64,
+                 price_cols=('open', 'high', 'low', 'close'), vol_col='volume', amt_col='amount'):
+        if tokenizer.s1_bits > 16 or tokenizer.s2_bits > 16:
+            raise ValueError("Token indices do not fit in uint16 for tokenizers with more than 16 bits per token.")
+        self.tokenizer = tokenizer
+        self.window = window
+        self.stride = stride or window
+        self.clip = clip
+        self.device = device
+        self.batch_size = batch_size
+        self.price_cols = list(price_cols)
+        self.vol_col, self.amt_col = vol_col, amt_col
+        self.d_in = len(self.price_cols) + 2
+        self.path = os.path.join(root, timeframe, f'w{window}_s{self.stride}')
+
+        fingerprint = tokenizer_fingerprint(tokenizer)
+        index_path = os.path.join(self.path, 'index.json')
+        if os.path.exists(index_path):
+            with open(index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+            if self.index['tokenizer'] != fingerprint or self.index['clip'] != clip:
+                raise ValueError(f"Token cache at {self.path} was built with a different tokenizer or clip value.")
+        else:
+            self.index = {'window': window, 'stride': self.stride, 'clip': clip, 'tokenizer': fingerprint, 'series': {}}
+
+    @property
+    def codes(self):
+        return list(self.index['series'])
+
+    def n_windows(self, code):
+        entry = self.index['series'].get(str(code))
+        return 0 if entry is None else entry['n_windows']
+
+    def _file(self, code, name):
+        return os.path.join(self.path, f'{code}.{name}')
+
+    def _shape(self, name, n):
+        return {'s1': (n, self.window), 's2': (n, self.window), 'stamps': (n, self.window, 5), 'stats': (n, 2, self.d_in)}[name]
+
+    def _save_index(self):
+        tmp_path = os.path.join(self.path, 'index.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, 'index.json'))
+
+    def _to_arrays(self, df):
+        df = df.copy()
+        if self.vol_col not in df.columns:
+            df[self.vol_col] = 0.0
+            df[self.amt_col] = 0.0
+        if self.amt_col not in df.columns:
+            df[self.amt_col] = df[self.vol_col] * df[self.price_cols].mean(axis=1)
+        x = df[self.price_cols + [self.vol_col, self.amt_col]].values.astype(np.float32)
+        if np.isnan(x).any():
+            raise ValueError("DataFrame contains NaN values in price or volume columns.")
+        return x, to_datetime64(df['timestamps'])
+
+    def update(self, series, verbose=True):
+        """
+        Tokenizes the windows completed since the last update.
+
+        Args:
+            series (Dict[str, pd.DataFrame]): Code -> full history sorted by time, with price columns, optional
+                volume/amount and a `timestamps` column.
+
+        Returns:
+            Dict[str, int]: Code -> number of newly tokenized windows.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        added = {}
+        for code, df in tqdm(series.items(), disable=not verbose, desc="Updating token cache"):
+            code = str(code)
+            x, timestamps = self._to_arrays(df)
+            entry = self.index['series'].get(code)
+            if entry is not None and not self._covers(entry, x, timestamps):
+                entry = None  # history was revised: start over
+            done = 0 if entry is None else entry['n_windows']
+            starts = np.arange(done * self.stride, len(x) - self.window + 1, self.stride)
+            if entry is None:
+                self.index['series'].pop(code, None)
+                for name in self.FILES:
+                    open(self._file(code, name), 'wb').close()
+            else:
+                # Drop anything an interrupted update appended after the indexed windows
+                for name, dtype in self.FILES.items():
+                    os.truncate(self._file(code, name), done * int(np.prod(self._shape(name, 1))) * np.dtype(dtype).itemsize)
+            if starts.size:
+                self._append(code, x, calc_time_features(timestamps).astype(np.uint8), starts)
+                last = starts[-1] + self.window - 1
+                self.index['series'][code] = {'n_windows': done + len(starts), 'first_timestamp': str(timestamps[0]),
+                                              'last_timestamp': str(timestamps[last]), 'digest': self._digest(x, timestamps, last + 1)}
+            if code in self.index['series']:
+                # Bars after the last window are not tokenized yet; `latest` needs to know they exist
+                self.index['series'][code]['end_timestamp'] = str(timestamps[-1])
+            added[code] = int(starts.size)
+        self._save_index()
+        return added
+
+    @staticmethod
+    def _digest(x, timestamps, n_bars):
+        digest = hashlib.sha1(np.ascontiguousarray(x[:n_bars]).tobytes())
+        digest.update(np.ascontiguousarray(timestamps[:n_bars]).tobytes())
+        return digest.hexdigest()
+
+    def _covers(self, entry, x, timestamps):
+        """Whether the bars covered by the cache are unchanged in the new history."""
+        n_bars = (entry['n_windows'] - 1) * self.stride + self.window
+        return n_bars <= len(x) and self._digest(x, timestamps, n_bars) == entry['digest']
+
+    def _append(self, code, x, stamps, starts):
+        bar_view = np.lib.stride_tricks.sliding_window_view(x, self.window, axis=0)
+        stamp_view = np.lib.stride_tricks.sliding_window_view(stamps, self.window, axis=0)
+        files = {name: open(self._file(code, name), 'ab') for name in self.FILES}
+        try:
+            for b in range(0, len(starts), self.batch_size):
+                batch_starts = starts[b:b + self.batch_size]
+                s1, s2, means, stds = tokenize_windows(self.tokenizer, bar_view[batch_starts].transpose(0, 2, 1), self.clip, self.device)
+                files['s1'].write(s1.astype('<u2').tobytes())
+                files['s2'].write(s2.astype('<u2').tobytes())
+                files['stamps'].write(np.ascontiguousarray(stamp_view[batch_starts].transpose(0, 2, 1)).tobytes())
+                files['stats'].write(np.stack([means, stds], axis=1).astype('<f4').tobytes())
+        finally:
+            for f in files.values():
+                f.close()
+
+    def windows(self, code):
+        """
+        Memory-mapped windows of one series.
+
+        Returns:
+            dict: `s1`, `s2` (uint16 [n, window]), `stamps` (uint8 [n, window, 5]) and `stats` (float32 [n, 2, d_in]).
+        """
+        n = self.n_windows(code)
+        if n == 0:
+            raise KeyError(f"No cached windows for series {code}.")
+        return {name: np.memmap(self._file(code, name), dtype=np.dtype(dtype).newbyteorder('<'), mode='r', shape=self._shape(name, n))
+                for name, dtype in self.FILES.items()}
+
+    def latest(self, code, df=None):
+        """
+        Window of `window` bars ending at the last bar of a series, as (s1, s2, stamps, mean, std, end timestamp).
+
+        Without `df`, this is the last cached window; if the series had bars after it at the last `update`, a
+        ValueError is raised rather than silently forecasting from a stale window. With `df` (the current history of
+        the series), the cached window is used when it ends at the last bar of `df`; otherwise the window ending at
+        that bar is tokenized (one encoder pass, the same tokens `predict` computes on those bars).
+        """
+        code = str(code)
+        entry = self.index['series'].get(code)
+        if df is not None:
+            x, timestamps = self._to_arrays(df)
+            if len(x) < self.window:
+                raise ValueError(f"Series {code} has {len(x)} bars, fewer than the cache window {self.window}.")
+            if entry is None or str(timestamps[-1]) != entry['last_timestamp'] or not self._covers(entry, x, timestamps):
+                stamps = calc_time_features(timestamps[-self.window:]).astype(np.uint8)
+                bars = np.lib.stride_tricks.sliding_window_view(x[-self.window:], self.window, axis=0).transpose(0, 2, 1)
+                s1, s2, means, stds = tokenize_windows(self.tokenizer, bars, self.clip, self.device)
+                return s1[0], s2[0], stamps, means[0], stds[0], str(timestamps[-1])
+        elif entry is not None and entry.get('end_timestamp', entry['last_timestamp']) != entry['last_timestamp']:
+            raise ValueError(f"The last cached window of series {code} ends at {entry['last_timestamp']}, but the series "
+                             f"continues to {entry['end_timestamp']}; pass its current history to forecast from the last bar.")
+        w = self.windows(code)
+        return (np.asarray(w['s1'][-1]), np.asarray(w['s2'][-1]), np.asarray(w['stamps'][-1]),
+                np.asarray(w['stats'][-1, 0]), np.asarray(w['stats'][-1, 1]), entry['last_timestamp'])
+
+    def size_bytes(self):
+        return sum(os.path.getsize(os.path.join(self.path, f)) for f in os.listdir(self.path))
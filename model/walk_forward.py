@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+import torch
+from tqdm import tqdm
+
+from model.kronos import PrefixState, SAMPLING_MODES, to_datetime64, calc_time_features
+
+
+class WalkForwardBacktest:
+    """
+    Walk-forward evaluation of Kronos forecasts over historical series.
+
+    Every series is stepped through its history `stride` bars at a time. At each cutoff, the next `horizon`
+    bars are forecast from the bars before the cutoff and compared with what actually happened. Calling
+    `predict` per cutoff would re-tokenize and re-prefill the whole window every time. Instead, the series of
+    a chunk advance in lock-step through one batched `PrefixState`: a new cutoff only encodes the `stride` bars
+    added since the previous one, and the forecasts of all series at a cutoff are sampled as one batch.
+    The batch dimension is therefore the series, not the cutoffs: consecutive cutoffs of one series extend the
+    same prefix, so batching them would mean encoding each cutoff's history separately again.
+
+    As in `ForecastSession`, the normalization statistics are frozen between rebuilds. A rebuild happens when
+    the history would exceed `window` bars (it is then trimmed so that 1/8 of the window is free again) and
+    every `refresh_every` cutoffs if set. `refresh_every=1` normalizes every cutoff's history afresh, like
+    `predict`, at the cost of the prefix reuse.
+
+    Args:
+        predictor (KronosPredictor): Predictor providing the model, tokenizer and device.
+        horizon (int): Forecast steps per cutoff.
+        min_history (int): Bars before the first cutoff. Series shorter than `min_history + horizon` are skipped.
+        window (int, optional): Longest history used. Defaults to `max_context - horizon`.
+        stride (int): Bars between consecutive cutoffs.
+        sample_count (int): Sample paths averaged per forecast.
+        T, top_k, top_p, sampling: Sampling parameters, as in `KronosPredictor.predict`.
+        refresh_every (int, optional): Rebuild the state with fresh statistics every this many cutoffs.
+        batch_size (int): Series evaluated together; bounds the memory used by the caches.
+    """
+
+    def __init__(self, predictor, horizon=5, min_history=64, window=None, stride=1, sample_count=1, T=1.0, top_k=0, top_p=0.9,
+                 sampling='iid', refresh_every=None, batch_size=64):
+        window = predictor.max_context - horizon if window is None else window
+        if window + horizon > predictor.max_context:
+            raise ValueError(f"window + horizon = {window + horizon} exceeds max_context={predictor.max_context}.")
+        if not 0 < min_history <= window:
+            raise ValueError(f"min_history must be in [1, window={window}], got {min_history}.")
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{sampling}', expected one of {SAMPLING_MODES}.")
+        self.predictor = predictor
+        self.horizon = horizon
+        self.min_history = min_history
+        self.window = window
+        self.stride = stride
+        self.sample_count = sample_count
+        self.T, self.top_k, self.top_p = T, top_k, top_p
+        self.sampling = sampling
+        self.refresh_every = refresh_every
+        self.batch_size = batch_size
+        self.columns = predictor.price_cols + [predictor.vol_col, predictor.amt_vol]
+
+    def _prepare(self, df, timestamps):
+        predictor = self.predictor
+        if not all(col in df.columns for col in predictor.price_cols):
+            raise ValueError(f"Price columns {predictor.price_cols} not found in DataFrame.")
+        df = df.copy()
+        if predictor.vol_col not in df.columns:
+            df[predictor.vol_col] = 0.0
+            df[predictor.amt_vol] = 0.0
+        if predictor.amt_vol not in df.columns:
+            df[predictor.amt_vol] = df[predictor.vol_col] * df[predictor.price_cols].mean(axis=1)
+        x = df[self.columns].values.astype(np.float32)
+        if np.isnan(x).any():
+            raise ValueError("DataFrame contains NaN values in price or volume columns.")
+        timestamps = to_datetime64(timestamps)
+        return x, calc_time_features(timestamps), timestamps
+
+    def run(self, series, seed=0, verbose=True):
+        """
+        Runs the walk-forward evaluation.
+
+        Args:
+            series (Dict[str, pd.DataFrame]): Code -> bars sorted by time, with price columns, optional
+                volume/amount and a `timestamps` column.
+            seed (int, optional): Seeds torch before sampling, for reproducible runs.
+            verbose (bool): Show a progress bar per chunk of series.
+
+        Returns:
+            pd.DataFrame: One row per (code, cutoff, horizon step) with `code`, `cutoff` (time of the last history
+                          bar), `step`, `target_time`, `last_close`, `pred_close` and `actual_close`.
+        """
+        if seed is not None:
+            torch.manual_seed(seed)
+        prepared = {}
+        for code, df in series.items():
+            if len(df) >= self.min_history + self.horizon:
+                prepared[code] = self._prepare(df, df['timestamps'])
+
+        codes = list(prepared)
+        records = []
+        for start in range(0, len(codes), self.batch_size):
+            chunk = codes[start:start + self.batch_size]
+            records.extend(self._run_chunk(chunk, [prepared[c] for c in chunk], verbose))
+
+        columns = ['code', 'cutoff', 'step', 'target_time', 'last_close', 'pred_close', 'actual_close']
+        if not records:
+            return pd.DataFrame(columns=columns)
+        return pd.DataFrame({name: np.concatenate([r[i] for r in records]) for i, name in enumerate(columns)})
+
+    def _run_chunk(self, codes, data, verbose):
+        close_col = self.predictor.price_cols.index('close')
+        clip = self.predictor.clip
+        lengths = np.array([len(x) for x, _, _ in data])
+        rows = np.arange(len(data))  # chunk rows still in the batch
+        state = PrefixState(self.predictor.tokenizer, self.predictor.model, self.predictor.device)
+        steps = np.arange(1, self.horizon + 1)
+
+        def rebuild(cutoff, history_len):
+            x = np.stack([data[r][0][cutoff - history_len:cutoff] for r in rows])
+            means, stds = x.mean(axis=1), x.std(axis=1)
+            x_norm = np.clip((x - means[:, np.newaxis]) / (stds + 1e-5)[:, np.newaxis], -clip, clip)
+            state.reset()
+            state.extend(x_norm, np.stack([data[r][1][cutoff - history_len:cutoff] for r in rows]))
+            return means, stds
+
+        cutoff = self.min_history
+        history_len = self.min_history
+        means, stds = rebuild(cutoff, history_len)
+        since_rebuild = 0
+        records = []
+
+        n_cutoffs = (lengths.max() - self.horizon - self.min_history) // self.stride + 1
+        progress = tqdm(total=int(n_cutoffs), disable=not verbose, desc=f"walk-forward ({len(codes)} series)")
+        while True:
+            y_stamp = np.stack([data[r][1][cutoff:cutoff + self.horizon] for r in rows])
+            paths = state.sample(y_stamp, self.T, self.top_k, self.top_p, self.sample_count, self.sampling)
+            pred_close = paths[..., close_col].mean(axis=1) * (stds[:, close_col:close_col + 1] + 1e-5) + means[:, close_col:close_col + 1]
+
+            for j, r in enumerate(rows):
+                x, _, timestamps = data[r]
+                records.append((np.repeat(codes[r], self.horizon), np.repeat(timestamps[cutoff - 1], self.horizon), steps,
+                                timestamps[cutoff:cutoff + self.horizon], np.repeat(x[cutoff - 1, close_col], self.horizon),
+                                pred_close[j], x[cutoff:cutoff + self.horizon, close_col]))
+            progress.update(1)
+
+            next_cutoff = cutoff + self.stride
+            keep = np.flatnonzero(lengths[rows] >= next_cutoff + self.horizon)
+            if keep.size == 0:
+                break
+            if keep.size < len(rows):
+                rows = rows[keep]
+                state.select(keep)
+                means, stds = means[keep], stds[keep]
+
+            since_rebuild += 1
+            overflow = history_len + self.stride > self.window
+            if overflow or (self.refresh_every is not None and since_rebuild >= self.refresh_every):
+                history_len = self.window - max(self.window // 8, 1) if overflow else history_len + self.stride
+                means, stds = rebuild(next_cutoff, history_len)
+                since_rebuild = 0
+            else:
+                x_new = np.stack([data[r][0][cutoff:next_cutoff] for r in rows])
+                x_norm = np.clip((x_new - means[:, np.newaxis]) / (stds + 1e-5)[:, np.newaxis], -clip, clip)
+                state.extend(x_norm, np.stack([data[r][1][cutoff:next_cutoff] for r in rows]))
+                history_len += self.stride
+            cutoff = next_cutoff
+        progress.close()
+        return records
+
+
+def walk_forward_metrics(records, by=None):
+    """
+    Per-horizon accuracy of walk-forward forecasts.
+
+    Args:
+        records (pd.DataFrame): Output of `WalkForwardBacktest.run`.
+        by (str, optional): Extra grouping column, e.g. 'code' for per-stock metrics.
+
+    Returns:
+        pd.DataFrame: Indexed by (`by`,) `step`, with the number of forecasts, `mae`, `mape` (percent) and
+                      `direction_hit` - the share of forecasts that got the sign of the move from the last close right.
+    """
+    error = records['pred_close'] - records['actual_close']
+    pred_move = np.sign(records['pred_close'] - records['last_close'])
+    actual_move = np.sign(records['actual_close'] - records['last_close'])
+    frame = pd.DataFrame({
+        'abs_error': error.abs(),
+        'abs_pct_error': (error / records['actual_close']).abs() * 100,
+        'hit': (pred_move == actual_move).astype(float),
+    })
+    keys = [records[by], records['step']] if by else [records['step']]
+    grouped = frame.groupby(keys)
+    return pd.DataFrame({
+        'count': grouped.size(),
+        'mae': grouped['abs_error'].mean(),
+        'mape': grouped['abs_pct_error'].mean(),
+        'direction_hit': grouped['hit'].mean(),
+    })
@@ -0,0 +1,176 @@
+import os
+import queue
+import threading
+import traceback
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from model.kronos import auto_regressive_inference, GenerationCancelled
+
+
+def _worker_main(tokenizer, model, max_context, clip, num_threads, tasks, results):
+    """Worker loop: runs generation units until it receives None."""
+    torch.set_num_threads(num_threads)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        unit, x, x_stamp, y_stamp, out, params, progress, cancel = task
+        pred_len, T, top_k, top_p, sample_count, sampling, seed = params
+
+        def on_step(step, total):
+            progress[unit] = step
+            if cancel[0]:
+                raise GenerationCancelled("Prediction was cancelled.")
+
+        try:
+            torch.manual_seed(seed)
+            _, paths = auto_regressive_inference(tokenizer, model, x, x_stamp, y_stamp, max_context, pred_len, clip, T, top_k, top_p,
+                                                 sample_count, False, sampling, True, on_step)
+            out.copy_(torch.from_numpy(paths))
+            results.put((unit, None))
+        except GenerationCancelled:
+            results.put((unit, 'cancelled'))
+        except Exception:
+            results.put((unit, traceback.format_exc()))
+
+
+class KronosWorkerPool:
+    """
+    Process pool that runs generations for a `KronosPredictor` on CPU.
+
+    For the small matrices of Kronos at low batch sizes, several processes with one or two intra-op threads each
+    use the cores better than one process with many threads. The model and tokenizer parameters are moved to
+    shared memory once and mapped by every worker, so the pool costs no extra copies of the weights. Each request
+    is split into units - slices of series, or of sample paths when there are fewer series than workers - whose
+    inputs and output buffers are shared tensors as well; workers write their paths straight into the output.
+
+    Workers are started with the 'spawn' method (also works on Windows), so scripts creating a pool need the usual
+    `if __name__ == '__main__':` guard.
+
+    Args:
+        tokenizer (KronosTokenizer): Tokenizer, on CPU.
+        model (Kronos): Model, on CPU.
+        max_context (int): Maximum context length of the predictor.
+        clip (float): Clipping value of the predictor.
+        num_workers (int, optional): Number of worker processes. Defaults to the number of CPU cores.
+        threads_per_worker (int): Intra-op threads per worker.
+    """
+
+    def __init__(self, tokenizer, model, max_context, clip, num_workers=None, threads_per_worker=1):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker
+        self._lock = threading.Lock()
+
+        tokenizer.share_memory()
+        model.share_memory()
+        ctx = mp.get_context('spawn')
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.processes = [ctx.Process(target=_worker_main, daemon=True,
+                                      args=(tokenizer, model, max_context, clip, threads_per_worker, self.tasks, self.results))
+                          for _ in range(self.num_workers)]
+        for process in self.processes:
+            process.start()
+
+    def split_units(self, batch_size, sample_count, sampling):
+        """
+        Splits a request into (series_start, series_end, sample_start, sample_end) units.
+
+        Series are split first. Sample paths are only split when there are fewer series than workers, and only
+        along boundaries that keep the paths of one unit jointly drawn: antithetic pairs stay together and Sobol
+        point sets are never split.
+        """
+        if batch_size >= self.num_workers or sampling == 'sobol':
+            chunks = np.array_split(np.arange(batch_size), min(self.num_workers, batch_size))
+            return [(int(c[0]), int(c[-1]) + 1, 0, sample_count) for c in chunks]
+
+        step = 2 if sampling == 'antithetic' else 1
+        parts = max(1, min(self.num_workers // batch_size, sample_count // step))
+        bounds = np.linspace(0, sample_count // step, parts + 1).astype(int) * step
+        bounds[-1] = sample_count
+        return [(b, b + 1, int(s0), int(s1)) for b in range(batch_size) for s0, s1 in zip(bounds[:-1], bounds[1:])]
+
+    def run(self, x, x_stamp, y_stamp, pred_len, T, top_k, top_p, sample_count, sampling='iid', step_callback=None):
+        """
+        Generates sample paths for normalized inputs, like `auto_regressive_inference(..., return_samples=True)`.
+
+        Every unit is seeded from the caller's global torch RNG, so `torch.manual_seed` before the call makes the
+        result reproducible for a given number of workers. `step_callback(step, pred_len)` is called in the
+        calling thread as the slowest unit advances; if it raises, all units are cancelled after their current
+        step and the exception is re-raised. If a worker process dies (e.g. killed by the OOM killer), the pool is
+        shut down and a RuntimeError is raised; start a new pool to continue.
+
+        Returns:
+            np.ndarray: Paths of shape [batch_size, sample_count, pred_len, d_in] (normalized).
+        """
+        if not self.processes:
+            raise RuntimeError("The worker pool is closed.")
+        batch_size = x.size(0)
+        units = self.split_units(batch_size, sample_count, sampling)
+        seeds = torch.randint(0, 2 ** 62, (len(units),)).tolist()
+
+        x = x.cpu().clone().share_memory_()
+        x_stamp = x_stamp.cpu().clone().share_memory_()
+        y_stamp = y_stamp.cpu().clone().share_memory_()
+        out = torch.empty(batch_size, sample_count, pred_len, x.size(2)).share_memory_()
+        progress = torch.zeros(len(units), dtype=torch.int64).share_memory_()
+        cancel = torch.zeros(1, dtype=torch.uint8).share_memory_()
+
+        with self._lock:
+            for unit, (b0, b1, s0, s1) in enumerate(units):
+                params = (pred_len, T, top_k, top_p, s1 - s0, sampling, seeds[unit])
+                self.tasks.put((unit, x[b0:b1], x_stamp[b0:b1], y_stamp[b0:b1], out[b0:b1, s0:s1], params, progress, cancel))
+
+            pending, reported, error = len(units), 0, None
+            while pending:
+                try:
+                    _, failure = self.results.get(timeout=0.05)
+                    pending -= 1
+                    if failure is not None and error is None:
+                        error = RuntimeError(f"Worker failed:\n{failure}")
+                        cancel[0] = 1
+                except queue.Empty:
+                    dead = [process for process in self.processes if not process.is_alive()]
+                    if dead:
+                        # The dead worker's unit never reports, and it may have died holding a queue lock
+                        cancel[0] = 1
+                        self._terminate()
+                        raise RuntimeError(f"Worker process {dead[0].pid} died (exit code {dead[0].exitcode}); "
+                                           f"the pool has been shut down.")
+                if step_callback is not None and error is None:
+                    done = int(progress.min())
+                    if done > reported:
+                        reported = done
+                        try:
+                            step_callback(done, pred_len)
+                        except BaseException as e:
+                            error = e
+                            cancel[0] = 1
+            if error is not None:
+                raise error
+
+        return out.numpy()
+
+    def close(self):
+        """Stops the worker processes."""
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=10)
+        self.processes = []
+
+    def _terminate(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join(timeout=10)
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
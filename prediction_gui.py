@@ -76,6 +76,8 @@ from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+from model.indicator_engine import default_engine
+
 # 设置环境变量，禁用所有交互式确认
 import os
 os.environ['PYTHONUNBUFFERED'] = '1'  # 禁用输出缓冲
@@ -212,6 +214,9 @@ class KronosPredictor:
         self.multi_model_predictor = None
         self.multi_model_available = False
         
+        # 技术指标引擎 (与多模型预测器共享缓存)
+        self.indicators = default_engine
+        
         self.setup_ui()
         
         # 在UI设置完成后尝试加载多模型预测器
@@ -1621,25 +1626,24 @@ class KronosPredictor:
     def predict_with_technical_indicators(self, historical_data, pred_days):
         """基于技术指标的预测算法（轻量版）"""
         try:
-            # 计算技术指标
+            # 计算技术指标 (在 historical_data 上计算, 后续信号分析可直接复用缓存)
             data_with_indicators = historical_data.copy()
             
             # 计算移动平均线
-            data_with_indicators['MA5'] = data_with_indicators['close'].rolling(window=5).mean()
-            data_with_indicators['MA20'] = data_with_indicators['close'].rolling(window=20).mean()
+            data_with_indicators['MA5'] = self.indicators.ma(historical_data, 5)
+            data_with_indicators['MA20'] = self.indicators.ma(historical_data, 20)
             
             # 计算MACD
-            macd_line, signal_line, histogram = self.calculate_macd(data_with_indicators)
+            macd_line, signal_line, histogram = self.calculate_macd(historical_data)
             if macd_line is not None:
                 data_with_indicators['MACD'] = macd_line
                 data_with_indicators['MACD_Signal'] = signal_line
             
             # 计算KDJ
-            data_with_kdj = self.calculate_kdj(data_with_indicators, n=9, m1=3, m2=3)
-            if 'K' in data_with_kdj.columns:
-                data_with_indicators['K'] = data_with_kdj['K']
-                data_with_indicators['D'] = data_with_kdj['D']
-                data_with_indicators['J'] = data_with_kdj['J']
+            data_with_kdj = self.indicators.kdj(historical_data, n=9, m1=3, m2=3)
+            data_with_indicators['K'] = data_with_kdj['K']
+            data_with_indicators['D'] = data_with_kdj['D']
+            data_with_indicators['J'] = data_with_kdj['J']
             
             # 获取最近的价格和指标
             recent_close = data_with_indicators['close'].iloc[-1]
@@ -1868,8 +1872,9 @@ class KronosPredictor:
             if self.multi_model_available and self.multi_model_predictor is None:
                 try:
                     from model.multi_model_predictor import MultiModelPredictor
+                    from model.ml_model_store import MLModelStore
                     weights = self.get_ensemble_weights()
-                    self.multi_model_predictor = MultiModelPredictor(weights)
+                    self.multi_model_predictor = MultiModelPredictor(weights, model_store=MLModelStore())
                     self.log_message(f"🔧 权重设置: {weights}")
                 except Exception as e:
                     self.log_message(f"⚠️ 多模型预测器初始化失败: {str(e)}")
@@ -1888,8 +1893,12 @@ class KronosPredictor:
             # 运行预测算法
             if self.multi_model_available and self.multi_model_predictor is not None:
                 # 使用多模型预测器
-                ensemble_results = self.multi_model_predictor.predict_short_term(stock_data_for_ml, pred_days)
+                ensemble_results = self.multi_model_predictor.predict_short_term(
+                    stock_data_for_ml, pred_days, chart_type, stock_code=self.stock_code.get().strip())
                 self.log_message("🤖 使用AI多模型预测")
+                cache_info = ensemble_results.get('machine_learning', {}).get('model_cache')
+                if cache_info:
+                    self.log_message(f"🗂️ 模型缓存: {cache_info['status']} ({cache_info['reason']})")
             else:
                 # 使用技术指标预测算法（轻量版）
                 self.log_message("📊 使用技术指标预测算法")
@@ -2643,65 +2652,12 @@ class KronosPredictor:
         - m1: K值平滑因子，默认3
         - m2: D值平滑因子，默认3
         
-        返回：添加了K、D、J列的DataFrame
+        返回：添加了RSV、K、D、J列的DataFrame (原地添加)
         """
         try:
-            if len(data) < n:
-                # 数据不足时，返回中性值
-                data['RSV'] = 50.0
-                data['K'] = 50.0  
-                data['D'] = 50.0
-                data['J'] = 50.0
-                return data
-            
-            # 计算RSV (Raw Stochastic Value)
-            # RSV = (收盘价 - n日内最低价) / (n日内最高价 - n日内最低价) * 100
-            data['lowest_low'] = data['low'].rolling(window=n).min()
-            data['highest_high'] = data['high'].rolling(window=n).max()
-            
-            # 避免除零错误
-            price_range = data['highest_high'] - data['lowest_low']
-            price_range = price_range.replace(0, 1e-8)  # 将0替换为很小的数值
-            
-            data['RSV'] = ((data['close'] - data['lowest_low']) / price_range * 100).fillna(50.0)
-            
-            # 初始化K、D值
-            data['K'] = 50.0  # K值初始值50
-            data['D'] = 50.0  # D值初始值50
-            
-            # 计算K值 (K值 = 2/3 * 前一日K值 + 1/3 * 当日RSV)
-            # 等价于 K = (m1-1)/m1 * 前K + 1/m1 * RSV，其中m1=3
-            alpha_k = 1.0 / m1  # 平滑因子
-            
-            for i in range(1, len(data)):
-                if pd.notna(data['RSV'].iloc[i]):
-                    data.iloc[i, data.columns.get_loc('K')] = (
-                        (1 - alpha_k) * data['K'].iloc[i-1] + alpha_k * data['RSV'].iloc[i]
-                    )
-                else:
-                    data.iloc[i, data.columns.get_loc('K')] = data['K'].iloc[i-1]
-            
-            # 计算D值 (D值 = 2/3 * 前一日D值 + 1/3 * 当日K值)
-            alpha_d = 1.0 / m2  # 平滑因子
-            
-            for i in range(1, len(data)):
-                if pd.notna(data['K'].iloc[i]):
-                    data.iloc[i, data.columns.get_loc('D')] = (
-                        (1 - alpha_d) * data['D'].iloc[i-1] + alpha_d * data['K'].iloc[i]
-                    )
-                else:
-                    data.iloc[i, data.columns.get_loc('D')] = data['D'].iloc[i-1]
-            
-            # 计算J值 (J = 3K - 2D)
-            data['J'] = 3 * data['K'] - 2 * data['D']
-            
-            # 清理临时列
-            data = data.drop(columns=['lowest_low', 'highest_high'], errors='ignore')
-            
-            # 确保数值在合理范围内
-            for col in ['K', 'D', 'J']:
-                data[col] = data[col].clip(0, 100)  # KDJ值通常在0-100之间
-            
+            kdj = self.indicators.kdj(data, n, m1, m2)
+            for col in ['RSV', 'K', 'D', 'J']:
+                data[col] = kdj[col]
             return data
             
         except Exception as e:
@@ -2719,52 +2675,10 @@ class KronosPredictor:
         - data: 包含high, low, close列的DataFrame
         - period: ATR计算周期，默认14
         
-        返回：添加了ATR列的DataFrame
+        返回：添加了ATR列的DataFrame (原地添加)
         """
         try:
-            if len(data) < 2:
-                data['ATR'] = data['close'] * 0.02  # 默认2%作为ATR
-                return data
-            
-            # 计算True Range (TR)
-            # TR = MAX(H-L, ABS(H-PC), ABS(L-PC))
-            # 其中：H=最高价, L=最低价, PC=前收盘价
-            
-            data['prev_close'] = data['close'].shift(1)
-            
-            # 三个候选值
-            data['tr1'] = data['high'] - data['low']  # 当日高低价差
-            data['tr2'] = abs(data['high'] - data['prev_close'])  # 当日最高价与前日收盘价差的绝对值
-            data['tr3'] = abs(data['low'] - data['prev_close'])   # 当日最低价与前日收盘价差的绝对值
-            
-            # 取三者最大值作为True Range
-            data['TR'] = data[['tr1', 'tr2', 'tr3']].max(axis=1)
-            
-            # 第一个ATR值 = 前period个TR的简单平均
-            first_atr = data['TR'].iloc[1:period+1].mean() if len(data) > period else data['TR'].mean()
-            
-            # 初始化ATR列
-            data['ATR'] = 0.0
-            data.iloc[period, data.columns.get_loc('ATR')] = first_atr
-            
-            # 从第period+1个值开始，使用Wilder的指数移动平均
-            # ATR = ((period-1) * 前ATR + 当前TR) / period
-            for i in range(period + 1, len(data)):
-                prev_atr = data['ATR'].iloc[i-1]
-                current_tr = data['TR'].iloc[i]
-                data.iloc[i, data.columns.get_loc('ATR')] = ((period - 1) * prev_atr + current_tr) / period
-            
-            # 对于前period个值，使用向前填充
-            data['ATR'] = data['ATR'].replace(0, np.nan)
-            data['ATR'] = data['ATR'].fillna(method='bfill')
-            
-            # 如果仍有NaN，使用价格的2%作为默认值
-            data['ATR'] = data['ATR'].fillna(data['close'] * 0.02)
-            
-            # 清理临时列
-            temp_cols = ['prev_close', 'tr1', 'tr2', 'tr3', 'TR']
-            data = data.drop(columns=temp_cols, errors='ignore')
-            
+            data['ATR'] = self.indicators.atr(data, period)
             return data
             
         except Exception as e:
@@ -2817,13 +2731,13 @@ class KronosPredictor:
             all_data = pd.concat([historical_data, prediction_data], ignore_index=True)
             
             # 计算基础技术指标
-            all_data['MA5'] = all_data['close'].rolling(window=5).mean()
-            all_data['MA10'] = all_data['close'].rolling(window=10).mean()
-            all_data['MA20'] = all_data['close'].rolling(window=20).mean()
+            all_data['MA5'] = self.indicators.ma(all_data, 5)
+            all_data['MA10'] = self.indicators.ma(all_data, 10)
+            all_data['MA20'] = self.indicators.ma(all_data, 20)
             
             # 计算价格变化率和成交量
-            all_data['price_change'] = all_data['close'].pct_change()
-            all_data['volume_ma'] = all_data['volume'].rolling(window=5).mean()
+            all_data['price_change'] = self.indicators.pct_change(all_data)
+            all_data['volume_ma'] = self.indicators.ma(all_data, 5, column='volume')
             
             # 🆕 计算KDJ指标
             self.log_message("🔄 计算KDJ随机指标...")
@@ -3147,24 +3061,9 @@ class KronosPredictor:
         self.current_figure = fig
     
     def calculate_macd(self, data, fast_period=12, slow_period=26, signal_period=9):
-        """计算MACD指标"""
+        """计算MACD指标, 返回 (MACD线, 信号线, 柱状图)"""
         try:
-            prices = data['close']
-            
-            # 计算EMA
-            ema_fast = prices.ewm(span=fast_period).mean()
-            ema_slow = prices.ewm(span=slow_period).mean()
-            
-            # 计算MACD线
-            macd_line = ema_fast - ema_slow
-            
-            # 计算信号线
-            signal_line = macd_line.ewm(span=signal_period).mean()
-            
-            # 计算柱状图
-            histogram = macd_line - signal_line
-            
-            return macd_line, signal_line, histogram
+            return self.indicators.macd(data, fast_period, slow_period, signal_period)
             
         except Exception as e:
             self.log_message(f"计算MACD失败: {str(e)}")
@@ -3188,14 +3087,17 @@ class KronosPredictor:
             # 创建新的图表 - 三图表布局：价格图 + MACD图 + KDJ图
             self.current_figure = Figure(figsize=(12, 14), dpi=100)
             
-            # 合并历史和预测数据用于指标计算
-            all_data_for_indicators = pd.concat([historical_data, prediction_data], ignore_index=True)
+            # 合并历史和预测数据用于指标计算; 交易信号已在同样的合并数据上算过KDJ, 直接复用
+            if len(all_data) == len(historical_data) + len(prediction_data):
+                all_data_for_indicators = all_data
+            else:
+                all_data_for_indicators = pd.concat([historical_data, prediction_data], ignore_index=True)
             
             # 计算MACD指标
             macd_line, signal_line, histogram = self.calculate_macd(all_data_for_indicators)
             
             # 计算KDJ指标
-            all_data_with_kdj = self.calculate_kdj(all_data_for_indicators.copy(), n=9, m1=3, m2=3)
+            all_data_with_kdj = self.indicators.kdj(all_data_for_indicators, n=9, m1=3, m2=3)
             
             # 准备数据
             hist_dates = historical_data['timestamps']
@@ -3916,7 +3818,7 @@ class KronosPredictor:
             macd_line, signal_line, histogram = self.calculate_macd(all_data_for_indicators)
             
             # 计算KDJ指标
-            all_data_with_kdj = self.calculate_kdj(all_data_for_indicators.copy(), n=9, m1=3, m2=3)
+            all_data_with_kdj = self.indicators.kdj(all_data_for_indicators, n=9, m1=3, m2=3)
             
             # 上图：价格
             ax1.plot(hist_dates, hist_closes, color='blue', linewidth=2)
@@ -4809,9 +4711,8 @@ class KronosPredictor:
             
             # 🆕 计算KDJ指标分析
             self.log_message("🔄 计算KDJ和ATR指标...")
-            historical_with_indicators = historical_data.copy()
-            historical_with_indicators = self.calculate_kdj(historical_with_indicators, n=9, m1=3, m2=3)
-            historical_with_indicators = self.calculate_atr(historical_with_indicators, period=14)
+            historical_with_indicators = self.indicators.kdj(historical_data, n=9, m1=3, m2=3).copy()
+            historical_with_indicators['ATR'] = self.indicators.atr(historical_data, period=14)
             
             # 获取最新KDJ值
             current_k = historical_with_indicators['K'].iloc[-1] if len(historical_with_indicators) > 0 else 50
@@ -4871,11 +4772,7 @@ class KronosPredictor:
             
             # 简化的MACD计算
             if len(historical_data) >= 26:
-                prices = historical_data['close']
-                ema12 = prices.ewm(span=12).mean()
-                ema26 = prices.ewm(span=26).mean()
-                macd_line = ema12 - ema26
-                signal_line = macd_line.ewm(span=9).mean()
+                macd_line, signal_line, _ = self.indicators.macd(historical_data, 12, 26, 9)
                 
                 current_macd = macd_line.iloc[-1]
                 current_signal = signal_line.iloc[-1]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式指标与 indicator_engine 批量计算的一致性: 第 t 根K线上 update 的返回值
+应等于对前 t 根K线批量计算结果的最后一个值, 包括冷启动和历史不足一个窗口的初始化。
+
+    python -m pytest tests/test_streaming_indicators.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import indicator_engine
+from model.streaming_indicators import StreamingIndicators
+
+KEYS = ('macd', 'signal', 'histogram', 'rsi', 'rsv', 'k', 'd', 'j', 'atr')
+
+
+def random_bars(n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, n_bars)))
+    # 一段横盘: RSI 的 0/0 和 KDJ 的零区间
+    close[20:40] = close[20]
+    open_ = np.roll(close, 1)
+    open_[0] = close[0]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n_bars))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n_bars))
+    high[20:40] = low[20:40] = close[20]
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close})
+
+
+def batch_latest(df):
+    high, low, close = df['high'], df['low'], df['close']
+    macd, signal, histogram = indicator_engine.macd(close)
+    kdj = indicator_engine.kdj(high, low, close)
+    return {
+        'macd': macd.iloc[-1], 'signal': signal.iloc[-1], 'histogram': histogram.iloc[-1],
+        'rsi': indicator_engine.rsi(close).iloc[-1],
+        'rsv': kdj['RSV'].iloc[-1], 'k': kdj['K'].iloc[-1], 'd': kdj['D'].iloc[-1], 'j': kdj['J'].iloc[-1],
+        'atr': indicator_engine.atr(high, low, close).iloc[-1],
+    }
+
+
+@pytest.mark.parametrize('history', [0, 1, 3, 9, 13, 14, 15, 27, 40])
+def test_streaming_matches_batch(history):
+    df = random_bars(70)
+    stream = StreamingIndicators() if history == 0 else StreamingIndicators.from_history(df.iloc[:history])
+    for t, bar in enumerate(df.to_dict('records')[history:], start=history):
+        got, want = stream.update(bar), batch_latest(df.iloc[:t + 1])
+        for key in KEYS:
+            assert np.isnan(got[key]) == np.isnan(want[key]), (t, key, got[key], want[key])
+            if not np.isnan(want[key]):
+                assert got[key] == pytest.approx(want[key], rel=1e-9, abs=1e-9), (t, key)
+
+
+def test_rsi_available_on_window_th_bar():
+    df = random_bars(70)
+    stream = StreamingIndicators()
+    values = [stream.update(bar)['rsi'] for bar in df.to_dict('records')]
+    assert np.isnan(values[12]) and not np.isnan(values[13])
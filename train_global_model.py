@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线训练全市场共享的机器学习模型 (MultiModelPredictor 的 'global' 模式)
+
+读取目录下所有 {code}_historical_{timeframe}.csv (data/ 或批量导出的同格式CSV),
+把每只股票的特征窗口归一化后合并训练一个多输出随机森林, 保存到磁盘。
+在线预测时只构建特征并调用 predict, 不再逐股训练:
+
+    predictor = MultiModelPredictor(ml_mode='global', global_model='global_models/daily.pkl')
+
+用法:
+    python train_global_model.py --timeframe daily --horizons 5
+    python train_global_model.py --data-dir export/ --timeframe 5min --horizons 12 --n-estimators 200
+"""
+
+import os
+import time
+import argparse
+
+from model.data_io import load_bundled_series, DATA_DIR
+from model.multi_model_predictor import MultiModelPredictor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='训练全市场共享的机器学习模型')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='{code}_historical_{timeframe}.csv 所在目录')
+    parser.add_argument('--timeframe', default='daily', choices=['daily', '15min', '5min'])
+    parser.add_argument('--horizons', type=int, default=5, help='模型一次输出的预测步数, 在线 pred_days 不能超过该值')
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--min-samples-leaf', type=int, default=5)
+    parser.add_argument('--max-samples-per-stock', type=int, default=None, help='每只股票最多使用最近的多少个样本')
+    parser.add_argument('--output', default=None, help='模型文件路径 (默认 global_models/{timeframe}.pkl)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    series = load_bundled_series(args.timeframe, args.data_dir)
+    if not series:
+        raise SystemExit(f"{args.data_dir} 下没有 *_historical_{args.timeframe}.csv")
+    output = args.output or os.path.join('global_models', f'{args.timeframe}.pkl')
+
+    start = time.perf_counter()
+    model = MultiModelPredictor().train_global_model(
+        series, args.timeframe, args.horizons, n_estimators=args.n_estimators, min_samples_leaf=args.min_samples_leaf,
+        max_samples_per_stock=args.max_samples_per_stock, seed=args.seed)
+    train_time = time.perf_counter() - start
+    model.save(output)
+    print(f"训练完成: {model.info['n_stocks']}/{len(series)} 只股票, {model.info['n_samples']} 个样本, "
+          f"窗口 {model.window_size}, 预测 {model.horizons} 步, 耗时 {train_time:.1f}s")
+    print(f"模型已保存: {output}")
+
+    # 在线耗时对比: 全局模型只推理, 默认模式每次请求都逐股训练
+    pred_days = min(args.horizons, 5)
+    predictors = {'global': MultiModelPredictor(ml_mode='global', global_model=output), 'recursive': MultiModelPredictor()}
+    timings = {name: [] for name in predictors}
+    for df in series.values():
+        for name, predictor in predictors.items():
+            start = time.perf_counter()
+            predictor._machine_learning_prediction(df, pred_days, args.timeframe)
+            timings[name].append(time.perf_counter() - start)
+    for name, values in timings.items():
+        print(f"机器学习预测耗时 ({name}): 平均 {sum(values) / len(values) * 1000:.1f}ms/只")
+
+
+if __name__ == '__main__':
+    main()